@@ -0,0 +1,21 @@
+import asyncio
+import weakref
+from django.conf import settings
+from redis import asyncio as aioredis
+
+# Async connection pools are bound to the event loop that created them, so
+# each loop gets its own pool per cache alias.
+_async_pools = weakref.WeakKeyDictionary()
+
+
+def get_async_redis_connection(alias="default"):
+    loop = asyncio.get_running_loop()
+    pools = _async_pools.setdefault(loop, {})
+
+    if alias not in pools:
+        location = settings.CACHES[alias]["LOCATION"]
+        if isinstance(location, (list, tuple)):
+            location = location[0]
+        pools[alias] = aioredis.ConnectionPool.from_url(location)
+
+    return aioredis.Redis(connection_pool=pools[alias])
@@ -0,0 +1,68 @@
+from redis.exceptions import ResponseError
+
+# Rank change events are written by the leaderboard scripts to the board's
+# stream (Leaderboard.events) with short field names to keep entries small:
+# p player, o old rank (empty when the player joined), n new rank, s score, c cause.
+
+
+def parse_event(fields):
+    fields = {_decode(key): _decode(value) for key, value in fields.items()}
+    return {
+        'player_id': fields['p'],
+        'old_rank': int(fields['o']) if fields['o'] else None,
+        'new_rank': int(fields['n']),
+        'score': float(fields['s']),
+        'cause': fields['c'],
+    }
+
+
+class RankEventConsumer:
+    # Reads rank change events in batches as part of a consumer group, so each
+    # event is handled by one consumer in the group and can be retried until
+    # it is acknowledged.
+
+    def __init__(self, leaderboard, group, consumer, batch_size=100, block_ms=None):
+        self.conn = leaderboard.conn
+        self.stream = leaderboard.events
+        self.group = group
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+
+    def ensure_group(self, start_id='0'):
+        try:
+            self.conn.xgroup_create(self.stream, self.group, id=start_id, mkstream=True)
+        except ResponseError as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+
+    def read(self):
+        # Returns [(event_id, event)] of events not yet delivered to this group
+        response = self.conn.xreadgroup(
+            self.group, self.consumer, {self.stream: '>'}, count=self.batch_size, block=self.block_ms
+        )
+        return [(event_id, parse_event(fields)) for _, entries in response or [] for event_id, fields in entries]
+
+    def claim_stale(self, min_idle_ms=60000):
+        # Takes over events another consumer read but never acknowledged
+        _, entries, *_ = self.conn.xautoclaim(
+            self.stream, self.group, self.consumer, min_idle_ms, count=self.batch_size
+        )
+        return [(event_id, parse_event(fields)) for event_id, fields in entries if fields]
+
+    def ack(self, event_ids):
+        if event_ids:
+            self.conn.xack(self.stream, self.group, *event_ids)
+
+    def consume(self, handler):
+        # Passes one batch of events to handler and acknowledges them once it
+        # returns. Returns the number of events handled.
+        events = self.claim_stale() + self.read()
+        if events:
+            handler([event for _, event in events])
+            self.ack([event_id for event_id, _ in events])
+        return len(events)
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
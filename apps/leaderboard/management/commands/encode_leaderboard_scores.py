@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django_redis import get_redis_connection
+from apps.leaderboard.scores import MAX_POINTS, SEQUENCE_SPAN, SEQUENCE_STRIDE, encode_score
+
+
+class Command(BaseCommand):
+    help = (
+        'Rewrite a leaderboard from float scores to integer encoded scores, keeping the current order. '
+        'Pause writes to the board while this runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', default='leaderboard')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument(
+            '--max-points', type=int, default=MAX_POINTS // 2,
+            help='Highest point level to encode into, leaving the levels above for jumps to the top',
+        )
+
+    def handle(self, *args, **options):
+        board = options['board']
+        batch_size = options['batch_size']
+        staging = f'{board}:encoding'
+        conn = get_redis_connection('default')
+
+        max_points = options['max_points']
+        if not 0 <= max_points <= MAX_POINTS:
+            raise CommandError(f'--max-points must be between 0 and {MAX_POINTS}')
+
+        total = conn.zcard(board)
+        if total * SEQUENCE_STRIDE >= SEQUENCE_SPAN:
+            raise CommandError(f'{board} has too many players to encode: {total}')
+
+        # One point level per distinct score while they fit under max_points,
+        # otherwise the levels are spread evenly over 0..max_points. Players
+        # sharing a level still keep their order through the sequence.
+        levels = sum(1 for _ in self._distinct_scores(conn, board, total, batch_size))
+        conn.delete(staging)
+        level, previous_score, position = -1, None, 0
+
+        # Walk the board from the bottom up. Players lower down get later
+        # sequence numbers so ties keep their current order. Rerunning it on
+        # an encoded board compacts the levels and restores the gaps between
+        # sequence numbers.
+        for batch in self._batches(conn, board, total, batch_size):
+            mapping = {}
+            for player_id, score in batch:
+                if score != previous_score:
+                    level, previous_score = level + 1, score
+                points = level if levels <= max_points + 1 else level * (max_points + 1) // levels
+                mapping[player_id] = encode_score(points, (total - position) * SEQUENCE_STRIDE)
+                position += 1
+
+            conn.zadd(staging, mapping)
+            self.stdout.write(f'Encoded {position}/{total} players')
+
+        pipe = conn.pipeline()
+        if position:
+            pipe.rename(staging, board)
+        pipe.set(f'{board}:sequence', total * SEQUENCE_STRIDE)
+        pipe.execute()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Encoded {position} players on {board} into {min(levels, max_points + 1)} point levels'
+        ))
+
+    def _batches(self, conn, board, total, batch_size):
+        # The board from the bottom up in batches of (player id, score)
+        for position in range(0, total, batch_size):
+            batch = conn.zrange(board, position, position + batch_size - 1, withscores=True)
+            if not batch:
+                break
+            yield batch
+
+    def _distinct_scores(self, conn, board, total, batch_size):
+        previous_score = None
+        for batch in self._batches(conn, board, total, batch_size):
+            for _, score in batch:
+                if score != previous_score:
+                    previous_score = score
+                    yield score
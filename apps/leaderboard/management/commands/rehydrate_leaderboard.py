@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from apps.leaderboard.models import LeaderboardSnapshot
+from apps.leaderboard.registry import GLOBAL_BOARD, get_leaderboard
+from apps.leaderboard.snapshots import rehydrate
+
+
+class Command(BaseCommand):
+    help = 'Load the latest Postgres snapshot of a leaderboard back into Redis'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', default=GLOBAL_BOARD)
+        parser.add_argument('--snapshot', type=int, help='Snapshot id, defaults to the latest completed one')
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--force', action='store_true', help='Replace the board even if it is not empty')
+
+    def handle(self, *args, **options):
+        leaderboard = get_leaderboard(options['board'])
+        if leaderboard.length and not options['force']:
+            self.stdout.write(self.style.ERROR(
+                f'{leaderboard.leaderboard} already has {leaderboard.length} players, use --force to replace it'
+            ))
+            return
+
+        snapshot = None
+        if options['snapshot']:
+            snapshot = LeaderboardSnapshot.objects.get(pk=options['snapshot'], board=leaderboard.leaderboard)
+
+        snapshot, loaded, elapsed = rehydrate(leaderboard, snapshot, batch_size=options['batch_size'])
+        rate = loaded / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Rehydrated {loaded} players into {leaderboard.leaderboard} from snapshot {snapshot.id} '
+            f'in {elapsed:.1f}s ({rate:,.0f} players/s)'
+        ))
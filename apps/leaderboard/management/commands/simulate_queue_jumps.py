@@ -0,0 +1,84 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from apps.floaters.models import Floater
+from apps.leaderboard.models import LeaderboardSnapshot
+from apps.leaderboard.registry import GLOBAL_BOARD
+from apps.leaderboard.simulation import (
+    PERCENTILES, QueueJumpSimulator, current_task_jumps, jump_sizes, synthetic_completions, tier_jumps,
+)
+
+
+class Command(BaseCommand):
+    help = 'Simulate a stream of task completions against a leaderboard snapshot and report rank changes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', default=GLOBAL_BOARD, help='Board whose latest snapshot to start from')
+        parser.add_argument('--players', type=int, help='Simulate a board of this many players instead')
+        parser.add_argument('--completions', type=int, default=1000000)
+        parser.add_argument('--batch-size', type=int, default=100000)
+        parser.add_argument(
+            '--task-jumps', help='Comma separated queue_jumps to use instead of the current tasks, e.g. 10,20,50'
+        )
+        parser.add_argument(
+            '--tier-jumps', help='Comma separated tier=jumps overrides for Floater.TIER_JUMPS, e.g. ST=15,GD=100'
+        )
+        parser.add_argument('--tier-share', type=float, default=0.1, help='Share of completions that are tier jumps')
+        parser.add_argument('--activity', type=float, default=1.0, help='Above 1 concentrates completions on fewer players')
+        parser.add_argument('--seed', type=int)
+
+    def handle(self, *args, **options):
+        simulator = self._simulator(options)
+        if options['task_jumps']:
+            task_jumps = {int(jumps): 1 for jumps in options['task_jumps'].split(',')}
+        else:
+            task_jumps = current_task_jumps()
+
+        overrides = {}
+        for override in filter(None, (options['tier_jumps'] or '').split(',')):
+            tier, jumps = override.split('=')
+            if tier not in Floater.TIER_JUMPS:
+                raise CommandError(f'Unknown tier {tier}, expected one of {", ".join(Floater.TIER_JUMPS)}')
+            overrides[tier] = int(jumps)
+
+        sizes, weights = jump_sizes(task_jumps, tier_jumps(overrides), options['tier_share'])
+        if not len(sizes):
+            raise CommandError('No jump sizes to simulate, pass --task-jumps')
+
+        players, spaces = synthetic_completions(
+            simulator.size, options['completions'], sizes, weights, options['activity'], options['seed']
+        )
+        started = time.perf_counter()
+        start = simulator.run(players, spaces, options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        self._write_report(simulator.report(start), len(players), elapsed)
+
+    def _simulator(self, options):
+        if options['players']:
+            return QueueJumpSimulator(options['players'])
+
+        snapshot = LeaderboardSnapshot.objects.filter(
+            board=options['board'], completed_at__isnull=False
+        ).order_by('-created_at').first()
+        if snapshot is None:
+            raise CommandError(f'No completed snapshot of {options["board"]}, pass --players to simulate one')
+        return QueueJumpSimulator.from_snapshot(snapshot)
+
+    def _write_report(self, report, completions, elapsed):
+        rate = completions / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{completions} completions over {report["players"]} players in {elapsed:.2f}s ({rate:,.0f} jumps/s), '
+            f'{report["moved"]} players moved'
+        )
+        self.stdout.write('Positions gained: ' + ', '.join(f'p{p} {gain}' for p, gain in report['gains'].items()))
+
+        gain_columns = ''.join(f'{f"gain p{p}":>11}' for p in PERCENTILES)
+        self.stdout.write(f'{"start ranks":>23}{"mean gain":>11}{gain_columns}{"end p50":>11}')
+        for bucket in report['buckets']:
+            first, last = bucket['start_ranks']
+            gains = ''.join(f'{gain:>11}' for gain in bucket['gains'].values())
+            self.stdout.write(
+                f'{first:>11}-{last:<11}{bucket["mean_gain"]:>11.1f}{gains}{bucket["end_ranks"][50]:>11}'
+            )
+        for player_id, start, end in report.get('top_movers', []):
+            self.stdout.write(f'{player_id} moved from rank {start} to {end}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from apps.leaderboard.registry import GLOBAL_BOARD, get_leaderboard
+from apps.leaderboard.snapshots import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Copy a Redis leaderboard into Postgres so it can be rehydrated after a Redis restart'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--board', default=GLOBAL_BOARD)
+        parser.add_argument('--batch-size', type=int, default=10000)
+        parser.add_argument('--keep', type=int, default=2, help='Completed snapshots to keep per board')
+
+    def handle(self, *args, **options):
+        snapshot, elapsed = take_snapshot(
+            get_leaderboard(options['board']), batch_size=options['batch_size'], keep=options['keep']
+        )
+        rate = snapshot.players / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshot {snapshot.id}: {snapshot.players} players from {snapshot.board} '
+            f'in {elapsed:.1f}s ({rate:,.0f} players/s)'
+        ))
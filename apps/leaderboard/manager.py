@@ -1,37 +1,34 @@
 from .models import Leaderboard
 
 class RankingManager:
-    def __init__(self, leaderboard):
+    def __init__(self, leaderboard, scheduler=None):
         self.leaderboard = leaderboard
+        # Optional apps.leaderboard.scheduler.JumpScheduler for burst traffic.
+        # With one, jumps are queued and the initiator is updated when the
+        # scheduler's batch is applied rather than before this call returns.
+        self.scheduler = scheduler
 
-    def update_user_rank_by_spaces(self, initiator, spaces):
+    def update_user_rank_by_spaces(self, initiator, spaces, cause='jump'):
         player_id = initiator.team_id if initiator.team else initiator.user_id
-        
-        # Use leaderboard as source of truth for ranks and scores
-        current_score = self.leaderboard.get_player_score(player_id)
-        current_rank = self.leaderboard.get_player_rank(player_id)
 
-        if current_rank is None:
-            self._handle_missing_leaderboard_player(initiator, spaces)
+        if self.scheduler is not None:
+            self.scheduler.submit(
+                player_id, spaces, cause,
+                callback=lambda result: self._apply_jump_result(initiator, spaces, cause, result),
+            )
             return
 
-        target_rank = max(0, current_rank - spaces)
+        # Use leaderboard as source of truth for ranks and scores. The jump is
+        # recorded on the board's event stream by the same script.
+        self._apply_jump_result(initiator, spaces, cause, self.leaderboard.jump_player(player_id, spaces, cause))
 
-        new_score = self._calculate_points_to_rank(target_rank)
-        
-        if new_score is None:
-            new_score = current_score + 1
-
-        self._update_players_instance_values(initiator, spaces, target_rank, new_score)
-        self._update_players_leaderboard_score(player_id, new_score)
-
-    def _update_players_leaderboard_score(self, player_id, new_score):
-        self.leaderboard.update_player_score(player_id, new_score)
-
-    def _calculate_points_to_rank(self, target_rank):
-        target_score = self.leaderboard.get_score_at_rank(target_rank)
+    def _apply_jump_result(self, initiator, spaces, cause, result):
+        if result is None:
+            self._handle_missing_leaderboard_player(initiator, spaces, cause)
+            return
 
-        return target_score + 0.01 if target_score else None
+        new_rank, new_score = result
+        self._update_players_instance_values(initiator, spaces, new_rank, new_score)
 
     def _update_players_instance_values(self, initiator, spaces, target_rank, new_score):
         rank_update = {"rank": target_rank, "spaces": spaces}
@@ -43,9 +40,32 @@ class RankingManager:
             team.rank = target_rank
             team.score = new_score
 
-    def _handle_missing_leaderboard_player(self, initiator, spaces):
+    def _handle_missing_leaderboard_player(self, initiator, spaces, cause):
+        if initiator.team is None:
+            self.leaderboard.add_player(initiator.user_id, initiator.score or None)
+            self.update_user_rank_by_spaces(initiator, spaces, cause)
+        else:
+            raise Exception(f'{initiator.team.team_id} is missing from leaderboard')
+
+
+class AsyncRankingManager(RankingManager):
+    # RankingManager for an AsyncLeaderboard
+
+    async def update_user_rank_by_spaces(self, initiator, spaces, cause='jump'):
+        player_id = initiator.team_id if initiator.team else initiator.user_id
+
+        result = await self.leaderboard.jump_player(player_id, spaces, cause)
+
+        if result is None:
+            await self._handle_missing_leaderboard_player(initiator, spaces, cause)
+            return
+
+        new_rank, new_score = result
+        self._update_players_instance_values(initiator, spaces, new_rank, new_score)
+
+    async def _handle_missing_leaderboard_player(self, initiator, spaces, cause):
         if initiator.team is None:
-            self.leaderboard.add_player(initiator.user_id, initiator.score)
-            self.update_user_rank_by_spaces(initiator, spaces)
+            await self.leaderboard.add_player(initiator.user_id, initiator.score or None)
+            await self.update_user_rank_by_spaces(initiator, spaces, cause)
         else:
-            raise Exception(f'{initiator.team.team_id} is missing from leaderboard')
\ No newline at end of file
+            raise Exception(f'{initiator.team.team_id} is missing from leaderboard')
@@ -0,0 +1,430 @@
+import random
+from collections import deque
+from .scores import MAX_POINTS, SEQUENCE_SPAN, SEQUENCE_STRIDE
+
+# Pure Python stand-in for the Redis backed Leaderboard, for tests and offline
+# simulations that should not need a Redis server. Ranks, score encoding and
+# jump placement follow the Lua scripts in apps.leaderboard.scripts.
+
+NIL = -1
+HEAD = 0
+
+
+class SkipList:
+    # Order statistic skip list, laid out like Redis' own zskiplist: every
+    # level link stores its span so ranks are found in O(log n). Nodes live in
+    # parallel lists and are addressed by index, and freed slots are reused.
+    # Entries are kept in ascending (score, member) order.
+
+    MAX_LEVEL = 32
+    P = 0.25
+
+    def __init__(self, seed=None):
+        self._random = random.Random(seed)
+        self._scores = [0.0]
+        self._members = [None]
+        self._forward = [[NIL] * self.MAX_LEVEL]
+        self._span = [[0] * self.MAX_LEVEL]
+        self._free = []
+        self._level = 1
+        self._length = 0
+
+    def __len__(self):
+        return self._length
+
+    def _random_level(self):
+        level = 1
+        while level < self.MAX_LEVEL and self._random.random() < self.P:
+            level += 1
+        return level
+
+    def _new_node(self, level, score, member):
+        if self._free:
+            node = self._free.pop()
+            self._scores[node] = score
+            self._members[node] = member
+            self._forward[node] = [NIL] * level
+            self._span[node] = [0] * level
+            return node
+
+        self._scores.append(score)
+        self._members.append(member)
+        self._forward.append([NIL] * level)
+        self._span.append([0] * level)
+        return len(self._scores) - 1
+
+    def _before(self, node, score, member):
+        node_score = self._scores[node]
+        return node_score < score or (node_score == score and self._members[node] < member)
+
+    def _not_after(self, node, score, member):
+        node_score = self._scores[node]
+        return node_score < score or (node_score == score and self._members[node] <= member)
+
+    def insert(self, score, member):
+        # member must not already be in the list
+        update = [HEAD] * self.MAX_LEVEL
+        rank = [0] * self.MAX_LEVEL
+        forward, span = self._forward, self._span
+
+        node = HEAD
+        for i in range(self._level - 1, -1, -1):
+            rank[i] = 0 if i == self._level - 1 else rank[i + 1]
+            while forward[node][i] != NIL and self._before(forward[node][i], score, member):
+                rank[i] += span[node][i]
+                node = forward[node][i]
+            update[i] = node
+
+        level = self._random_level()
+        if level > self._level:
+            for i in range(self._level, level):
+                rank[i] = 0
+                update[i] = HEAD
+                span[HEAD][i] = self._length
+            self._level = level
+
+        node = self._new_node(level, score, member)
+        for i in range(level):
+            forward[node][i] = forward[update[i]][i]
+            forward[update[i]][i] = node
+            span[node][i] = span[update[i]][i] - (rank[0] - rank[i])
+            span[update[i]][i] = rank[0] - rank[i] + 1
+
+        for i in range(level, self._level):
+            span[update[i]][i] += 1
+
+        self._length += 1
+
+    def delete(self, score, member):
+        update = [HEAD] * self.MAX_LEVEL
+        forward, span = self._forward, self._span
+
+        node = HEAD
+        for i in range(self._level - 1, -1, -1):
+            while forward[node][i] != NIL and self._before(forward[node][i], score, member):
+                node = forward[node][i]
+            update[i] = node
+
+        node = forward[node][0]
+        if node == NIL or self._scores[node] != score or self._members[node] != member:
+            return False
+
+        for i in range(self._level):
+            if forward[update[i]][i] == node:
+                span[update[i]][i] += span[node][i] - 1
+                forward[update[i]][i] = forward[node][i]
+            else:
+                span[update[i]][i] -= 1
+
+        while self._level > 1 and forward[HEAD][self._level - 1] == NIL:
+            self._level -= 1
+
+        self._members[node] = None
+        self._free.append(node)
+        self._length -= 1
+        return True
+
+    def rank(self, score, member):
+        # 0-based position in ascending order, or None if missing
+        forward, span = self._forward, self._span
+        traversed = 0
+        node = HEAD
+        for i in range(self._level - 1, -1, -1):
+            while forward[node][i] != NIL and self._not_after(forward[node][i], score, member):
+                traversed += span[node][i]
+                node = forward[node][i]
+            if node != HEAD and self._members[node] == member:
+                return traversed - 1
+        return None
+
+    def count_below(self, score):
+        # Number of entries with a score strictly below score
+        forward, span = self._forward, self._span
+        traversed = 0
+        node = HEAD
+        for i in range(self._level - 1, -1, -1):
+            while forward[node][i] != NIL and self._scores[forward[node][i]] < score:
+                traversed += span[node][i]
+                node = forward[node][i]
+        return traversed
+
+    def _node_at(self, index):
+        forward, span = self._forward, self._span
+        traversed = 0
+        node = HEAD
+        for i in range(self._level - 1, -1, -1):
+            while forward[node][i] != NIL and traversed + span[node][i] <= index + 1:
+                traversed += span[node][i]
+                node = forward[node][i]
+            if traversed == index + 1:
+                return node
+        return NIL
+
+    def slice(self, start, stop):
+        # [(member, score)] for ascending positions start to stop inclusive
+        if start < 0 or start >= self._length or stop < start:
+            return []
+
+        entries = []
+        node = self._node_at(start)
+        for _ in range(min(stop, self._length - 1) - start + 1):
+            entries.append((self._members[node], self._scores[node]))
+            node = self._forward[node][0]
+        return entries
+
+
+class InMemoryLeaderboard:
+    # Drop-in for Leaderboard backed by a SkipList. Members are stored as
+    # strings like Redis does, but come back as str rather than bytes. Rank
+    # change events are kept on a capped deque in the shape of
+    # apps.leaderboard.events.parse_event.
+    #
+    # Teams work through team_registry(), which returns an
+    # apps.teams.memory.InMemoryTeamRegistry backed by form_team and
+    # disband_team below. There is no Redis connection, so the completion
+    # outbox, snapshots and the event reader still need the Redis Leaderboard.
+
+    JUMP_WINDOW = 16
+    EVENTS_MAXLEN = 100000
+
+    def __init__(self, name='leaderboard', chunk_size=1000, seed=None):
+        self.leaderboard = name
+        self.chunk_size = chunk_size
+        self.events = deque(maxlen=self.EVENTS_MAXLEN or None)
+        self.display_names = {}
+        self._sequence = 0
+        self._scores = {}
+        self._entries = SkipList(seed)
+
+    @property
+    def length(self):
+        return len(self._entries)
+
+    def team_registry(self):
+        from apps.teams.memory import InMemoryTeamRegistry
+
+        return InMemoryTeamRegistry(self)
+
+    def _encode(self, points):
+        # Like the Lua encode, only points and the sequence are range checked
+        if points > MAX_POINTS:
+            raise ValueError('leaderboard points exhausted, re-encode the board')
+        self._sequence += SEQUENCE_STRIDE
+        if self._sequence >= SEQUENCE_SPAN:
+            raise ValueError('leaderboard sequence exhausted, re-encode the board')
+        return float(points * SEQUENCE_SPAN + (SEQUENCE_SPAN - 1 - self._sequence))
+
+    def _record(self, player_id, old_rank, new_rank, score, cause):
+        if self.EVENTS_MAXLEN > 0:
+            self.events.append({
+                'player_id': player_id, 'old_rank': old_rank, 'new_rank': new_rank, 'score': score, 'cause': cause,
+            })
+
+    def _set(self, player_id, score):
+        old_score = self._scores.get(player_id)
+        if old_score is not None:
+            self._entries.delete(old_score, player_id)
+        self._scores[player_id] = score
+        self._entries.insert(score, player_id)
+
+    def _rank(self, player_id):
+        score = self._scores.get(player_id)
+        if score is None:
+            return None
+        return len(self._entries) - 1 - self._entries.rank(score, player_id)
+
+    def _range(self, start, stop):
+        # [(player_id, score)] from rank start to stop inclusive, best first
+        last = len(self._entries) - 1
+        if start > last or stop < start:
+            return []
+        return self._entries.slice(last - min(stop, last), last - start)[::-1]
+
+    def add_player(self, player_id, score=None, cause='join'):
+        player_id = str(player_id)
+        score = self._encode(0) if score is None else float(score)
+        old_rank = self._rank(player_id)
+        self._set(player_id, score)
+        self._record(player_id, old_rank, self._rank(player_id), score, cause)
+        return score
+
+    def delete_player(self, player_id):
+        player_id = str(player_id)
+        score = self._scores.pop(player_id, None)
+        if score is not None:
+            self._entries.delete(score, player_id)
+
+    def get_player_rank(self, player_id, withscores=False):
+        rank = self._rank(str(player_id))
+        if withscores and rank is not None:
+            return [rank, self._scores[str(player_id)]]
+        return rank
+
+    def get_player_score(self, player_id):
+        return self._scores.get(str(player_id))
+
+    def increment_player_score(self, score, player_id):
+        player_id = str(player_id)
+        new_score = self._scores.get(player_id, 0.0) + score
+        self._set(player_id, new_score)
+        return new_score
+
+    def get_player_by_rank(self, rank):
+        return self._range(rank, rank)
+
+    def get_score_at_rank(self, rank):
+        at_rank = self._range(rank, rank)
+        if not at_rank:
+            return None
+
+        _, score = at_rank[0]
+        if not score:
+            # The best negative score sits just below the zero scores
+            below_zero = self._entries.count_below(0)
+            if below_zero:
+                score = self._entries.slice(below_zero - 1, below_zero - 1)[0][1]
+
+        return score if score else None
+
+    def update_player_score(self, player_id, new_score, cause='update'):
+        player_id = str(player_id)
+        old_rank = self._rank(player_id)
+        if old_rank is None:
+            return None
+
+        self._set(player_id, float(new_score))
+        new_rank = self._rank(player_id)
+        self._record(player_id, old_rank, new_rank, self._scores[player_id], cause)
+        return new_rank
+
+    def jump_player(self, player_id, spaces, cause='jump'):
+        player_id = str(player_id)
+        rank = self._rank(player_id)
+        if rank is None:
+            return None
+
+        score = self._place(max(0, rank - spaces))
+        self._set(player_id, float(score))
+        new_rank = self._rank(player_id)
+        self._record(player_id, rank, new_rank, float(score), cause)
+        return new_rank, float(score)
+
+    def _place(self, target_rank):
+        # Same placement as the _PLACE script: the midpoint of the nearest gap
+        # at or above the target, else past everyone on the window's points.
+        # Past the end of the board it joins on zero points.
+        first_rank = max(0, target_rank - self.JUMP_WINDOW)
+        window = [score for _, score in self._range(first_rank, target_rank)]
+        if len(window) < target_rank - first_rank + 1:
+            return self._encode(0)
+
+        for below, above in zip(reversed(window), reversed(window[:-1])):
+            if above - below >= 2:
+                return below + (above - below) // 2
+        return self._encode(int(window[0]) // SEQUENCE_SPAN + 1)
+
+    def jump_players(self, jumps):
+        jumps = [(str(player_id), spaces, cause) for player_id, spaces, cause in jumps]
+        ranks = [self._rank(player_id) for player_id, _, _ in jumps]
+
+        # Same order as the JUMP_PLAYERS script, by target rank then current rank
+        def order(index):
+            rank, spaces = ranks[index], jumps[index][1]
+            return (-1, -1) if rank is None else (max(0, rank - spaces), rank)
+
+        results = [None] * len(jumps)
+        for index in sorted(range(len(jumps)), key=order):
+            results[index] = self.jump_player(*jumps[index])
+        return results
+
+    def form_team(self, team_id, member_ids, cause='team'):
+        # Same as the FORM_TEAM script without the registry: the team takes
+        # its best placed member's score and the members leave the board.
+        # Returns the team's (rank, score).
+        team_id, member_ids = str(team_id), [str(member_id) for member_id in member_ids]
+        scores = [self._scores[member_id] for member_id in member_ids if member_id in self._scores]
+        if not scores:
+            raise ValueError('None of the team members are on the leaderboard')
+
+        self.bulk_delete_players(member_ids)
+        self._set(team_id, max(scores))
+        rank = self._rank(team_id)
+        self._record(team_id, None, rank, max(scores), cause)
+        return rank, max(scores)
+
+    def disband_team(self, team_id, members, cause='disband'):
+        # Same as one team of the DISBAND_TEAMS script without the registry.
+        # members is [(member_id, rank)], rank None to take the team's place.
+        # Returns each member's (rank, score).
+        team_id = str(team_id)
+        team_rank, team_score = self._rank(team_id), self._scores.get(team_id)
+        self.delete_player(team_id)
+        above = self._range(team_rank - 1, team_rank - 1)[0][1] if team_rank else None
+
+        offset = 0
+        for member_id, member_rank in reversed(members):
+            if member_rank is not None:
+                score = self._place(member_rank)
+            elif team_score is not None and not (above is not None and team_score + offset >= above):
+                score = team_score + offset
+                offset += 1
+            else:
+                score = self._place(team_rank) if team_rank is not None else self._encode(0)
+            self._set(str(member_id), float(score))
+
+        placed = []
+        for member_id, _ in members:
+            rank, score = self._rank(str(member_id)), self._scores[str(member_id)]
+            self._record(str(member_id), None, rank, score, cause)
+            placed.append((rank, score))
+        return placed
+
+    def players_between(self, low, high):
+        # [(player_id, score)] with low <= score <= high, lowest first
+        start, end = self._entries.count_below(low), self._entries.count_below(high)
+        while end < len(self._entries) and self._entries.slice(end, end)[0][1] == high:
+            end += 1
+        return self._entries.slice(start, end - 1)
+
+    def top(self, offset=0, limit=10):
+        if limit <= 0:
+            return []
+        return self._page(offset, self._range(offset, offset + limit - 1))
+
+    def around(self, player_id, radius=5):
+        rank = self._rank(str(player_id))
+        if rank is None:
+            return None
+        start = max(0, rank - radius)
+        return self._page(start, self._range(start, rank + radius))
+
+    def _page(self, start, entries):
+        return [
+            (start + offset, player_id, score, self.display_names.get(player_id))
+            for offset, (player_id, score) in enumerate(entries)
+        ]
+
+    def cache_display_names(self, display_names):
+        self.display_names.update((str(player_id), name) for player_id, name in display_names.items())
+
+    def bulk_add_players(self, players, chunk_size=None):
+        items = players.items() if hasattr(players, 'items') else players
+        for player_id, score in items:
+            self._set(str(player_id), self._encode(0) if score is None else float(score))
+
+    def bulk_delete_players(self, player_ids, chunk_size=None):
+        for player_id in player_ids:
+            self.delete_player(player_id)
+
+    def bulk_get_ranks(self, player_ids, withscores=False, chunk_size=None):
+        player_ids = list(player_ids)
+        ranks = [self._rank(str(player_id)) for player_id in player_ids]
+        if withscores:
+            return [
+                (rank, self._scores[str(player_id)]) if rank is not None else None
+                for player_id, rank in zip(player_ids, ranks)
+            ]
+        return ranks
+
+    def bulk_get_scores(self, player_ids, chunk_size=None):
+        return [self._scores.get(str(player_id)) for player_id in player_ids]
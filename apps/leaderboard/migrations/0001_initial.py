@@ -0,0 +1,70 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("board", models.CharField(max_length=255)),
+                (
+                    "sequence",
+                    models.BigIntegerField(
+                        default=0,
+                        help_text="Value of the board's sequence counter when the snapshot completed.",
+                    ),
+                ),
+                ("players", models.PositiveBigIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("completed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["board", "-created_at"],
+                        name="leaderboard_board_456f7a_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="LeaderboardSnapshotEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("player_id", models.CharField(max_length=255)),
+                ("score", models.FloatField()),
+                (
+                    "snapshot",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="entries",
+                        to="leaderboard.leaderboardsnapshot",
+                    ),
+                ),
+            ],
+        ),
+    ]
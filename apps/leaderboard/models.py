@@ -1,27 +1,147 @@
+from itertools import islice
 from django.db import models
 from django_redis import get_redis_connection
+from .connections import get_async_redis_connection
+from .scores import SEQUENCE_SPAN, SEQUENCE_STRIDE, encode_score
+from .scripts import ADD_PLAYER, AROUND, JUMP_PLAYER, JUMP_PLAYERS, TOP, UPDATE_SCORE
 
-class Leaderboard:
-    _instance = None
+DISPLAY_NAMES = 'leaderboard:display_names'
 
-    def __new__(cls, *args, **kwargs):
-        if cls._instance is None:
-            cls._instance = super(Leaderboard, cls).__new__(cls)
-        return cls._instance
+class BaseLeaderboard:
+    # Redis keys, scripts and result parsing shared by the sync and async boards
 
-    def __init__(self, conn=None):
-        self.leaderboard = 'leaderboard'
-        self.conn = conn if conn else get_redis_connection("default")
-        self._length = self.conn.zcard(self.leaderboard)
+    # How far above the target rank a jump looks for a free score
+    JUMP_WINDOW = 16
+    # Approximate cap on the rank change stream, 0 stops recording events
+    EVENTS_MAXLEN = 100000
+
+    def __init__(self, conn, name='leaderboard', chunk_size=1000):
+        self.leaderboard = name
+        self.sequence = f'{name}:sequence'
+        self.events = f'{name}:events'
+        self.chunk_size = chunk_size
+        self.conn = conn
+        # register_script runs EVALSHA and reloads the script on NOSCRIPT
+        self._add_player = self.conn.register_script(ADD_PLAYER)
+        self._jump_player = self.conn.register_script(JUMP_PLAYER)
+        self._jump_players = self.conn.register_script(JUMP_PLAYERS)
+        self._update_score = self.conn.register_script(UPDATE_SCORE)
+        self._top = self.conn.register_script(TOP)
+        self._around = self.conn.register_script(AROUND)
+
+    def _add_player_args(self, player_id, score, cause):
+        return {
+            'keys': [self.leaderboard, self.sequence, self.events],
+            'args': [
+                player_id, SEQUENCE_SPAN, SEQUENCE_STRIDE,
+                '' if score is None else score, self.EVENTS_MAXLEN, cause,
+            ],
+        }
+
+    def _update_score_args(self, player_id, new_score, cause):
+        return {
+            'keys': [self.leaderboard, self.events],
+            'args': [player_id, new_score, self.EVENTS_MAXLEN, cause],
+        }
+
+    def _jump_player_args(self, player_id, spaces, cause):
+        return {
+            'keys': [self.leaderboard, self.sequence, self.events],
+            'args': [
+                player_id, SEQUENCE_SPAN, SEQUENCE_STRIDE,
+                spaces, self.JUMP_WINDOW, self.EVENTS_MAXLEN, cause,
+            ],
+        }
+
+    def _jump_players_args(self, jumps):
+        args = ['', SEQUENCE_SPAN, SEQUENCE_STRIDE, self.JUMP_WINDOW, self.EVENTS_MAXLEN]
+        for player_id, spaces, cause in jumps:
+            args.extend((player_id, spaces, cause))
+        return {'keys': [self.leaderboard, self.sequence, self.events], 'args': args}
+
+    def _jump_result(self, result):
+        if result is None:
+            return None
+
+        rank, score = result
+        return rank, float(score)
+
+    def _jump_results(self, results):
+        # The batch script marks players missing from the board with rank -1
+        return [
+            (rank, float(score)) if rank >= 0 else None
+            for rank, score in zip(results[::2], results[1::2])
+        ]
+
+    def _score_at_rank(self, at_rank, below_zero):
+        # The board is ordered high to low, so if the score at rank is zero the
+        # only non-zero scores left below it are negative ones.
+        if not at_rank:
+            return None
+
+        _, score = at_rank[0]
+        if not score and below_zero:
+            _, score = below_zero[0]
+
+        return score if score else None
+
+    def _page(self, result):
+        start, entries, display_names = result
+        player_ids, scores = entries[::2], entries[1::2]
+        return [
+            (start + offset, player_id, float(score), display_name)
+            for offset, (player_id, score, display_name)
+            in enumerate(zip(player_ids, scores, display_names))
+        ]
+
+    def _split_unscored(self, chunk):
+        unscored = [player_id for player_id, score in chunk if score is None]
+        mapping = {player_id: score for player_id, score in chunk if score is not None}
+        return unscored, mapping
+
+    def _queue_unscored(self, mapping, unscored, last_sequence):
+        # last_sequence is the counter value after reserving a block for unscored
+        first = last_sequence - (len(unscored) - 1) * SEQUENCE_STRIDE
+        mapping.update(
+            (player_id, encode_score(0, first + index * SEQUENCE_STRIDE))
+            for index, player_id in enumerate(unscored)
+        )
+        return mapping
+
+    def _rank_scores(self, ranks, withscores):
+        if withscores:
+            # ZREVRANK WITHSCORE replies with the score as a raw string
+            return [(rank[0], float(rank[1])) if rank else None for rank in ranks]
+        return ranks
+
+    def _chunks(self, iterable, chunk_size=None):
+        iterator = iter(iterable)
+        size = chunk_size or self.chunk_size
+        while chunk := list(islice(iterator, size)):
+            yield chunk
+
+
+class Leaderboard(BaseLeaderboard):
+    # Use apps.leaderboard.registry to share one instance per board name
+
+    def __init__(self, conn=None, name='leaderboard', chunk_size=1000):
+        super().__init__(conn if conn else get_redis_connection("default"), name, chunk_size)
 
     @property
     def length(self):
-        return self._length
+        # Read live so it never goes stale as players join and leave
+        return self.conn.zcard(self.leaderboard)
+
+    def team_registry(self):
+        # The registry TeamsManager keeps this board's teams in
+        from apps.teams.registry import TeamRegistry
+
+        return TeamRegistry(self.conn)
 
-    def add_player(self, player_id, score=None):
-        # Add the player to the main leaderboard
-        score = score or 0 #Default value
-        self.conn.zadd(self.leaderboard, {player_id:score})
+    def add_player(self, player_id, score=None, cause='join'):
+        # Add the player to the main leaderboard. Without a score new players
+        # start on zero points, queued behind everyone before them.
+        return float(self._add_player(**self._add_player_args(player_id, score, cause)))
 
     def delete_player(self, player_id):
         self.conn.zrem(self.leaderboard, player_id)
@@ -40,19 +160,174 @@ class Leaderboard:
         return self.conn.zrevrange(self.leaderboard, rank, rank, withscores=True)
 
     def get_score_at_rank(self, rank):
-        _, score = None, None
+        # Returns the first non-zero score at or below rank in one round trip
+        pipe = self.conn.pipeline(transaction=False)
+        pipe.zrevrange(self.leaderboard, rank, rank, withscores=True)
+        pipe.zrevrangebyscore(self.leaderboard, '(0', '-inf', start=0, num=1, withscores=True)
+        return self._score_at_rank(*pipe.execute())
 
-        while not score and rank < self.length:
-            _, score = self.get_player_by_rank(rank)[0]
-            rank += 1
-        
-        return score if score else None
+    def update_player_score(self, player_id, new_score, cause='update'):
+        # Returns the player's new rank, or None if they are not on the board
+        return self._update_score(**self._update_score_args(player_id, new_score, cause))
+
+    def jump_player(self, player_id, spaces, cause='jump'):
+        # Move the player up the board by spaces in one atomic round trip
+        return self._jump_result(self._jump_player(**self._jump_player_args(player_id, spaces, cause)))
+
+    def jump_players(self, jumps):
+        # Applies [(player_id, spaces, cause)] in one script call, in order of
+        # target rank. Results follow the order of jumps, None for missing players.
+        jumps = list(jumps)
+        if not jumps:
+            return []
+        return self._jump_results(self._jump_players(**self._jump_players_args(jumps)))
+
+    def top(self, offset=0, limit=10):
+        # Returns [(rank, player_id, score, display_name)] for one page of the board
+        if limit <= 0:
+            return []
+        return self._page(self._top(keys=[self.leaderboard, DISPLAY_NAMES], args=[offset, limit]))
+
+    def around(self, player_id, radius=5):
+        # Returns the players up to radius ranks either side of player_id, or None if missing
+        result = self._around(keys=[self.leaderboard, DISPLAY_NAMES], args=[player_id, radius])
+        return self._page(result) if result is not None else None
+
+    def cache_display_names(self, display_names):
+        if display_names:
+            self.conn.hset(DISPLAY_NAMES, mapping=display_names)
+
+    def bulk_add_players(self, players, chunk_size=None):
+        # Accepts a {player_id: score} mapping or an iterable of (player_id, score).
+        # Players with a None score join at the back of the queue.
+        items = players.items() if hasattr(players, 'items') else players
+        for chunk in self._chunks(items, chunk_size):
+            unscored, mapping = self._split_unscored(chunk)
+            if unscored:
+                # Reserve a block of sequence numbers for the new players in one call
+                last = self.conn.incrby(self.sequence, len(unscored) * SEQUENCE_STRIDE)
+                self._queue_unscored(mapping, unscored, last)
+            self.conn.zadd(self.leaderboard, mapping)
 
-    def update_player_score(self, player_id, new_score):
-        self.conn.zadd(self.leaderboard, {player_id: new_score}, xx=True)
+    def bulk_delete_players(self, player_ids, chunk_size=None):
+        for chunk in self._chunks(player_ids, chunk_size):
+            self.conn.zrem(self.leaderboard, *chunk)
+
+    def bulk_get_ranks(self, player_ids, withscores=False, chunk_size=None):
+        # Ranks are returned in the same order as player_ids, None for missing players
+        ranks = []
+        pipe = self.conn.pipeline(transaction=False)
+        for chunk in self._chunks(player_ids, chunk_size):
+            for player_id in chunk:
+                pipe.zrevrank(self.leaderboard, player_id, withscores)
+            ranks.extend(pipe.execute())
+        return self._rank_scores(ranks, withscores)
+
+    def bulk_get_scores(self, player_ids, chunk_size=None):
+        # Scores are returned in the same order as player_ids, None for missing players
+        scores = []
+        for chunk in self._chunks(player_ids, chunk_size):
+            scores.extend(self.conn.zmscore(self.leaderboard, chunk))
+        return scores
+
+
+class AsyncLeaderboard(BaseLeaderboard):
+    # Same surface as Leaderboard for use from async views and resolvers.
+    # Each instance uses the connection pool of the event loop it was made in.
+
+    def __init__(self, conn=None, name='leaderboard', chunk_size=1000):
+        super().__init__(conn if conn else get_async_redis_connection("default"), name, chunk_size)
+
+    @property
+    def length(self):
+        # Awaitable: `await leaderboard.length`
+        return self.conn.zcard(self.leaderboard)
+
+    async def add_player(self, player_id, score=None, cause='join'):
+        return float(await self._add_player(**self._add_player_args(player_id, score, cause)))
+
+    async def delete_player(self, player_id):
+        await self.conn.zrem(self.leaderboard, player_id)
+
+    async def get_player_rank(self, player_id, withscores=False):
+        return await self.conn.zrevrank(self.leaderboard, player_id, withscores)
+
+    async def get_player_score(self, player_id):
+        return await self.conn.zscore(self.leaderboard, player_id)
+
+    async def increment_player_score(self, score, player_id):
+        return await self.conn.zincrby(self.leaderboard, score, player_id)
+
+    async def get_player_by_rank(self, rank):
+        return await self.conn.zrevrange(self.leaderboard, rank, rank, withscores=True)
+
+    async def get_score_at_rank(self, rank):
+        pipe = self.conn.pipeline(transaction=False)
+        pipe.zrevrange(self.leaderboard, rank, rank, withscores=True)
+        pipe.zrevrangebyscore(self.leaderboard, '(0', '-inf', start=0, num=1, withscores=True)
+        return self._score_at_rank(*await pipe.execute())
+
+    async def update_player_score(self, player_id, new_score, cause='update'):
+        return await self._update_score(**self._update_score_args(player_id, new_score, cause))
+
+    async def jump_player(self, player_id, spaces, cause='jump'):
+        return self._jump_result(
+            await self._jump_player(**self._jump_player_args(player_id, spaces, cause))
+        )
+
+    async def jump_players(self, jumps):
+        jumps = list(jumps)
+        if not jumps:
+            return []
+        return self._jump_results(await self._jump_players(**self._jump_players_args(jumps)))
+
+    async def top(self, offset=0, limit=10):
+        if limit <= 0:
+            return []
+        return self._page(await self._top(keys=[self.leaderboard, DISPLAY_NAMES], args=[offset, limit]))
+
+    async def around(self, player_id, radius=5):
+        result = await self._around(keys=[self.leaderboard, DISPLAY_NAMES], args=[player_id, radius])
+        return self._page(result) if result is not None else None
+
+    async def cache_display_names(self, display_names):
+        if display_names:
+            await self.conn.hset(DISPLAY_NAMES, mapping=display_names)
+
+    async def bulk_add_players(self, players, chunk_size=None):
+        items = players.items() if hasattr(players, 'items') else players
+        for chunk in self._chunks(items, chunk_size):
+            unscored, mapping = self._split_unscored(chunk)
+            if unscored:
+                last = await self.conn.incrby(self.sequence, len(unscored) * SEQUENCE_STRIDE)
+                self._queue_unscored(mapping, unscored, last)
+            await self.conn.zadd(self.leaderboard, mapping)
+
+    async def bulk_delete_players(self, player_ids, chunk_size=None):
+        for chunk in self._chunks(player_ids, chunk_size):
+            await self.conn.zrem(self.leaderboard, *chunk)
+
+    async def bulk_get_ranks(self, player_ids, withscores=False, chunk_size=None):
+        ranks = []
+        pipe = self.conn.pipeline(transaction=False)
+        for chunk in self._chunks(player_ids, chunk_size):
+            for player_id in chunk:
+                pipe.zrevrank(self.leaderboard, player_id, withscores)
+            ranks.extend(await pipe.execute())
+        return self._rank_scores(ranks, withscores)
+
+    async def bulk_get_scores(self, player_ids, chunk_size=None):
+        scores = []
+        for chunk in self._chunks(player_ids, chunk_size):
+            scores.extend(await self.conn.zmscore(self.leaderboard, chunk))
+        return scores
 
     
 class Player:
+    # Slotted to keep large in-memory simulations small, see also
+    # apps.leaderboard.tables.PlayerTable
+    __slots__ = ('user_id', '_score', '_rank', '_team')
+
     def __init__(self, user_id):
         self.user_id = user_id
         self._score = 0.0
@@ -107,4 +382,26 @@ class Player:
             self._score = score
             self._team = None
         else:
-            raise Exception('This player is not on a team')
\ No newline at end of file
+            raise Exception('This player is not on a team')
+
+class LeaderboardSnapshot(models.Model):
+    board = models.CharField(max_length=255)
+    sequence = models.BigIntegerField(
+        default=0, help_text="Value of the board's sequence counter when the snapshot completed."
+    )
+    players = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=["board", "-created_at"])]
+
+    def __str__(self):
+        return f"{self.board} at {self.created_at}"
+
+
+class LeaderboardSnapshotEntry(models.Model):
+    # Written with COPY, so rows are only ever inserted in bulk
+    snapshot = models.ForeignKey(LeaderboardSnapshot, on_delete=models.CASCADE, related_name="entries")
+    player_id = models.CharField(max_length=255)
+    score = models.FloatField()
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+import weakref
+from django_redis import get_redis_connection
+from .models import AsyncLeaderboard, Leaderboard
+
+GLOBAL_BOARD = 'leaderboard'
+
+
+def board_name(scope=None, value=None):
+    # board_name() -> 'leaderboard', board_name('country', 'GB') -> 'leaderboard:country:GB'
+    if scope is None:
+        return GLOBAL_BOARD
+    return f'{GLOBAL_BOARD}:{scope}:{value}'
+
+
+class LeaderboardRegistry:
+    # Hands out one board per name. Sync boards share one Redis connection
+    # pool, and async boards share the pool of their event loop.
+
+    def __init__(self, conn=None):
+        self._conn = conn
+        self._boards = {}
+        self._async_boards = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def get(self, name=GLOBAL_BOARD):
+        board = self._boards.get(name)
+        if board is None:
+            with self._lock:
+                if self._conn is None:
+                    self._conn = get_redis_connection("default")
+                board = self._boards.setdefault(name, Leaderboard(self._conn, name=name))
+        return board
+
+    def get_async(self, name=GLOBAL_BOARD):
+        boards = self._async_boards.setdefault(asyncio.get_running_loop(), {})
+        if name not in boards:
+            boards[name] = AsyncLeaderboard(name=name)
+        return boards[name]
+
+    def names(self):
+        return list(self._boards)
+
+
+leaderboards = LeaderboardRegistry()
+
+
+def get_leaderboard(name=GLOBAL_BOARD):
+    return leaderboards.get(name)
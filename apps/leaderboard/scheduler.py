@@ -0,0 +1,117 @@
+import logging
+import threading
+from itertools import islice
+
+logger = logging.getLogger(__name__)
+
+
+class JumpScheduler:
+    # Buffers jumps for a tick and applies them to the board in one script call
+    # per batch, so bursts cost one round trip per tick instead of one per jump.
+    # Jumps by the same player within a tick are merged into a single jump of
+    # their combined spaces.
+
+    def __init__(self, leaderboard, tick=0.05, max_batch=1000):
+        self.leaderboard = leaderboard
+        self.tick = tick
+        self.max_batch = max_batch
+        # player_id -> [spaces, causes, callbacks], in order of first submission
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def pending(self):
+        return len(self._pending)
+
+    def submit(self, player_id, spaces, cause='jump', callback=None):
+        # callback is called with the player's (rank, score), or None if they are
+        # not on the board, once the batch holding the jump has been applied
+        with self._lock:
+            pending = self._pending.get(player_id)
+            if pending is None:
+                pending = self._pending[player_id] = [0, [], []]
+            pending[0] += spaces
+            if cause not in pending[1]:
+                pending[1].append(cause)
+            if callback:
+                pending[2].append(callback)
+            full = len(self._pending) >= self.max_batch
+
+        if full:
+            self.flush()
+
+    def flush(self):
+        # Applies everything submitted so far. Returns {player_id: result}. If
+        # a batch fails, it and the batches after it are queued again for the
+        # next flush, callbacks run for the batches that were applied and the
+        # error is raised.
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+
+            results, error = {}, None
+            items = iter(pending.items())
+            while batch := list(islice(items, self.max_batch)):
+                jumps = [(player_id, spaces, ','.join(causes)) for player_id, (spaces, causes, _) in batch]
+                try:
+                    applied = self.leaderboard.jump_players(jumps)
+                except Exception as e:
+                    self._requeue([*batch, *items])
+                    error = e
+                    break
+                results.update(zip((player_id for player_id, _ in batch), applied))
+
+        for player_id, result in results.items():
+            for callback in pending[player_id][2]:
+                try:
+                    callback(result)
+                except Exception:
+                    logger.exception('Jump callback for %s failed', player_id)
+        if error is not None:
+            raise error
+        return results
+
+    def _requeue(self, unapplied):
+        # Puts unapplied jumps back ahead of those submitted since, merging
+        # jumps by the same player
+        with self._lock:
+            requeued = dict(unapplied)
+            for player_id, (spaces, causes, callbacks) in self._pending.items():
+                pending = requeued.setdefault(player_id, [0, [], []])
+                pending[0] += spaces
+                pending[1].extend(cause for cause in causes if cause not in pending[1])
+                pending[2].extend(callbacks)
+            self._pending = requeued
+
+    def start(self):
+        # Flushes every tick on a background thread until stop is called
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='jump-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stopped.set()
+        self._thread.join()
+        self._thread = None
+        self.flush()
+
+    def _run(self):
+        while not self._stopped.wait(self.tick):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to apply queued leaderboard jumps')
@@ -0,0 +1,31 @@
+# Leaderboard scores are integers packing points with a tiebreaker so that no
+# two players share a score and ranks never depend on float rounding.
+#
+#   score = points * SEQUENCE_SPAN + (SEQUENCE_SPAN - 1 - sequence)
+#
+# More points rank higher. On equal points the player with the earlier
+# sequence number (the one who joined or jumped first) ranks higher. Scores
+# stay below 2 ** 53 so Redis stores them exactly as doubles.
+#
+# Sequence numbers are handed out SEQUENCE_STRIDE apart. The unused integers
+# between neighbours let a jump land exactly between two players by taking
+# the midpoint of their scores.
+
+SCORE_BITS = 53
+SEQUENCE_BITS = 36
+SEQUENCE_SPAN = 1 << SEQUENCE_BITS
+SEQUENCE_STRIDE = 1 << 8
+MAX_POINTS = (1 << (SCORE_BITS - SEQUENCE_BITS)) - 1
+
+
+def encode_score(points, sequence):
+    if not 0 <= points <= MAX_POINTS:
+        raise ValueError(f'Points must be between 0 and {MAX_POINTS}')
+    if not 0 <= sequence < SEQUENCE_SPAN:
+        raise ValueError(f'Sequence must be between 0 and {SEQUENCE_SPAN - 1}')
+    return points * SEQUENCE_SPAN + (SEQUENCE_SPAN - 1 - sequence)
+
+
+def decode_score(score):
+    points, tiebreak = divmod(int(score), SEQUENCE_SPAN)
+    return points, SEQUENCE_SPAN - 1 - tiebreak
@@ -0,0 +1,207 @@
+# Lua scripts run server-side by the leaderboard so that multi-step updates
+# happen atomically and in a single round trip.
+
+# Hands out the next tiebreak sequence number and packs it with points,
+# mirroring apps.leaderboard.scores.encode_score. ARGV[2] is the sequence span
+# and ARGV[3] the stride between sequence numbers. Points past MAX_POINTS
+# would take scores past 2^53, where doubles stop being exact.
+_ENCODE = """
+local span = tonumber(ARGV[2])
+local stride = tonumber(ARGV[3])
+local max_points = math.floor(2 ^ 53 / span) - 1
+
+local function encode(points)
+    if points > max_points then
+        return redis.error_reply('leaderboard points exhausted, re-encode the board')
+    end
+    local sequence = redis.call('INCRBY', KEYS[2], stride)
+    if sequence >= span then
+        return redis.error_reply('leaderboard sequence exhausted, re-encode the board')
+    end
+    return points * span + (span - 1 - sequence)
+end
+"""
+
+# Appends a rank change to the board's capped event stream. A maxlen of 0
+# turns events off.
+_RECORD = """
+local function record(stream, maxlen, player_id, old_rank, new_rank, score, cause)
+    if maxlen > 0 then
+        redis.call('XADD', stream, 'MAXLEN', '~', maxlen, '*',
+            'p', player_id, 'o', old_rank or '', 'n', new_rank, 's', score, 'c', cause)
+    end
+end
+"""
+
+# KEYS[1] leaderboard, KEYS[2] sequence counter, KEYS[3] event stream
+# ARGV[1] player id, ARGV[2] sequence span, ARGV[3] sequence stride,
+# ARGV[4] score or an empty string, ARGV[5] event stream maxlen, ARGV[6] cause
+# Without a score the player joins on zero points, behind everyone before them.
+# Returns the player's score.
+ADD_PLAYER = _ENCODE + _RECORD + """
+local score = ARGV[4]
+if score == '' then
+    score = encode(0)
+    if type(score) == 'table' then
+        return score
+    end
+end
+
+local old_rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[1], score, ARGV[1])
+score = redis.call('ZSCORE', KEYS[1], ARGV[1])
+
+record(KEYS[3], tonumber(ARGV[5]), ARGV[1], old_rank, redis.call('ZREVRANK', KEYS[1], ARGV[1]), score, ARGV[6])
+return score
+"""
+
+# KEYS[1] leaderboard, KEYS[2] event stream
+# ARGV[1] player id, ARGV[2] new score, ARGV[3] event stream maxlen, ARGV[4] cause
+# Only updates players already on the board. Returns the new rank or nil.
+UPDATE_SCORE = _RECORD + """
+local old_rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+if not old_rank then
+    return false
+end
+
+redis.call('ZADD', KEYS[1], 'XX', ARGV[2], ARGV[1])
+local new_rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+
+record(KEYS[2], tonumber(ARGV[3]), ARGV[1], old_rank, new_rank, redis.call('ZSCORE', KEYS[1], ARGV[1]), ARGV[4])
+return new_rank
+"""
+
+# Finds a free score on the leaderboard in KEYS[1] that ranks just above
+# whoever holds target_rank: the integer halfway between them and the player
+# above. If they are adjacent integers it uses the nearest gap further up the
+# window, and with nothing above or no gap it moves past everyone on the top
+# points of the window. Past the end of the board it joins on zero points.
+# Returns an error reply when the sequence is exhausted.
+_PLACE = """
+local function place(target_rank, window)
+    local first_rank = math.max(0, target_rank - window)
+    local entries = redis.call('ZREVRANGE', KEYS[1], first_rank, target_rank, 'WITHSCORES')
+    if #entries < 2 * (target_rank - first_rank + 1) then
+        return encode(0)
+    end
+
+    for i = #entries, 4, -2 do
+        local below, above = tonumber(entries[i]), tonumber(entries[i - 2])
+        if above - below >= 2 then
+            return below + math.floor((above - below) / 2)
+        end
+    end
+    return encode(math.floor(tonumber(entries[2]) / span) + 1)
+end
+"""
+
+# Moves a player up by spaces. KEYS[1] is the leaderboard and KEYS[3] the
+# event stream. Returns {new rank, new score}, false when the player is not
+# on the board, or an error reply when the sequence is exhausted.
+_JUMP = """
+local function jump(player_id, spaces, window, maxlen, cause)
+    local rank = redis.call('ZREVRANK', KEYS[1], player_id)
+    if not rank then
+        return false
+    end
+
+    local score = place(math.max(0, rank - spaces), window)
+    if type(score) == 'table' then
+        return score
+    end
+
+    redis.call('ZADD', KEYS[1], 'XX', score, player_id)
+    local new_rank = redis.call('ZREVRANK', KEYS[1], player_id)
+    score = redis.call('ZSCORE', KEYS[1], player_id)
+
+    record(KEYS[3], maxlen, player_id, rank, new_rank, score, cause)
+    return {new_rank, score}
+end
+"""
+
+# KEYS[1] leaderboard, KEYS[2] sequence counter, KEYS[3] event stream
+# ARGV[1] player id, ARGV[2] sequence span, ARGV[3] sequence stride,
+# ARGV[4] spaces to jump, ARGV[5] how many ranks above the target to search,
+# ARGV[6] event stream maxlen, ARGV[7] cause
+# Returns {new rank, new score} or nil when the player is not on the board.
+JUMP_PLAYER = _ENCODE + _RECORD + _PLACE + _JUMP + """
+return jump(ARGV[1], tonumber(ARGV[4]), tonumber(ARGV[5]), tonumber(ARGV[6]), ARGV[7])
+"""
+
+# KEYS[1] leaderboard, KEYS[2] sequence counter, KEYS[3] event stream
+# ARGV[1] unused, ARGV[2] sequence span, ARGV[3] sequence stride,
+# ARGV[4] how many ranks above the target to search, ARGV[5] event stream maxlen,
+# then player id, spaces and cause for each jump from ARGV[6]
+# Applies the jumps in order of target rank, highest first. Returns a flat
+# list with the new rank and score of each jump in argument order, or -1 and
+# an empty string for players not on the board.
+JUMP_PLAYERS = _ENCODE + _RECORD + _PLACE + _JUMP + """
+local window, maxlen = tonumber(ARGV[4]), tonumber(ARGV[5])
+
+local jumps = {}
+for i = 6, #ARGV, 3 do
+    local spaces = tonumber(ARGV[i + 1])
+    local rank = redis.call('ZREVRANK', KEYS[1], ARGV[i])
+    jumps[#jumps + 1] = {
+        player_id = ARGV[i], spaces = spaces, cause = ARGV[i + 2],
+        rank = rank or -1, target = rank and math.max(0, rank - spaces) or -1,
+        index = #jumps + 1,
+    }
+end
+
+table.sort(jumps, function(a, b)
+    if a.target ~= b.target then
+        return a.target < b.target
+    end
+    return a.rank < b.rank
+end)
+
+local results = {}
+for _, j in ipairs(jumps) do
+    local result = jump(j.player_id, j.spaces, window, maxlen, j.cause)
+    if type(result) == 'table' and result.err then
+        return result
+    end
+    results[2 * j.index - 1] = result and result[1] or -1
+    results[2 * j.index] = result and result[2] or ''
+end
+return results
+"""
+
+# Shared by TOP and AROUND: reads a slice of the board together with the
+# cached display names of the players in it.
+_PAGE = """
+local function page(start, stop)
+    local entries = redis.call('ZREVRANGE', KEYS[1], start, stop, 'WITHSCORES')
+    if #entries == 0 then
+        return {start, {}, {}}
+    end
+
+    local player_ids = {}
+    for i = 1, #entries, 2 do
+        player_ids[#player_ids + 1] = entries[i]
+    end
+    return {start, entries, redis.call('HMGET', KEYS[2], unpack(player_ids))}
+end
+"""
+
+# KEYS[1] leaderboard, KEYS[2] display name hash
+# ARGV[1] offset, ARGV[2] limit
+# Returns {first rank, flat member/score list, display names}.
+TOP = _PAGE + """
+local offset = tonumber(ARGV[1])
+return page(offset, offset + tonumber(ARGV[2]) - 1)
+"""
+
+# KEYS[1] leaderboard, KEYS[2] display name hash
+# ARGV[1] player id, ARGV[2] radius
+# Returns the same shape as TOP, or nil when the player is not on the board.
+AROUND = _PAGE + """
+local rank = redis.call('ZREVRANK', KEYS[1], ARGV[1])
+if not rank then
+    return false
+end
+
+local radius = tonumber(ARGV[2])
+return page(math.max(0, rank - radius), rank + radius)
+"""
@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from .registry import GLOBAL_BOARD, get_leaderboard
+
+TEAM_ID_SEPARATOR = '_'
+
+
+class LeaderboardService:
+    MAX_PAGE_SIZE = 100
+    MAX_RADIUS = 25
+
+    @classmethod
+    def get_page(cls, offset=0, limit=10, board=GLOBAL_BOARD):
+        leaderboard = get_leaderboard(board)
+        rows = leaderboard.top(max(0, offset), min(limit, cls.MAX_PAGE_SIZE))
+        return cls._with_display_names(leaderboard, rows)
+
+    @classmethod
+    def get_around(cls, player_id, radius=5, board=GLOBAL_BOARD):
+        leaderboard = get_leaderboard(board)
+        rows = leaderboard.around(player_id, min(max(0, radius), cls.MAX_RADIUS))
+        return cls._with_display_names(leaderboard, rows) if rows is not None else []
+
+    @staticmethod
+    def _with_display_names(leaderboard, rows):
+        rows = [
+            {
+                'rank': rank,
+                'player_id': _decode(player_id),
+                'score': score,
+                'display_name': _decode(display_name),
+            }
+            for rank, player_id, score, display_name in rows
+        ]
+
+        # Names missing from the cache are loaded with one user query and cached.
+        # Team ids are made of their members' user ids.
+        missing = {
+            row['player_id']: row['player_id'].split(TEAM_ID_SEPARATOR)
+            for row in rows if row['display_name'] is None
+        }
+        if not missing:
+            return rows
+
+        user_ids = {user_id for user_ids in missing.values() for user_id in user_ids if user_id.isdigit()}
+        users = get_user_model().objects.filter(id__in=user_ids).values_list('id', 'first_name', 'last_name')
+        user_names = {str(user_id): f'{first_name} {last_name[:1]}.' for user_id, first_name, last_name in users}
+
+        display_names = {
+            player_id: ' & '.join(user_names[user_id] for user_id in user_ids)
+            for player_id, user_ids in missing.items()
+            if all(user_id in user_names for user_id in user_ids)
+        }
+        leaderboard.cache_display_names(display_names)
+
+        for row in rows:
+            row['display_name'] = row['display_name'] or display_names.get(row['player_id'])
+        return rows
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
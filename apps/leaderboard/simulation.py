@@ -0,0 +1,152 @@
+import numpy as np
+
+# What-if simulation of queue jumps over a whole board, without Redis.
+#
+# The board is a permutation: ranks[row] is the rank of the player in that
+# row. Jumps are applied in batches. Within a batch every jump is measured
+# from the ranks at the start of the batch and jumps by the same player are
+# merged, as the JumpScheduler does. Each jumper lands just above the player
+# who held their target rank, ties going to the better target and then the
+# better starting rank, which is the order the JUMP_PLAYERS script uses.
+
+PERCENTILES = (10, 50, 90, 99)
+
+
+class QueueJumpSimulator:
+
+    def __init__(self, size, player_ids=None):
+        # player_ids optionally names the player in each row
+        self.size = size
+        self.ranks = np.arange(size, dtype=np.int64)
+        self.player_ids = None if player_ids is None else np.asarray(player_ids, dtype=object)
+
+    @classmethod
+    def from_snapshot(cls, snapshot, batch_size=10000):
+        # Loads the snapshot's players best first, in the order ZREVRANGE
+        # returns them, so row i is the player who was at rank i
+        entries = snapshot.entries.order_by('-score', '-player_id').values_list('player_id', flat=True)
+        player_ids = list(entries.iterator(chunk_size=batch_size))
+        return cls(len(player_ids), player_ids)
+
+    def rows_of(self, player_ids):
+        # Rows of the given players, for replaying jumps by real players
+        rows = {player_id: row for row, player_id in enumerate(self.player_ids)}
+        return np.array([rows[str(player_id)] for player_id in player_ids], dtype=np.int64)
+
+    def apply(self, players, spaces):
+        # Applies one batch of jumps. players are rows, spaces how far each jumps.
+        # A batch costs O(size) whatever its length, so prefer large batches.
+        size = self.size
+        spaces = np.bincount(players, weights=spaces, minlength=size).astype(np.int64)
+        jumpers = np.flatnonzero(spaces)
+        if not len(jumpers):
+            return
+
+        old = self.ranks[jumpers]
+        targets = np.maximum(old - spaces[jumpers], 0)
+
+        # jumpers_before[r]: jumpers that started above rank r.
+        # targets_upto[r]: jumpers landing at or above rank r.
+        jumpers_before = np.zeros(size + 1, dtype=np.int64)
+        jumpers_before[old + 1] = 1
+        jumpers_before = np.cumsum(jumpers_before[:size])
+        targets_upto = np.cumsum(np.bincount(targets, minlength=size))
+
+        # Everyone else moves down one for each jumper that passed them
+        ranks = self.ranks - jumpers_before[self.ranks] + targets_upto[self.ranks]
+
+        # A jumper lands behind everyone who stayed above their target and
+        # behind the jumpers ordered ahead of them
+        order = np.lexsort((old, targets))
+        ahead = np.empty(len(jumpers), dtype=np.int64)
+        ahead[order] = np.arange(len(jumpers))
+        ranks[jumpers] = targets - jumpers_before[targets] + ahead
+
+        self.ranks = ranks
+
+    def run(self, players, spaces, batch_size=100000):
+        # Applies a stream of jumps batch by batch and returns the starting ranks
+        start = self.ranks.copy()
+        for offset in range(0, len(players), batch_size):
+            self.apply(players[offset:offset + batch_size], spaces[offset:offset + batch_size])
+        return start
+
+    def report(self, start, buckets=10):
+        # Positions gained overall and for each slice of the starting board
+        gains = start - self.ranks
+        edges = np.linspace(0, self.size, buckets + 1).astype(np.int64)
+        bucket = np.searchsorted(edges, start, side='right') - 1
+        report = {
+            'players': self.size,
+            'moved': int(np.count_nonzero(gains)),
+            'gains': _percentiles(gains),
+            'buckets': [
+                {
+                    'start_ranks': (int(edges[i]), int(edges[i + 1]) - 1),
+                    'mean_gain': float(gains[bucket == i].mean()) if np.any(bucket == i) else 0.0,
+                    'gains': _percentiles(gains[bucket == i]),
+                    'end_ranks': _percentiles(self.ranks[bucket == i]),
+                }
+                for i in range(buckets)
+            ],
+        }
+        if self.player_ids is not None:
+            # The players who gained most, as (player id, start rank, end rank)
+            movers = np.argsort(-gains, kind='stable')[:10]
+            report['top_movers'] = [
+                (self.player_ids[row], int(start[row]), int(self.ranks[row])) for row in movers if gains[row] > 0
+            ]
+        return report
+
+
+def jump_sizes(task_jumps, tier_jumps, tier_share=0.1):
+    # Jump sizes and the chance of each. task_jumps and tier_jumps map a jump
+    # size to how often it happens, tier jumps making up tier_share of all jumps.
+    sizes, weights = [], []
+    for jumps, share in ((task_jumps, 1 - tier_share), (tier_jumps, tier_share)):
+        total = sum(jumps.values())
+        if not total or not share:
+            continue
+        for size, weight in jumps.items():
+            sizes.append(size)
+            weights.append(share * weight / total)
+
+    weights = np.asarray(weights)
+    return np.asarray(sizes, dtype=np.int64), weights / weights.sum()
+
+
+def current_task_jumps():
+    # queue_jumps of the live tasks, weighted by how often each has been completed
+    from apps.tasks.models import Tasks
+
+    task_jumps = {}
+    for queue_jumps, completions in Tasks.objects.values_list('queue_jumps', 'total_global_completions'):
+        task_jumps[queue_jumps] = task_jumps.get(queue_jumps, 0) + max(completions, 1)
+    return task_jumps
+
+
+def tier_jumps(overrides=None):
+    # Floater.TIER_JUMPS with overrides by tier, each tier equally likely
+    from apps.floaters.models import Floater
+
+    tiers = {**Floater.TIER_JUMPS, **(overrides or {})}
+    jumps = {}
+    for size in tiers.values():
+        jumps[size] = jumps.get(size, 0) + 1
+    return jumps
+
+
+def synthetic_completions(size, count, sizes, weights, activity=1.0, seed=None):
+    # Draws count completions as (rows, spaces). activity above 1 concentrates
+    # completions on a smaller set of players, who are spread over the board.
+    rng = np.random.default_rng(seed)
+    active = rng.permutation(size)
+    players = active[(size * rng.random(count) ** activity).astype(np.int64)]
+    spaces = sizes[rng.choice(len(sizes), size=count, p=weights)]
+    return players, spaces
+
+
+def _percentiles(values):
+    if not len(values):
+        return {p: 0 for p in PERCENTILES}
+    return dict(zip(PERCENTILES, np.percentile(values, PERCENTILES).round().astype(int).tolist()))
@@ -0,0 +1,80 @@
+import csv
+import io
+import time
+from itertools import islice
+from django.db import connection
+from django.utils import timezone
+from .models import LeaderboardSnapshot, LeaderboardSnapshotEntry
+
+COPY_ENTRIES = "COPY {table} (snapshot_id, player_id, score) FROM STDIN WITH (FORMAT csv)"
+
+
+def take_snapshot(leaderboard, batch_size=10000, keep=2):
+    # Streams the board into Postgres with ZSCAN and COPY. ZSCAN is not a
+    # point-in-time read and may return a player twice; rehydrating with
+    # ZADD makes both harmless.
+    started = time.perf_counter()
+    conn = leaderboard.conn
+    snapshot = LeaderboardSnapshot.objects.create(board=leaderboard.leaderboard)
+
+    players = conn.zscan_iter(leaderboard.leaderboard, count=batch_size)
+    copy_sql = COPY_ENTRIES.format(table=LeaderboardSnapshotEntry._meta.db_table)
+
+    with connection.cursor() as cursor:
+        while batch := list(islice(players, batch_size)):
+            buffer = io.StringIO()
+            csv.writer(buffer).writerows(
+                (snapshot.id, _decode(player_id), repr(score)) for player_id, score in batch
+            )
+            buffer.seek(0)
+            cursor.copy_expert(copy_sql, buffer)
+            snapshot.players += len(batch)
+
+    # Read after the scan so it covers every sequence number on the board
+    snapshot.sequence = int(conn.get(leaderboard.sequence) or 0)
+    snapshot.completed_at = timezone.now()
+    snapshot.save(update_fields=["players", "sequence", "completed_at"])
+
+    # Older snapshots, and any that never completed, are no longer needed
+    stale = LeaderboardSnapshot.objects.filter(board=snapshot.board, created_at__lt=snapshot.created_at)
+    stale.exclude(pk__in=_latest_completed(snapshot.board)[:keep]).delete()
+
+    return snapshot, time.perf_counter() - started
+
+
+def rehydrate(leaderboard, snapshot=None, batch_size=10000, pipeline_depth=10):
+    # Loads a snapshot into a staging key with pipelined ZADDs, then renames it
+    # over the board so readers never see a half-loaded board.
+    started = time.perf_counter()
+    snapshot = snapshot or _latest_completed(leaderboard.leaderboard).first()
+    if snapshot is None:
+        raise LeaderboardSnapshot.DoesNotExist(f"No completed snapshot of {leaderboard.leaderboard}")
+
+    conn = leaderboard.conn
+    staging = f"{leaderboard.leaderboard}:rehydrating"
+    conn.delete(staging)
+
+    entries = snapshot.entries.values_list("player_id", "score").iterator(chunk_size=batch_size)
+    pipe = conn.pipeline(transaction=False)
+    loaded = 0
+    while batch := list(islice(entries, batch_size)):
+        pipe.zadd(staging, dict(batch))
+        loaded += len(batch)
+        if len(pipe) >= pipeline_depth:
+            pipe.execute()
+
+    if loaded:
+        pipe.rename(staging, leaderboard.leaderboard)
+    # Keep handing out sequence numbers after the ones already on the board
+    pipe.set(leaderboard.sequence, max(snapshot.sequence, int(conn.get(leaderboard.sequence) or 0)))
+    pipe.execute()
+
+    return snapshot, loaded, time.perf_counter() - started
+
+
+def _latest_completed(board):
+    return LeaderboardSnapshot.objects.filter(board=board, completed_at__isnull=False).order_by("-created_at")
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
@@ -0,0 +1,8 @@
+from celery import shared_task
+from .registry import GLOBAL_BOARD, get_leaderboard
+from .snapshots import take_snapshot
+
+@shared_task
+def snapshot_leaderboard(board=GLOBAL_BOARD):
+    snapshot, _ = take_snapshot(get_leaderboard(board))
+    return snapshot.players
@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from unittest.mock import MagicMock
+from apps.leaderboard.manager import AsyncRankingManager
+from apps.leaderboard.models import AsyncLeaderboard
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestAsyncLeaderboard:
+    BOARD = 'test:async'
+
+    @staticmethod
+    async def cleanup(leaderboard):
+        await leaderboard.conn.delete(leaderboard.leaderboard, leaderboard.sequence)
+
+    def test_add_and_rank_players(self):
+        async def scenario():
+            leaderboard = AsyncLeaderboard(name=self.BOARD)
+            for player_id in ['first', 'second', 'third']:
+                await leaderboard.add_player(player_id)
+
+            ranks = await leaderboard.bulk_get_ranks(['first', 'second', 'third'])
+            length = await leaderboard.length
+            await self.cleanup(leaderboard)
+            return ranks, length
+
+        ranks, length = run(scenario())
+
+        assert ranks == [0, 1, 2]
+        assert length == 3
+
+    def test_jump_player(self):
+        async def scenario():
+            leaderboard = AsyncLeaderboard(name=self.BOARD)
+            await leaderboard.bulk_add_players({f'user_{i}': None for i in range(10)})
+
+            result = await leaderboard.jump_player('user_8', 3)
+            rank = await leaderboard.get_player_rank('user_8')
+            await self.cleanup(leaderboard)
+            return result, rank
+
+        (new_rank, _), rank = run(scenario())
+
+        assert new_rank == 5
+        assert rank == 5
+
+    def test_concurrent_rank_lookups_share_a_pool(self):
+        async def scenario():
+            leaderboard = AsyncLeaderboard(name=self.BOARD)
+            await leaderboard.bulk_add_players({f'user_{i}': i + 1 for i in range(100)})
+
+            boards = [AsyncLeaderboard(name=self.BOARD) for _ in range(100)]
+            ranks = await asyncio.gather(
+                *(board.get_player_rank(f'user_{i}') for i, board in enumerate(boards))
+            )
+            pools = {id(board.conn.connection_pool) for board in boards}
+            await self.cleanup(leaderboard)
+            return ranks, pools
+
+        ranks, pools = run(scenario())
+
+        assert ranks == [99 - i for i in range(100)]
+        assert len(pools) == 1
+
+    def test_manager_adds_missing_player_then_jumps(self):
+        async def scenario():
+            leaderboard = AsyncLeaderboard(name=self.BOARD)
+            await leaderboard.bulk_add_players({f'user_{i}': None for i in range(5)})
+            manager = AsyncRankingManager(leaderboard)
+
+            initiator = MagicMock()
+            initiator.team = None
+            initiator.user_id = 'newcomer'
+            initiator.score = 0.0
+
+            await manager.update_user_rank_by_spaces(initiator, 2)
+            rank = await leaderboard.get_player_rank('newcomer')
+            await self.cleanup(leaderboard)
+            return rank
+
+        assert run(scenario()) == 3
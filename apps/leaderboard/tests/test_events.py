@@ -0,0 +1,62 @@
+import pytest
+from django_redis import get_redis_connection
+from apps.leaderboard.events import RankEventConsumer
+from apps.leaderboard.models import Leaderboard
+
+
+class TestRankEvents:
+    BOARD = 'test:events'
+
+    @pytest.fixture(autouse=True)
+    def redis(self):
+        conn = get_redis_connection('default')
+        yield conn
+        conn.delete(self.BOARD, f'{self.BOARD}:sequence', f'{self.BOARD}:events')
+
+    @pytest.fixture
+    def leaderboard(self, redis):
+        return Leaderboard(redis, name=self.BOARD)
+
+    @pytest.fixture
+    def consumer(self, leaderboard):
+        consumer = RankEventConsumer(leaderboard, 'notifications', 'worker-1', batch_size=10)
+        consumer.ensure_group()
+        return consumer
+
+    def test_updates_are_recorded(self, leaderboard, consumer):
+        for player_id in ['first', 'second', 'third']:
+            leaderboard.add_player(player_id)
+        leaderboard.jump_player('third', 1, cause='task:7')
+        leaderboard.update_player_score('missing', 10)
+
+        events = [event for _, event in consumer.read()]
+
+        assert [event['cause'] for event in events] == ['join', 'join', 'join', 'task:7']
+        assert events[0]['old_rank'] is None
+        assert events[3]['player_id'] == 'third'
+        assert (events[3]['old_rank'], events[3]['new_rank']) == (2, 1)
+        assert events[3]['score'] == leaderboard.get_player_score('third')
+
+    def test_consume_acknowledges_batches(self, leaderboard, consumer):
+        for i in range(25):
+            leaderboard.add_player(f'user_{i}')
+
+        handled = []
+        batches = [consumer.consume(handled.extend) for _ in range(4)]
+
+        assert batches == [10, 10, 5, 0]
+        assert len(handled) == 25
+        assert leaderboard.conn.xpending(leaderboard.events, 'notifications')['pending'] == 0
+
+    def test_unacknowledged_events_are_redelivered(self, leaderboard, consumer):
+        leaderboard.add_player('first')
+        consumer.read()
+
+        other = RankEventConsumer(leaderboard, 'notifications', 'worker-2')
+        assert [event['player_id'] for _, event in other.claim_stale(min_idle_ms=0)] == ['first']
+
+    def test_events_can_be_turned_off(self, leaderboard, redis):
+        leaderboard.EVENTS_MAXLEN = 0
+        leaderboard.add_player('quiet')
+
+        assert redis.xlen(leaderboard.events) == 0
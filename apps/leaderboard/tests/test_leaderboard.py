@@ -1,7 +1,7 @@
 import pytest
 from faker import Faker
 from django_redis import get_redis_connection
-from apps.leaderboard.models import Leaderboard, Player
+from apps.leaderboard.models import DISPLAY_NAMES, Leaderboard, Player
 
 
 class TestLeaderboard:
@@ -24,10 +24,7 @@ class TestLeaderboard:
 
     @pytest.fixture
     def leaderboard(request):
-        leaderboard = Leaderboard()
-        yield leaderboard
-        # After the test, reset the singleton instance to None
-        type(leaderboard)._instance = None
+        return Leaderboard()
      
     def test_add_player(self, redis, users, leaderboard):
         # Add users to the leaderboard sorted set
@@ -76,6 +73,145 @@ class TestLeaderboard:
 
     def test_delete_player(self, leaderboard):
         leaderboard.delete_player(self.STATIC_USER)
-        assert leaderboard.length == self.NUM_USERS
+        assert leaderboard.length == self.NUM_USERS - 1
         assert leaderboard.get_player_rank(self.STATIC_USER) is None
 
+
+    def test_jump_missing_player(self, leaderboard):
+        assert leaderboard.jump_player('missing_user', 3) is None
+
+
+class TestScoreAtRankWithZeroTail:
+    BOARD = 'test:zero_tail'
+    SCORED_USERS = 5
+    ZERO_USERS = 1000
+
+    @pytest.fixture(scope='class', autouse=True)
+    def redis(self):
+        conn = get_redis_connection('default')
+        conn.zadd(self.BOARD, {f'scored_{i}': i + 1 for i in range(self.SCORED_USERS)})
+        conn.zadd(self.BOARD, {f'zero_{i}': 0 for i in range(self.ZERO_USERS)})
+        yield conn
+        conn.delete(self.BOARD)
+
+    @pytest.fixture
+    def leaderboard(self, redis):
+        return Leaderboard(redis, name=self.BOARD)
+
+    def test_score_above_tail(self, leaderboard):
+        assert leaderboard.get_score_at_rank(3) == 2
+
+    def test_score_inside_tail(self, leaderboard):
+        assert leaderboard.get_score_at_rank(self.SCORED_USERS + self.ZERO_USERS // 2) is None
+
+    def test_score_past_end(self, leaderboard):
+        assert leaderboard.get_score_at_rank(self.SCORED_USERS + self.ZERO_USERS) is None
+
+    def test_lookup_is_one_round_trip(self, leaderboard, mocker):
+        pipeline = mocker.spy(leaderboard.conn, 'pipeline')
+        leaderboard.get_score_at_rank(self.SCORED_USERS + self.ZERO_USERS // 2)
+
+        assert pipeline.call_count == 1
+
+
+class TestBulkLeaderboard:
+    BOARD = 'test:bulk'
+    NUM_USERS = 25
+    CHUNK_SIZE = 4
+
+    @pytest.fixture(scope='class', autouse=True)
+    def redis(self):
+        conn = get_redis_connection('default')
+        yield conn
+        conn.delete(self.BOARD)
+
+    @pytest.fixture
+    def leaderboard(self, redis):
+        return Leaderboard(redis, name=self.BOARD, chunk_size=self.CHUNK_SIZE)
+
+    @pytest.fixture
+    def users(self):
+        return [f'user_{i}' for i in range(self.NUM_USERS)]
+
+    def test_bulk_add_players(self, redis, users, leaderboard):
+        leaderboard.bulk_add_players((user, index + 1) for index, user in enumerate(users))
+
+        assert redis.zcard(self.BOARD) == self.NUM_USERS
+
+    def test_bulk_get_scores_keeps_input_order(self, users, leaderboard):
+        player_ids = list(reversed(users)) + ['missing_user']
+        scores = leaderboard.bulk_get_scores(player_ids)
+
+        assert scores == [float(index + 1) for index in reversed(range(self.NUM_USERS))] + [None]
+
+    def test_bulk_get_ranks_keeps_input_order(self, users, leaderboard):
+        ranks = leaderboard.bulk_get_ranks(users + ['missing_user'])
+
+        assert ranks == [self.NUM_USERS - index - 1 for index in range(self.NUM_USERS)] + [None]
+
+    def test_bulk_get_ranks_with_scores(self, users, leaderboard):
+        rank, score = leaderboard.bulk_get_ranks(users[:1], withscores=True)[0]
+
+        assert rank == self.NUM_USERS - 1
+        assert score == 1
+
+    def test_bulk_add_unscored_players_queue_in_order(self, redis, leaderboard):
+        leaderboard.bulk_add_players({'new_1': None, 'new_2': None})
+
+        assert leaderboard.bulk_get_ranks(['new_1', 'new_2']) == [0, 1]
+        redis.zrem(self.BOARD, 'new_1', 'new_2')
+        redis.delete(f'{self.BOARD}:sequence')
+
+    def test_bulk_delete_players(self, redis, users, leaderboard):
+        leaderboard.bulk_delete_players(users[:10])
+
+        assert redis.zcard(self.BOARD) == self.NUM_USERS - 10
+
+
+class TestLeaderboardWindows:
+    BOARD = 'test:windows'
+    NUM_USERS = 20
+
+    @pytest.fixture(scope='class', autouse=True)
+    def redis(self):
+        conn = get_redis_connection('default')
+        conn.zadd(self.BOARD, {f'user_{i}': i for i in range(self.NUM_USERS)})
+        yield conn
+        conn.delete(self.BOARD, DISPLAY_NAMES)
+
+    @pytest.fixture
+    def leaderboard(self, redis):
+        return Leaderboard(redis, name=self.BOARD)
+
+    def test_top(self, leaderboard):
+        page = leaderboard.top(offset=2, limit=3)
+
+        assert [(rank, player_id, score) for rank, player_id, score, _ in page] == [
+            (2, b'user_17', 17.0),
+            (3, b'user_16', 16.0),
+            (4, b'user_15', 15.0),
+        ]
+
+    def test_top_past_end(self, leaderboard):
+        assert leaderboard.top(offset=self.NUM_USERS, limit=5) == []
+
+    def test_around(self, leaderboard):
+        window = leaderboard.around('user_10', radius=2)
+
+        assert [rank for rank, *_ in window] == [7, 8, 9, 10, 11]
+        assert window[2][1] == b'user_10'
+
+    def test_around_top_player(self, leaderboard):
+        window = leaderboard.around('user_19', radius=2)
+
+        assert [rank for rank, *_ in window] == [0, 1, 2]
+
+    def test_around_missing_player(self, leaderboard):
+        assert leaderboard.around('missing_user') is None
+
+    def test_display_names(self, leaderboard):
+        leaderboard.cache_display_names({'user_19': 'Jane D.'})
+        page = leaderboard.top(limit=2)
+
+        assert page[0][3] == b'Jane D.'
+        assert page[1][3] is None
@@ -0,0 +1,199 @@
+import random
+import pytest
+from django_redis import get_redis_connection
+from apps.leaderboard.manager import RankingManager
+from apps.leaderboard.memory import InMemoryLeaderboard, SkipList
+from apps.leaderboard.models import Leaderboard, Player
+from apps.leaderboard.scheduler import JumpScheduler
+from apps.leaderboard.scores import MAX_POINTS, decode_score, encode_score
+from apps.teams.manager import TeamsManager
+from apps.teams.registry import TeamRegistry
+
+
+class TestSkipList:
+
+    def test_matches_a_sorted_list(self):
+        rng = random.Random(7)
+        entries = SkipList(seed=7)
+        expected = {}
+
+        for _ in range(2000):
+            member = f'm{rng.randrange(300)}'
+            if member in expected and rng.random() < 0.4:
+                assert entries.delete(expected.pop(member), member)
+            elif member not in expected:
+                expected[member] = float(rng.randrange(50))
+                entries.insert(expected[member], member)
+
+        ordered = sorted((score, member) for member, score in expected.items())
+        assert len(entries) == len(ordered)
+        assert entries.slice(0, len(ordered)) == [(member, score) for score, member in ordered]
+        for index, (score, member) in enumerate(ordered):
+            assert entries.rank(score, member) == index
+        assert entries.count_below(25) == sum(1 for score, _ in ordered if score < 25)
+
+    def test_missing_members(self):
+        entries = SkipList()
+        entries.insert(1.0, 'a')
+
+        assert entries.rank(1.0, 'b') is None
+        assert entries.delete(2.0, 'a') is False
+        assert entries.slice(1, 5) == []
+
+
+class TestInMemoryLeaderboard:
+
+    @pytest.fixture
+    def leaderboard(self):
+        return InMemoryLeaderboard(name='test:memory', seed=1)
+
+    def test_new_players_queue_in_join_order(self, leaderboard):
+        for player_id in ['first', 'second', 'third']:
+            leaderboard.add_player(player_id)
+
+        assert leaderboard.bulk_get_ranks(['first', 'second', 'third']) == [0, 1, 2]
+        assert leaderboard.length == 3
+
+    def test_jump_lands_above_target_rank(self, leaderboard):
+        leaderboard.bulk_add_players({f'user_{i}': None for i in range(10)})
+
+        rank, score = leaderboard.jump_player('user_8', 3)
+
+        assert rank == 5
+        assert leaderboard.get_player_rank('user_5') == 6
+        assert decode_score(score)[0] == 0
+
+    def test_jump_uses_next_gap_when_target_is_full(self, leaderboard):
+        leaderboard.bulk_add_players({'a': 40, 'b': 30, 'c': 29, 'd': 10})
+
+        assert leaderboard.jump_player('d', 1) == (1, 35.0)
+
+    def test_jump_past_max_points_is_refused(self, leaderboard):
+        leaderboard.bulk_add_players({'top': encode_score(MAX_POINTS, 0), 'last': None})
+
+        with pytest.raises(ValueError, match='points exhausted'):
+            leaderboard.jump_player('last', 5)
+
+    def test_update_player_score_does_not_add_users(self, leaderboard):
+        assert leaderboard.update_player_score('missing', 5) is None
+        assert leaderboard.get_player_score('missing') is None
+
+    def test_score_at_rank_skips_zero_tail(self, leaderboard):
+        leaderboard.bulk_add_players({'a': 3, 'b': 0, 'c': 0, 'd': -2, 'e': -5})
+
+        assert leaderboard.get_score_at_rank(0) == 3
+        assert leaderboard.get_score_at_rank(2) == -2
+        assert leaderboard.get_score_at_rank(10) is None
+
+    def test_windows_and_display_names(self, leaderboard):
+        leaderboard.bulk_add_players({f'user_{i}': i for i in range(20)})
+        leaderboard.cache_display_names({'user_19': 'Ada L.'})
+
+        assert leaderboard.top(limit=2) == [(0, 'user_19', 19.0, 'Ada L.'), (1, 'user_18', 18.0, None)]
+        assert [rank for rank, *_ in leaderboard.around('user_18', radius=2)] == [0, 1, 2, 3]
+        assert leaderboard.around('missing') is None
+
+    def test_events_are_recorded(self, leaderboard):
+        leaderboard.add_player('a')
+        leaderboard.add_player('b')
+        leaderboard.jump_player('b', 1, cause='task:7')
+
+        assert leaderboard.events[-1] == {
+            'player_id': 'b', 'old_rank': 1, 'new_rank': 0,
+            'score': leaderboard.get_player_score('b'), 'cause': 'task:7',
+        }
+
+
+    def test_ranking_manager_and_scheduler(self, leaderboard):
+        leaderboard.bulk_add_players({f'user_{i}': None for i in range(5)})
+        scheduler = JumpScheduler(leaderboard)
+        manager = RankingManager(leaderboard, scheduler=scheduler)
+        initiator = Player('user_4')
+
+        manager.update_user_rank_by_spaces(initiator, 3)
+        scheduler.flush()
+
+        assert initiator.rank == 1
+        assert leaderboard.get_player_rank('user_4') == 1
+
+    def test_teams_manager(self, leaderboard):
+        leaderboard.bulk_add_players({f'user_{i}': None for i in range(6)})
+        manager = TeamsManager(leaderboard)
+        users = [Player('user_4'), Player('user_2')]
+        for user in users:
+            user.rank = {'rank': leaderboard.get_player_rank(user.user_id), 'spaces': 0}
+
+        manager.validate_team_members(users)
+
+        assert leaderboard.get_player_rank('user_4_user_2') == 2
+        assert leaderboard.bulk_get_ranks(['user_4', 'user_2']) == [None, None]
+        assert manager.get_team_id('user_2') == 'user_4_user_2'
+        assert [player_id for player_id, _ in manager.suggest_partners('user_3', limit=2)] == ['user_1', 'user_5']
+        with pytest.raises(ValueError, match='already in a team'):
+            manager.registry.form_team(leaderboard, 'user_2_user_5', ['user_2', 'user_5'])
+        assert TeamsManager(leaderboard, manager.registry).load_teams() == 1
+
+        manager.disband_team(users[0])
+
+        assert leaderboard.bulk_get_ranks(['user_4', 'user_2']) == [4, 2]
+        assert [user.team for user in users] == [None, None]
+        assert manager.registry.count() == 0
+        assert leaderboard.events[-1]['cause'] == 'disband'
+
+
+class TestMatchesRedisLeaderboard:
+    BOARD = 'test:memory:parity'
+
+    @pytest.fixture
+    def redis_leaderboard(self):
+        conn = get_redis_connection('default')
+        yield Leaderboard(conn, name=self.BOARD)
+        conn.delete(self.BOARD, f'{self.BOARD}:sequence', f'{self.BOARD}:events')
+
+    @pytest.fixture
+    def redis_registry(self):
+        registry = TeamRegistry(get_redis_connection('default'), prefix='test:memory:teams', buckets=4)
+        yield registry
+        registry.clear()
+
+    def test_same_ranks_and_scores_after_jumps(self, redis_leaderboard):
+        memory_leaderboard = InMemoryLeaderboard(seed=3)
+        players = {f'user_{i}': None for i in range(200)}
+        players.update({f'scored_{i}': i * 1000 for i in range(20)})
+        rng = random.Random(3)
+        jumps = [(f'user_{rng.randrange(200)}', rng.randint(1, 40), 'jump') for _ in range(300)]
+
+        for leaderboard in (redis_leaderboard, memory_leaderboard):
+            leaderboard.bulk_add_players(players)
+            for jump in jumps[:150]:
+                leaderboard.jump_player(*jump)
+            leaderboard.jump_players(jumps[150:])
+
+        assert memory_leaderboard.bulk_get_ranks(players, withscores=True) == \
+            redis_leaderboard.bulk_get_ranks(players, withscores=True)
+
+    def test_same_ranks_and_scores_after_teams(self, redis_leaderboard, redis_registry):
+        memory_leaderboard = InMemoryLeaderboard(seed=3)
+        players = {f'user_{i}': None for i in range(30)}
+        players.update({f'scored_{i}': encode_score(i, i) for i in range(5)})
+        pairs = [(f'user_{i}', f'user_{i + 7}') for i in range(0, 20, 3)]
+        results = []
+
+        for leaderboard, registry in ((redis_leaderboard, redis_registry), (memory_leaderboard, None)):
+            leaderboard.bulk_add_players(players)
+            manager = TeamsManager(leaderboard, registry)
+            for pair in pairs:
+                manager.validate_team_members([Player(user_id) for user_id in pair])
+            leaderboard.jump_player('user_29', 12)
+            disbanded = manager.registry.disband_teams(leaderboard, [
+                ('user_0_user_7', [('user_0', None), ('user_7', 4)]),
+                ('user_3_user_10', [('user_3', 25), ('user_10', None)]),
+                ('missing', [('user_1', None)]),
+            ])
+            manager.disband_all_teams(batch_size=2)
+            results.append((
+                disbanded, leaderboard.bulk_get_ranks(players, withscores=True),
+                manager.suggest_partners('user_15', band=1),
+            ))
+
+        assert results[1] == results[0]
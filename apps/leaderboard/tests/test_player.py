@@ -65,15 +65,11 @@ class TestplayerCase:
         assert player.team_id == None
         assert player.score == NEW_SCORE
 
-    def test_join_team_unknown_error(self, player):
-        player._team_id = 'team3'
+    def test_player_rejects_unknown_attributes(self, player):
+        with pytest.raises(AttributeError):
+            player._team_id = 'team3'
 
-        with pytest.raises(Exception):
-            player.join_team('team1', 'Jane Doe')
-       
     def test_join_team_unknown_error(self, player):
-        player._team_id = 'team3'
-
         with pytest.raises(Exception):
             player.leave_team()
 
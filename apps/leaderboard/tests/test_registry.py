@@ -0,0 +1,53 @@
+import asyncio
+from unittest.mock import MagicMock
+from apps.leaderboard.models import AsyncLeaderboard, Leaderboard
+from apps.leaderboard.registry import LeaderboardRegistry, board_name
+
+
+class TestLeaderboardRegistry:
+
+    def test_board_names(self):
+        assert board_name() == 'leaderboard'
+        assert board_name('country', 'GB') == 'leaderboard:country:GB'
+        assert board_name('weekly', '2024-W05') == 'leaderboard:weekly:2024-W05'
+
+    def test_one_board_per_name(self):
+        registry = LeaderboardRegistry(conn=MagicMock())
+
+        assert registry.get() is registry.get()
+        assert registry.get(board_name('country', 'GB')) is not registry.get()
+        assert isinstance(registry.get(), Leaderboard)
+        assert sorted(registry.names()) == ['leaderboard', 'leaderboard:country:GB']
+
+    def test_boards_share_a_connection(self):
+        conn = MagicMock()
+        registry = LeaderboardRegistry(conn=conn)
+
+        assert registry.get().conn is conn
+        assert registry.get(board_name('demographic', 'EXPAT')).conn is conn
+
+    def test_getting_a_board_does_not_count_players(self):
+        conn = MagicMock()
+        registry = LeaderboardRegistry(conn=conn)
+        registry.get()
+        registry.get()
+
+        conn.zcard.assert_not_called()
+
+    def test_length_is_live(self):
+        conn = MagicMock()
+        conn.zcard.side_effect = [3, 4]
+        leaderboard = LeaderboardRegistry(conn=conn).get()
+
+        assert leaderboard.length == 3
+        assert leaderboard.length == 4
+
+    def test_async_boards_per_event_loop(self):
+        registry = LeaderboardRegistry(conn=MagicMock())
+
+        async def boards():
+            return registry.get_async(), registry.get_async()
+
+        first, second = asyncio.run(boards())
+        assert first is second
+        assert isinstance(first, AsyncLeaderboard)
@@ -0,0 +1,137 @@
+import pytest
+from unittest.mock import MagicMock
+from django_redis import get_redis_connection
+from apps.leaderboard.manager import RankingManager
+from apps.leaderboard.models import Leaderboard
+from apps.leaderboard.scheduler import JumpScheduler
+
+
+class TestJumpPlayers:
+    BOARD = 'test:batched'
+
+    @pytest.fixture(autouse=True)
+    def redis(self):
+        conn = get_redis_connection('default')
+        yield conn
+        conn.delete(self.BOARD, f'{self.BOARD}:sequence', f'{self.BOARD}:events')
+
+    @pytest.fixture
+    def leaderboard(self, redis):
+        leaderboard = Leaderboard(redis, name=self.BOARD)
+        leaderboard.bulk_add_players({f'user_{i}': None for i in range(10)})
+        return leaderboard
+
+    def test_matches_single_jump(self, leaderboard):
+        [(rank, score)] = leaderboard.jump_players([('user_8', 3, 'jump')])
+
+        assert rank == 5
+        assert leaderboard.get_player_rank('user_8') == 5
+        assert leaderboard.get_player_score('user_8') == score
+
+    def test_results_follow_argument_order(self, leaderboard):
+        results = leaderboard.jump_players([('user_9', 1, 'jump'), ('missing', 2, 'jump'), ('user_5', 4, 'jump')])
+
+        assert results[1] is None
+        assert [rank for rank, _ in (results[0], results[2])] == [8, 1]
+        assert leaderboard.bulk_get_ranks(['user_5', 'user_9']) == [1, 8]
+
+    def test_every_jump_is_recorded(self, leaderboard, redis):
+        leaderboard.jump_players([('user_9', 1, 'task:1'), ('user_7', 2, 'task:2')])
+
+        assert redis.xlen(leaderboard.events) == 2
+
+    def test_empty_batch(self, leaderboard, redis):
+        assert leaderboard.jump_players([]) == []
+
+
+class TestJumpScheduler:
+
+    @pytest.fixture
+    def leaderboard(self):
+        leaderboard = MagicMock()
+        leaderboard.jump_players.side_effect = lambda jumps: [(0, 1.0) for _ in jumps]
+        return leaderboard
+
+    def test_merges_jumps_by_the_same_player(self, leaderboard):
+        scheduler = JumpScheduler(leaderboard)
+        scheduler.submit('user_1', 2, 'task:1')
+        scheduler.submit('user_2', 1)
+        scheduler.submit('user_1', 3, 'task:2')
+
+        scheduler.flush()
+
+        leaderboard.jump_players.assert_called_once_with([('user_1', 5, 'task:1,task:2'), ('user_2', 1, 'jump')])
+
+    def test_callbacks_receive_the_merged_result(self, leaderboard):
+        scheduler = JumpScheduler(leaderboard)
+        received = []
+        scheduler.submit('user_1', 2, callback=received.append)
+        scheduler.submit('user_1', 3, callback=received.append)
+
+        results = scheduler.flush()
+
+        assert results == {'user_1': (0, 1.0)}
+        assert received == [(0, 1.0), (0, 1.0)]
+
+    def test_flushes_when_batch_is_full(self, leaderboard):
+        scheduler = JumpScheduler(leaderboard, max_batch=2)
+        scheduler.submit('user_1', 1)
+        assert not leaderboard.jump_players.called
+
+        scheduler.submit('user_2', 1)
+        assert leaderboard.jump_players.call_count == 1
+        assert scheduler.pending == 0
+
+    def test_stop_applies_remaining_jumps(self, leaderboard):
+        with JumpScheduler(leaderboard, tick=60) as scheduler:
+            scheduler.submit('user_1', 1)
+
+        leaderboard.jump_players.assert_called_once_with([('user_1', 1, 'jump')])
+
+    def test_failed_batch_is_queued_again(self, leaderboard):
+        scheduler = JumpScheduler(leaderboard, max_batch=1)
+        received = []
+        apply = leaderboard.jump_players.side_effect
+        leaderboard.jump_players.side_effect = [[(0, 1.0)], ConnectionError('down')]
+        with scheduler._lock:
+            scheduler._pending = {'user_1': [1, ['jump'], [received.append]], 'user_2': [2, ['jump'], []],
+                                  'user_3': [3, ['jump'], []]}
+
+        with pytest.raises(ConnectionError):
+            scheduler.flush()
+        assert received == [(0, 1.0)]
+        assert scheduler.pending == 2
+
+        leaderboard.jump_players.side_effect = apply
+        # The batch is full, so this flushes
+        scheduler.submit('user_2', 4, 'task:1', callback=received.append)
+
+        assert leaderboard.jump_players.call_args_list[-2:] == [
+            (([('user_2', 6, 'jump,task:1')],),), (([('user_3', 3, 'jump')],),),
+        ]
+        assert received == [(0, 1.0), (0, 1.0)]
+        assert scheduler.pending == 0
+
+    def test_failing_callback_does_not_skip_the_rest(self, leaderboard):
+        scheduler = JumpScheduler(leaderboard)
+        received = []
+        scheduler.submit('user_1', 1, callback=lambda result: 1 / 0)
+        scheduler.submit('user_2', 1, callback=received.append)
+
+        scheduler.flush()
+
+        assert received == [(0, 1.0)]
+
+    def test_manager_updates_initiator_when_batch_is_applied(self, leaderboard):
+        scheduler = JumpScheduler(leaderboard)
+        manager = RankingManager(leaderboard, scheduler=scheduler)
+        initiator = MagicMock()
+        initiator.team = None
+        initiator.user_id = 1
+
+        manager.update_user_rank_by_spaces(initiator, 4)
+        assert not leaderboard.jump_players.called
+
+        scheduler.flush()
+        assert initiator.rank == {'rank': 0, 'spaces': 4}
+        assert initiator.score == 1.0
@@ -0,0 +1,126 @@
+import pytest
+from django.core.management import CommandError, call_command
+from django_redis import get_redis_connection
+from redis.exceptions import ResponseError
+from apps.leaderboard.models import Leaderboard
+from apps.leaderboard.scores import MAX_POINTS, SEQUENCE_SPAN, SEQUENCE_STRIDE, decode_score, encode_score
+
+
+class TestScoreCodec:
+
+    def test_round_trip(self):
+        assert decode_score(encode_score(42, 1234)) == (42, 1234)
+
+    def test_more_points_rank_higher(self):
+        assert encode_score(2, SEQUENCE_SPAN - 1) > encode_score(1, 0)
+
+    def test_earlier_sequence_ranks_higher_on_equal_points(self):
+        assert encode_score(5, 10) > encode_score(5, 11)
+
+    def test_scores_are_exact_as_doubles(self):
+        score = encode_score(MAX_POINTS, 0)
+        assert float(score) == score
+        assert decode_score(float(score)) == (MAX_POINTS, 0)
+
+    def test_out_of_range_values(self):
+        with pytest.raises(ValueError):
+            encode_score(MAX_POINTS + 1, 0)
+        with pytest.raises(ValueError):
+            encode_score(0, SEQUENCE_SPAN)
+
+
+class TestEncodedLeaderboard:
+    BOARD = 'test:encoded'
+
+    @pytest.fixture(autouse=True)
+    def redis(self):
+        conn = get_redis_connection('default')
+        yield conn
+        conn.delete(self.BOARD, f'{self.BOARD}:sequence')
+
+    @pytest.fixture
+    def leaderboard(self, redis):
+        return Leaderboard(redis, name=self.BOARD)
+
+    def test_new_players_queue_in_join_order(self, leaderboard):
+        for player_id in ['first', 'second', 'third']:
+            leaderboard.add_player(player_id)
+
+        assert leaderboard.bulk_get_ranks(['first', 'second', 'third']) == [0, 1, 2]
+
+    def test_jump_lands_above_target_rank(self, leaderboard):
+        players = [f'user_{i}' for i in range(10)]
+        for player_id in players:
+            leaderboard.add_player(player_id)
+
+        rank, score = leaderboard.jump_player('user_8', 3)
+
+        assert rank == 5
+        assert leaderboard.get_player_rank('user_8') == 5
+        assert leaderboard.get_player_rank('user_5') == 6
+        assert leaderboard.get_player_rank('user_4') == 4
+        assert decode_score(score)[0] == 0
+
+    def test_jump_to_the_top_adds_a_point(self, leaderboard):
+        for player_id in ['first', 'second', 'third']:
+            leaderboard.add_player(player_id)
+
+        rank, score = leaderboard.jump_player('third', 5)
+
+        assert rank == 0
+        assert decode_score(score)[0] == 1
+
+    def test_jump_past_max_points_is_refused(self, leaderboard):
+        leaderboard.bulk_add_players({'top': encode_score(MAX_POINTS, 0), 'last': None})
+
+        with pytest.raises(ResponseError, match='points exhausted'):
+            leaderboard.jump_player('last', 5)
+        assert leaderboard.get_player_rank('last') == 1
+
+    def test_jump_uses_next_gap_when_target_is_full(self, leaderboard):
+        leaderboard.bulk_add_players({'a': 40, 'b': 30, 'c': 29, 'd': 10})
+
+        rank, score = leaderboard.jump_player('d', 1)
+
+        assert rank == 1
+        assert score == 35
+
+    def test_repeated_jumps_never_tie(self, leaderboard):
+        players = [f'user_{i}' for i in range(50)]
+        leaderboard.bulk_add_players({player_id: None for player_id in players})
+
+        for player_id in players[25:]:
+            leaderboard.jump_player(player_id, 10)
+
+        scores = leaderboard.bulk_get_scores(players)
+        assert len(set(scores)) == len(players)
+        assert all(score == int(score) for score in scores)
+
+    def test_encode_command_keeps_order(self, redis):
+        redis.zadd(self.BOARD, {'a': 5.02, 'b': 5.01, 'c': 0, 'd': 0, 'e': 3})
+        order = redis.zrevrange(self.BOARD, 0, -1)
+
+        call_command('encode_leaderboard_scores', board=self.BOARD, batch_size=2)
+
+        assert redis.zrevrange(self.BOARD, 0, -1) == order
+        assert int(redis.get(f'{self.BOARD}:sequence')) == 5 * SEQUENCE_STRIDE
+        assert [decode_score(score)[0] for _, score in redis.zrevrange(self.BOARD, 0, -1, withscores=True)] == [
+            3, 2, 1, 0, 0
+        ]
+
+    def test_encode_command_spreads_levels_over_max_points(self, redis):
+        redis.zadd(self.BOARD, {f'p{i}': i / 100 for i in range(10)})
+        order = redis.zrevrange(self.BOARD, 0, -1)
+
+        call_command('encode_leaderboard_scores', board=self.BOARD, batch_size=3, max_points=3)
+
+        assert redis.zrevrange(self.BOARD, 0, -1) == order
+        assert [decode_score(score)[0] for _, score in redis.zrange(self.BOARD, 0, -1, withscores=True)] == [
+            0, 0, 0, 1, 1, 2, 2, 2, 3, 3
+        ]
+
+    def test_encode_command_fails_with_an_error(self, redis):
+        redis.zadd(self.BOARD, {'a': 1})
+
+        with pytest.raises(CommandError):
+            call_command('encode_leaderboard_scores', board=self.BOARD, max_points=MAX_POINTS + 1)
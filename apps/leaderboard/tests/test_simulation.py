@@ -0,0 +1,65 @@
+import numpy as np
+from apps.leaderboard.memory import InMemoryLeaderboard
+from apps.leaderboard.simulation import QueueJumpSimulator, jump_sizes, synthetic_completions
+
+
+def reference_batch(ranks, players, spaces):
+    # Sorts the whole board by where each player lands, one batch at a time
+    merged = {}
+    for player, jump in zip(players, spaces):
+        merged[player] = merged.get(player, 0) + jump
+
+    def landing(row):
+        rank = ranks[row]
+        if merged.get(row):
+            target = max(0, rank - merged[row])
+            return (target, 0, rank)
+        return (rank, 1, 0)
+
+    order = sorted(range(len(ranks)), key=landing)
+    new_ranks = np.empty_like(ranks)
+    new_ranks[order] = np.arange(len(ranks))
+    return new_ranks
+
+
+class TestQueueJumpSimulator:
+
+    def test_single_jump_matches_the_leaderboard(self):
+        leaderboard = InMemoryLeaderboard(seed=1)
+        leaderboard.bulk_add_players({str(row): None for row in range(20)})
+        simulator = QueueJumpSimulator(20)
+
+        leaderboard.jump_player('12', 5)
+        simulator.apply(np.array([12]), np.array([5]))
+
+        assert simulator.ranks.tolist() == leaderboard.bulk_get_ranks([str(row) for row in range(20)])
+
+    def test_batches_match_reference(self):
+        rng = np.random.default_rng(5)
+        simulator = QueueJumpSimulator(200)
+        expected = simulator.ranks.copy()
+
+        for _ in range(20):
+            players = rng.integers(0, 200, size=30)
+            spaces = rng.integers(1, 60, size=30)
+            expected = reference_batch(expected, players.tolist(), spaces.tolist())
+            simulator.apply(players, spaces)
+            assert simulator.ranks.tolist() == expected.tolist()
+
+    def test_ranks_stay_a_permutation(self):
+        sizes, weights = jump_sizes({10: 3, 20: 1}, {75: 1}, tier_share=0.2)
+        players, spaces = synthetic_completions(5000, 50000, sizes, weights, activity=2.0, seed=3)
+        simulator = QueueJumpSimulator(5000)
+
+        start = simulator.run(players, spaces, batch_size=1000)
+
+        assert sorted(simulator.ranks.tolist()) == list(range(5000))
+        report = simulator.report(start)
+        assert report['moved'] > 0
+        assert report['buckets'][-1]['mean_gain'] > 0
+
+    def test_jump_sizes_shares(self):
+        sizes, weights = jump_sizes({10: 1, 20: 3}, {75: 1}, tier_share=0.2)
+
+        assert sizes.tolist() == [10, 20, 75]
+        assert np.allclose(weights, [0.2, 0.6, 0.2])
@@ -0,0 +1,69 @@
+import os
+from django.core.management import call_command
+from django.test import TestCase
+from django_redis import get_redis_connection
+from apps.leaderboard.models import Leaderboard, LeaderboardSnapshot
+from apps.leaderboard.simulation import QueueJumpSimulator
+from apps.leaderboard.snapshots import rehydrate, take_snapshot
+
+# Set LEADERBOARD_SNAPSHOT_TEST_SIZE=5000000 to run against a full size board
+NUM_PLAYERS = int(os.getenv('LEADERBOARD_SNAPSHOT_TEST_SIZE', 10000))
+
+
+class LeaderboardSnapshotTests(TestCase):
+    BOARD = 'test:snapshot'
+
+    def setUp(self):
+        self.redis = get_redis_connection('default')
+        self.leaderboard = Leaderboard(self.redis, name=self.BOARD, chunk_size=10000)
+        self.leaderboard.bulk_add_players({f'user_{i}': None for i in range(NUM_PLAYERS)})
+        self.leaderboard.jump_player(f'user_{NUM_PLAYERS - 1}', NUM_PLAYERS // 2)
+        self.order = self.redis.zrevrange(self.BOARD, 0, -1, withscores=True)
+
+    def tearDown(self):
+        self.redis.delete(self.BOARD, self.leaderboard.sequence)
+
+    def test_snapshot_copies_every_player(self):
+        snapshot, _ = take_snapshot(self.leaderboard)
+
+        self.assertEqual(snapshot.players, NUM_PLAYERS)
+        self.assertEqual(snapshot.entries.count(), NUM_PLAYERS)
+        self.assertEqual(snapshot.sequence, int(self.redis.get(self.leaderboard.sequence)))
+        self.assertIsNotNone(snapshot.completed_at)
+
+    def test_rehydrate_restores_board_and_sequence(self):
+        snapshot, _ = take_snapshot(self.leaderboard)
+        self.redis.delete(self.BOARD, self.leaderboard.sequence)
+
+        _, loaded, _ = rehydrate(self.leaderboard)
+
+        self.assertEqual(loaded, NUM_PLAYERS)
+        self.assertEqual(self.redis.zrevrange(self.BOARD, 0, -1, withscores=True), self.order)
+        self.assertEqual(int(self.redis.get(self.leaderboard.sequence)), snapshot.sequence)
+
+    def test_old_snapshots_are_pruned(self):
+        for _ in range(3):
+            take_snapshot(self.leaderboard, keep=2)
+
+        self.assertEqual(LeaderboardSnapshot.objects.filter(board=self.BOARD).count(), 2)
+
+    def test_rehydrate_command_refuses_to_overwrite(self):
+        take_snapshot(self.leaderboard)
+        call_command('rehydrate_leaderboard', board=self.BOARD)
+
+        self.assertEqual(self.redis.zcard(self.BOARD), NUM_PLAYERS)
+
+    def test_simulator_starts_from_snapshot(self):
+        snapshot, _ = take_snapshot(self.leaderboard)
+
+        simulator = QueueJumpSimulator.from_snapshot(snapshot)
+
+        self.assertEqual(simulator.size, NUM_PLAYERS)
+        self.assertEqual(list(simulator.player_ids[:50]), [player_id.decode() for player_id, _ in self.order[:50]])
+
+        jumper = self.order[-10][0].decode()
+        start = simulator.ranks.copy()
+        self.leaderboard.jump_player(jumper, 25)
+        simulator.apply(simulator.rows_of([jumper]), [25])
+        self.assertEqual(simulator.ranks.tolist(), self.leaderboard.bulk_get_ranks(simulator.player_ids))
+        self.assertEqual(simulator.report(start)["top_movers"], [(jumper, NUM_PLAYERS - 10, NUM_PLAYERS - 35)])
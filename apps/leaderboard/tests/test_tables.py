@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+from apps.leaderboard.models import Player
+from apps.leaderboard.tables import NO_TEAM, PlayerTable
+from apps.teams.models import Team
+
+
+class TestPlayerTable:
+
+    @pytest.fixture
+    def table(self):
+        return PlayerTable.from_scores([30, 10, 20, 40], [5.0, 50.0, 20.0, 5.0])
+
+    def test_ranks_by_score(self, table):
+        assert table.get_ranks([10, 20, 30, 40]).tolist() == [0, 1, 2, 3]
+
+    def test_lookups_follow_argument_order(self, table):
+        assert table.get_scores([40, 10]).tolist() == [5.0, 50.0]
+
+    def test_missing_ids(self, table):
+        with pytest.raises(KeyError):
+            table.rows([10, 99])
+
+    def test_set_scores_and_rerank(self, table):
+        table.set_scores([40], [100.0])
+        table.rerank()
+
+        assert table.get_ranks([40, 10]).tolist() == [0, 1]
+
+    def test_append_grows_the_columns(self):
+        table = PlayerTable(capacity=1)
+        for user_id in range(5):
+            table.append(user_id, score=float(user_id))
+
+        assert len(table) == 5
+        assert table.get_scores([4, 0]).tolist() == [4.0, 0.0]
+
+    def test_teams(self, table):
+        table.join_team('10_20', [10, 20])
+
+        assert sorted(table.team_members('10_20').tolist()) == [10, 20]
+        table.leave_team([10])
+        assert table.get_ranks([10]).tolist() == [0]
+        assert table.teams[table.rows([10])].tolist() == [NO_TEAM]
+
+    def test_join_teams(self, table):
+        table.join_teams(['10_20', '30_40'], [[10, 20], [30, 40]])
+
+        assert table.team_ids == ['10_20', '30_40']
+        assert sorted(table.team_members('30_40').tolist()) == [30, 40]
+
+    def test_from_players(self):
+        players = [Player(1), Player(2), Player(3)]
+        for rank, player in enumerate(players):
+            player.score = 10.0 - rank
+            player.rank = {'rank': rank, 'spaces': 0}
+        Team('1_2').start_team(players[:2], rank=0, score=20.0)
+
+        table = PlayerTable.from_players(players)
+
+        assert table.get_ranks([1, 2, 3]).tolist() == [0, 1, 2]
+        assert np.array_equal(np.sort(table.team_members('1_2')), [1, 2])
@@ -1,3 +1,18 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from .models import Tasks
+from .tasks import backfill_tasks
 
-# Register your models here.
+class TasksAdmin(admin.ModelAdmin):
+    list_display = ('id', 'title', 'display_order', 'prerequisite', 'is_hidden', 'target_demographic')
+    search_fields = ('title',)
+    list_filter = ('is_hidden', 'target_demographic')
+    actions = ('assign_to_existing_users',)
+
+    @admin.action(description='Assign to existing users')
+    def assign_to_existing_users(self, request, queryset):
+        # Runs in a worker, progress is kept so a failed run can be resumed
+        task_ids = list(queryset.values_list('id', flat=True))
+        backfill_tasks.delay(task_ids)
+        self.message_user(request, f'Assigning {len(task_ids)} tasks to existing users.', messages.SUCCESS)
+
+admin.site.register(Tasks, TasksAdmin)
@@ -0,0 +1,220 @@
+import json
+import threading
+import uuid
+from django.db import transaction
+from django_redis import get_redis_connection
+
+# Each user's task list is read from Redis in one round trip instead of
+# joining UserTasks with Tasks on every render. It is kept in two parts so
+# that neither a completion nor a task edit has to rebuild anything:
+#
+#   tasks:board:<user id>  task id -> [state, repetitions], plus GENERATION
+#   tasks:board:catalogue  task id -> [display order, title, queue jumps,
+#                                      max repetitions]
+#
+# A completion rewrites the user's changed rows, a task edit rewrites its
+# catalogue row. Changes to many users at once, like backfills, bump the
+# generation so every board is rebuilt the next time it is read. Only task
+# edits and refresh_catalogue write the catalogue, so a rebuild never puts back
+# a row it read before an edit or a delete.
+#
+# A rebuild reads Postgres and then writes Redis, so an update landing in
+# between would be overwritten with the old rows. The rebuild claims
+# tasks:board:<user id>:building with a token first, updates delete the claim,
+# and the rebuild only writes if its claim and the generation are unchanged.
+
+GENERATION = '_generation'
+
+
+class TaskBoardCache:
+
+    # KEYS[1] board, KEYS[2] rebuild claim. Only writes to a board that
+    # exists, so a partial board is never cached, and voids any rebuild that
+    # may have read the rows before this update.
+    UPDATE_BOARD = """
+redis.call('DEL', KEYS[2])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('HSET', KEYS[1], unpack(ARGV))
+end
+"""
+
+    # KEYS[1] board, KEYS[2] rebuild claim, KEYS[3] generation, KEYS[4] catalogue
+    # ARGV[1] claim token, ARGV[2] generation read before the rebuild,
+    # ARGV[3] generation field, then the rows as field/value pairs
+    # Writes the rebuilt board unless an update or a generation bump came in
+    # since the claim. Returns how many of the rows have no catalogue row, or
+    # -1 if the board was not written.
+    WRITE_BOARD = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] or (redis.call('GET', KEYS[3]) or '0') ~= ARGV[2] then
+    return -1
+end
+redis.call('DEL', KEYS[1], KEYS[2])
+
+local missing = 0
+redis.call('HSET', KEYS[1], ARGV[3], ARGV[2])
+for i = 4, #ARGV, 2 do
+    redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 1])
+    missing = missing + 1 - redis.call('HEXISTS', KEYS[4], ARGV[i])
+end
+return missing
+"""
+
+    # How long a rebuild's claim lasts, in milliseconds
+    CLAIM_TTL = 60000
+
+    def __init__(self, conn=None, prefix='tasks:board'):
+        self._conn = conn
+        self.prefix = prefix
+        self.catalogue_key = f'{prefix}:catalogue'
+        self.generation_key = f'{prefix}:generation'
+        self._update_board = None
+        self._write_board = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = get_redis_connection("default")
+        return self._conn
+
+    def board_key(self, user_id):
+        return f'{self.prefix}:{user_id}'
+
+    def claim_key(self, user_id):
+        return f'{self.prefix}:{user_id}:building'
+
+    def get(self, user_id):
+        # The user's tasks in display order as dicts with task_id, title,
+        # state, repetitions_remaining and queue_jumps. Costs one round trip,
+        # plus one query when the board has to be built.
+        pipe = self.conn.pipeline(transaction=False)
+        pipe.hgetall(self.board_key(user_id))
+        pipe.hgetall(self.catalogue_key)
+        pipe.get(self.generation_key)
+        rows, catalogue, generation = pipe.execute()
+
+        board = self._read(rows, catalogue, generation)
+        if board is None:
+            board = self.build(user_id)
+        return board
+
+    def _read(self, rows, catalogue, generation):
+        # None when the board is missing, stale or names a task missing from
+        # the catalogue, which happens when a task is deleted
+        if not rows or rows.pop(GENERATION.encode(), None) != (generation or b'0'):
+            return None
+
+        board = []
+        for task_id, row in rows.items():
+            task = catalogue.get(task_id)
+            if task is None:
+                return None
+            state, repetitions = json.loads(row)
+            display_order, title, queue_jumps, max_repetitions = json.loads(task)
+            board.append((display_order, {
+                'task_id': int(task_id),
+                'title': title,
+                'state': state,
+                'repetitions_remaining': max(max_repetitions - repetitions, 0),
+                'queue_jumps': queue_jumps,
+            }))
+        board.sort(key=lambda entry: entry[0])
+        return [entry for _, entry in board]
+
+    def build(self, user_id):
+        # Rebuilds the user's board from one select_related query. The board
+        # is returned but not cached if it changed while being rebuilt. If the
+        # catalogue is missing rows, as after Redis loses it, it is refreshed
+        # with one more query.
+        token = uuid.uuid4().hex
+        pipe = self.conn.pipeline(transaction=False)
+        pipe.set(self.claim_key(user_id), token, px=self.CLAIM_TTL)
+        pipe.get(self.generation_key)
+        _, generation = pipe.execute()
+        generation = generation or b'0'
+
+        rows, catalogue = self._load(user_id)
+
+        if self._write_board is None:
+            self._write_board = self.conn.register_script(self.WRITE_BOARD)
+        args = [token, generation, GENERATION]
+        for field, value in rows.items():
+            args.extend((field, value))
+        missing = self._write_board(
+            keys=[self.board_key(user_id), self.claim_key(user_id), self.generation_key, self.catalogue_key],
+            args=args,
+        )
+        if missing > 0:
+            self.refresh_catalogue()
+
+        return self._read({**rows, GENERATION.encode(): generation}, catalogue, generation) or []
+
+    def _load(self, user_id):
+        # The user's rows and their tasks' catalogue rows, from Postgres
+        from .models import UserTasks
+
+        rows, catalogue = {}, {}
+        for user_task in UserTasks.objects.filter(user_id=user_id).select_related('task'):
+            task_id = str(user_task.task_id).encode()
+            rows[task_id] = _row(user_task.state, user_task.repetitions)
+            catalogue[task_id] = _catalogue_row(user_task.task)
+        return rows, catalogue
+
+    def update_rows(self, user_id, rows):
+        # rows is {task_id: (state, repetitions)} for a user's changed tasks
+        if not rows:
+            return
+        if self._update_board is None:
+            self._update_board = self.conn.register_script(self.UPDATE_BOARD)
+        args = []
+        for task_id, (state, repetitions) in rows.items():
+            args.extend((task_id, _row(state, repetitions)))
+        self._update_board(keys=[self.board_key(user_id), self.claim_key(user_id)], args=args)
+
+    def update_rows_on_commit(self, user_id, rows):
+        transaction.on_commit(lambda: self.update_rows(user_id, rows))
+
+    def update_task(self, task):
+        self.conn.hset(self.catalogue_key, task.pk, _catalogue_row(task))
+
+    def remove_task(self, task_id):
+        self.conn.hdel(self.catalogue_key, task_id)
+
+    def refresh_catalogue(self):
+        # Rewrites every catalogue row with one query, for changes made with
+        # QuerySet.update() such as reordering
+        from .models import Tasks
+
+        catalogue = {task.pk: _catalogue_row(task) for task in Tasks.objects.all()}
+        pipe = self.conn.pipeline()
+        pipe.delete(self.catalogue_key)
+        if catalogue:
+            pipe.hset(self.catalogue_key, mapping=catalogue)
+        pipe.execute()
+
+    def invalidate(self, user_id):
+        self.conn.delete(self.board_key(user_id), self.claim_key(user_id))
+
+    def invalidate_all(self):
+        # Every board is rebuilt the next time it is read
+        self.conn.incr(self.generation_key)
+
+
+def _row(state, repetitions):
+    return json.dumps([state, repetitions], separators=(',', ':'))
+
+
+def _catalogue_row(task):
+    return json.dumps([task.display_order, task.title, task.queue_jumps, task.max_repetitions], separators=(',', ':'))
+
+
+_board = None
+_lock = threading.Lock()
+
+
+def get_task_board():
+    global _board
+    if _board is None:
+        with _lock:
+            if _board is None:
+                _board = TaskBoardCache()
+    return _board
@@ -0,0 +1,213 @@
+import threading
+import uuid
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.functions import Greatest
+from django_redis import get_redis_connection
+
+# Completions of a popular task would all queue on its Tasks row if the
+# global counters were updated in Postgres as they happen. Instead deltas are
+# added up in Redis, spread over SHARDS hashes:
+#
+#   tasks:counters:<shard>  '<task id>:total' / '<task id>:pending' -> delta
+#
+# and flush() folds them into Postgres every so often with one UPDATE. A flush
+# first renames each shard to tasks:counters:processing:<shard> under a flush
+# id kept in tasks:counters:processing:id, and deletes those keys only once
+# the UPDATE has committed. The id is saved as a TaskCounterFlush row in the
+# same transaction as the UPDATE, so keys left behind by a flush that died
+# after committing are dropped by the next one rather than counted twice, and
+# keys left by one that died before are folded into it.
+
+SHARDS = 16
+TOTAL, PENDING = 'total', 'pending'
+
+
+class TaskCounters:
+
+    # KEYS[1] flush id, then pairs of shard and processing key
+    # ARGV[1] flush id to use if there is none
+    # Moves each shard's deltas to its processing key, adding them to any left
+    # there by an earlier flush that did not commit. Returns the flush id.
+    CLAIM_SHARDS = """
+redis.call('SET', KEYS[1], ARGV[1], 'NX')
+for i = 2, #KEYS, 2 do
+    local shard, processing = KEYS[i], KEYS[i + 1]
+    if redis.call('EXISTS', processing) == 1 then
+        local fields = redis.call('HGETALL', shard)
+        for j = 1, #fields, 2 do
+            redis.call('HINCRBY', processing, fields[j], fields[j + 1])
+        end
+        redis.call('DEL', shard)
+    elseif redis.call('EXISTS', shard) == 1 then
+        redis.call('RENAME', shard, processing)
+    end
+end
+return redis.call('GET', KEYS[1])
+"""
+
+    # Seconds a flush may hold the flush lock for
+    FLUSH_TIMEOUT = 300
+
+    def __init__(self, conn=None, prefix='tasks:counters', shards=SHARDS):
+        self._conn = conn
+        self.prefix = prefix
+        self.shards = shards
+        self._claim_shards = None
+
+    @property
+    def conn(self):
+        if self._conn is None:
+            self._conn = get_redis_connection("default")
+        return self._conn
+
+    def shard_key(self, shard):
+        return f'{self.prefix}:{shard % self.shards}'
+
+    def processing_key(self, shard):
+        return f'{self.prefix}:processing:{shard % self.shards}'
+
+    def flush_id_key(self):
+        return f'{self.prefix}:processing:id'
+
+    def add(self, deltas, shard=0):
+        # deltas is {(task_id, TOTAL or PENDING): delta}
+        deltas = {f'{task_id}:{counter}': delta for (task_id, counter), delta in deltas.items() if delta}
+        if not deltas:
+            return
+        key = self.shard_key(shard)
+        pipe = self.conn.pipeline(transaction=False)
+        for field, delta in deltas.items():
+            pipe.hincrby(key, field, delta)
+        pipe.execute()
+
+    def add_on_commit(self, deltas, shard=0):
+        # Counts the deltas only once the surrounding transaction commits, so
+        # rolled back work is never counted
+        transaction.on_commit(lambda: self.add(deltas, shard))
+
+    def record_completion(self, task_id, was_available, shard=0):
+        deltas = {(task_id, TOTAL): 1}
+        if was_available:
+            deltas[task_id, PENDING] = -1
+        self.add_on_commit(deltas, shard)
+
+    def record_available(self, task_ids, count=1, shard=0):
+        # count users were given each of task_ids as AVAILABLE
+        self.add_on_commit({(task_id, PENDING): count for task_id in task_ids}, shard)
+
+    def unflushed(self):
+        # Deltas not yet in Postgres, summed over the shards, as
+        # {task_id: {TOTAL: delta, PENDING: delta}}
+        pipe = self.conn.pipeline(transaction=False)
+        for shard in range(self.shards):
+            pipe.hgetall(self.shard_key(shard))
+            pipe.hgetall(self.processing_key(shard))
+        return _merge(pipe.execute())
+
+    def counts(self, tasks):
+        # {task_id: (total completions, pending completions)} for Tasks
+        # instances, from their saved values plus the unflushed deltas
+        unflushed = self.unflushed()
+        return {
+            task.pk: (
+                task.total_global_completions + unflushed.get(task.pk, {}).get(TOTAL, 0),
+                max(task.pending_global_completions + unflushed.get(task.pk, {}).get(PENDING, 0), 0),
+            )
+            for task in tasks
+        }
+
+    def flush(self):
+        # Moves every delta into Postgres with one UPDATE. The shards are
+        # claimed in one script call, so increments landing meanwhile go to
+        # the next flush, and the claimed deltas stay in Redis until the UPDATE
+        # commits. One flush runs at a time. Returns the number of tasks
+        # updated.
+        lock = self.flush_lock()
+        if not lock.acquire(blocking=False):
+            return 0
+        try:
+            updated = self._flush()
+        except Exception:
+            lock.release()
+            raise
+        # Held until the claimed deltas are deleted, so no other flush counts
+        # them again
+        transaction.on_commit(lock.release)
+        return updated
+
+    def flush_lock(self):
+        return self.conn.lock(f'{self.prefix}:flush', timeout=self.FLUSH_TIMEOUT)
+
+    def _flush(self):
+        from .models import Tasks, TaskCounterFlush
+
+        if self._claim_shards is None:
+            self._claim_shards = self.conn.register_script(self.CLAIM_SHARDS)
+        processing = [self.processing_key(shard) for shard in range(self.shards)]
+        claimed = [self.flush_id_key(), *processing]
+
+        # Deltas left by a flush that committed and died before deleting them
+        flush_id = _decode(self.conn.get(self.flush_id_key()))
+        if flush_id and TaskCounterFlush.objects.filter(flush_id=flush_id).exists():
+            self.conn.delete(*claimed)
+
+        flush_id = _decode(self._claim_shards(
+            keys=[self.flush_id_key(), *(
+                key for shard in range(self.shards) for key in (self.shard_key(shard), processing[shard])
+            )],
+            args=[uuid.uuid4().hex],
+        ))
+
+        pipe = self.conn.pipeline(transaction=False)
+        for key in processing:
+            pipe.hgetall(key)
+        deltas = _merge(pipe.execute())
+        if not deltas:
+            self.conn.delete(self.flush_id_key())
+            return 0
+
+        def delta_of(counter):
+            return Case(
+                *(When(id=task_id, then=Value(delta.get(counter, 0))) for task_id, delta in deltas.items()),
+                default=Value(0),
+            )
+
+        with transaction.atomic():
+            updated = Tasks.objects.filter(id__in=deltas).update(
+                total_global_completions=F('total_global_completions') + delta_of(TOTAL),
+                pending_global_completions=Greatest(F('pending_global_completions') + delta_of(PENDING), 0),
+            )
+            # Only the newest flush can have keys left behind, so only its row
+            # is kept. A concurrent flush of the same id fails on the key.
+            TaskCounterFlush.objects.exclude(flush_id=flush_id).delete()
+            TaskCounterFlush.objects.create(flush_id=flush_id)
+            transaction.on_commit(lambda: self.conn.delete(*claimed))
+        return updated
+
+
+def _merge(shards):
+    deltas = {}
+    for fields in shards:
+        for field, value in fields.items():
+            task_id, counter = _decode(field).rsplit(':', 1)
+            task_deltas = deltas.setdefault(int(task_id), {})
+            task_deltas[counter] = task_deltas.get(counter, 0) + int(value)
+    return deltas
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
+
+
+_counters = None
+_lock = threading.Lock()
+
+
+def get_task_counters():
+    global _counters
+    if _counters is None:
+        with _lock:
+            if _counters is None:
+                _counters = TaskCounters()
+    return _counters
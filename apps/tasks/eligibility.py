@@ -0,0 +1,106 @@
+from django.db.models import Q
+
+# Who should have a task is written as a rule and compiled to a filter on
+# users, so the same rule decides eligibility for one user at a time and for
+# the whole user base in one statement. A rule is JSON:
+#
+#   {"field": "is_expat"}                         the flag is set
+#   {"field": "country", "in": ["GB", "IE"]}      the value is one of these
+#   {"field": "is_vip", "equals": false}          the value equals this
+#   {"all": [rule, ...]}, {"any": [rule, ...]}, {"not": rule}
+#
+# An empty rule matches every user.
+
+# Fields a rule can test, and where they live relative to the user
+RULE_FIELDS = {
+    'is_expat': 'profile__is_expat',
+    'is_parent': 'profile__is_parent',
+    'is_student': 'profile__is_student',
+    'is_sports_traveler': 'profile__is_sports_traveler',
+    'is_festival_traveler': 'profile__is_festival_traveler',
+    'is_vip': 'profile__is_vip',
+    'is_company_of_interest': 'profile__is_company_of_interest',
+    'country': 'profile__phyiscal_location',
+}
+
+# The rule of a hidden task without its own rule, by target demographic
+DEMOGRAPHIC_RULES = {
+    'EXPAT': {'field': 'is_expat'},
+    'PARENT': {'field': 'is_parent'},
+    'STUDENT': {'field': 'is_student'},
+    'SPORTS': {'field': 'is_sports_traveler'},
+    'FESTIVAL': {'field': 'is_festival_traveler'},
+}
+
+
+def compile_rule(rule):
+    # Returns a Q over users, or None if no user can match. Raises ValueError
+    # for a malformed rule.
+    if not rule:
+        return Q()
+    if not isinstance(rule, dict):
+        raise ValueError(f'A rule must be an object, not {rule!r}')
+
+    if 'all' in rule:
+        compiled = [compile_rule(child) for child in _children(rule, 'all')]
+        if any(child is None for child in compiled):
+            return None
+        return _combine(compiled, Q.__and__, Q())
+    if 'any' in rule:
+        compiled = [child for child in map(compile_rule, _children(rule, 'any')) if child is not None]
+        if not compiled:
+            return None
+        return _combine(compiled, Q.__or__, None)
+    if 'not' in rule:
+        compiled = compile_rule(rule['not'])
+        if compiled is None:
+            return Q()
+        # An empty Q stays empty when negated, so negating a rule that
+        # matches everyone has to be spelled out
+        return None if compiled == Q() else ~compiled
+    if 'field' in rule:
+        return _compile_field(rule)
+    raise ValueError(f'Unknown rule {rule!r}')
+
+
+def _children(rule, key):
+    children = rule[key]
+    if not isinstance(children, list):
+        raise ValueError(f'"{key}" must be a list of rules')
+    return children
+
+
+def _combine(compiled, operator, start):
+    combined = start
+    for child in compiled:
+        combined = child if combined is None else operator(combined, child)
+    return combined
+
+
+def _compile_field(rule):
+    field = rule['field']
+    if field not in RULE_FIELDS:
+        raise ValueError(f'Rules cannot test {field!r}, only {sorted(RULE_FIELDS)}')
+    path = RULE_FIELDS[field]
+    if 'in' in rule:
+        if not isinstance(rule['in'], list):
+            raise ValueError('"in" must be a list of values')
+        return Q(**{f'{path}__in': rule['in']})
+    return Q(**{path: rule.get('equals', True)})
+
+
+def task_rule(task):
+    # The rule deciding who should have the task. Visible tasks go to every
+    # user, hidden ones to the users matched by their own rule, or by the
+    # rule of their target demographic.
+    if not task.is_hidden:
+        return {}
+    if task.eligibility:
+        return task.eligibility
+    return DEMOGRAPHIC_RULES.get(task.target_demographic, {'any': []})
+
+
+def eligible_users_q(task):
+    # Filter on users for the users who should have the task, or None if no
+    # user can be given it
+    return compile_rule(task_rule(task))
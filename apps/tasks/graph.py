@@ -0,0 +1,85 @@
+from uuid import uuid4
+from django.core.cache import cache
+
+# The prerequisite graph is read on every task completion, so it is compiled
+# once and kept both in Redis, shared by every worker, and in process. A
+# version token in Redis says which compiled graph is current: a worker only
+# fetches the graph again when the token changes, and saving or deleting a
+# task writes a new token.
+GRAPH_CACHE_KEY = 'tasks:prerequisite_graph'
+GRAPH_VERSION_CACHE_KEY = 'tasks:prerequisite_graph:version'
+
+_local = None
+
+
+class TaskGraph:
+    # Tasks and the task that must be done before each one. Every task has at
+    # most one prerequisite, so the graph is a forest as long as there are no
+    # cycles.
+
+    def __init__(self, prerequisites, version=None):
+        # prerequisites is {task_id: prerequisite_id or None}
+        self.prerequisites = dict(prerequisites)
+        self.version = version
+        self._dependents = {}
+        for task_id, prerequisite_id in self.prerequisites.items():
+            if prerequisite_id is not None:
+                self._dependents.setdefault(prerequisite_id, []).append(task_id)
+        self.order = self._topological_order()
+
+    @classmethod
+    def from_db(cls, version=None):
+        from .models import Tasks
+        return cls(Tasks.objects.order_by('display_order').values_list('id', 'prerequisite_id'), version)
+
+    def _topological_order(self):
+        # Prerequisites before their dependents. Raises ValueError naming the
+        # tasks on a cycle, since none of them can ever be unlocked.
+        order = [task_id for task_id, prerequisite_id in self.prerequisites.items() if prerequisite_id is None]
+        for task_id in order:
+            order.extend(self._dependents.get(task_id, ()))
+
+        if len(order) < len(self.prerequisites):
+            placed = set(order)
+            cycle = sorted(task_id for task_id in self.prerequisites if task_id not in placed)
+            raise ValueError(f'Task prerequisites form a cycle through tasks {cycle}')
+        return order
+
+    def dependents(self, task_id):
+        # Tasks unlocked by completing task_id
+        return self._dependents.get(task_id, [])
+
+    def would_cycle(self, task_id, prerequisite_id):
+        # True if making prerequisite_id the prerequisite of task_id closes a
+        # cycle, that is task_id is prerequisite_id or one of its ancestors
+        seen = set()
+        while prerequisite_id is not None and prerequisite_id not in seen:
+            if prerequisite_id == task_id:
+                return True
+            seen.add(prerequisite_id)
+            prerequisite_id = self.prerequisites.get(prerequisite_id)
+        return False
+
+
+def get_task_graph():
+    global _local
+    version = cache.get(GRAPH_VERSION_CACHE_KEY)
+    if version is None:
+        cache.add(GRAPH_VERSION_CACHE_KEY, uuid4().hex, timeout=None)
+        version = cache.get(GRAPH_VERSION_CACHE_KEY)
+
+    if _local is not None and _local.version == version:
+        return _local
+
+    graph = cache.get(GRAPH_CACHE_KEY)
+    if graph is None or graph.version != version:
+        graph = TaskGraph.from_db(version)
+        cache.set(GRAPH_CACHE_KEY, graph, timeout=None)
+    _local = graph
+    return graph
+
+
+def invalidate_task_graph():
+    global _local
+    _local = None
+    cache.set(GRAPH_VERSION_CACHE_KEY, uuid4().hex, timeout=None)
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.tasks.models import Tasks
+from apps.tasks.services import TaskBackfillService
+
+
+class Command(BaseCommand):
+    help = (
+        'Give tasks to every eligible existing user who does not have them yet. '
+        'An interrupted run carries on where it stopped unless --restart is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('task_ids', nargs='+', type=int)
+        parser.add_argument('--chunk-size', type=int, default=10000)
+        parser.add_argument('--restart', action='store_true')
+
+    def handle(self, *args, **options):
+        tasks = Tasks.objects.in_bulk(options['task_ids'])
+        missing = set(options['task_ids']) - set(tasks)
+        if missing:
+            raise CommandError(f'Tasks do not exist: {sorted(missing)}')
+
+        for task_id in options['task_ids']:
+            task = tasks[task_id]
+
+            def report(done, last, created):
+                self.stdout.write(f'{task}: users up to {done}/{last}, {created} assigned')
+
+            created = TaskBackfillService.backfill_task(
+                task, chunk_size=options['chunk_size'], restart=options['restart'], progress=report,
+            )
+            self.stdout.write(self.style.SUCCESS(f'Assigned {task} to {created} users'))
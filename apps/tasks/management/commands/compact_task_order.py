@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from apps.tasks.models import Tasks
+from apps.tasks.services import TaskOrderingService
+
+
+class Command(BaseCommand):
+    help = (
+        'Respace task display orders so there is room to insert tasks between them again. '
+        'Pause task edits while this runs.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--gap', type=int, default=Tasks.ORDER_GAP)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = TaskOrderingService.compact_display_order(gap=options['gap'], batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Respaced {count} tasks {options["gap"]} apart'))
@@ -0,0 +1,46 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from apps.tasks.outbox import CompletionOutboxWorker, outbox_metrics, purge_processed, retry_failed
+
+
+class Command(BaseCommand):
+    help = 'Award the queue jumps of completed tasks waiting in the completion outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--follow', action='store_true', help='Keep draining as new completions arrive')
+        parser.add_argument('--interval', type=float, default=1.0, help='Seconds to wait when the outbox is empty')
+        parser.add_argument('--status', action='store_true', help='Only print the backlog, lag and throughput')
+        parser.add_argument('--retry-failed', action='store_true', help='Put parked completions back in the backlog')
+        parser.add_argument(
+            '--purge-days', type=int, help='Delete completions processed more than this many days ago, then exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.report()
+            return
+        if options['purge_days'] is not None:
+            deleted = purge_processed(older_than=timedelta(days=options['purge_days']))
+            self.stdout.write(f'Deleted {deleted} processed completions')
+            return
+        if options['retry_failed']:
+            self.stdout.write(f'Retrying {retry_failed()} parked completions')
+
+        worker = CompletionOutboxWorker(batch_size=options['batch_size'])
+        while True:
+            processed = worker.drain()
+            if processed:
+                self.stdout.write(f'Awarded {processed} completions')
+                self.report()
+            if not options['follow']:
+                break
+            time.sleep(options['interval'])
+
+    def report(self):
+        metrics = outbox_metrics()
+        self.stdout.write(
+            f"Backlog {metrics['backlog']}, lag {metrics['lag_seconds']:.1f}s, "
+            f"throughput {metrics['throughput']:.1f}/s, failed {metrics['failed']}"
+        )
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+from apps.tasks.models import Tasks
+from apps.tasks.services import TaskEligibilityService
+
+
+class Command(BaseCommand):
+    help = (
+        'Give tasks to every user who matches their eligibility rule and take them from users '
+        'who no longer match and have not started them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('task_ids', nargs='+', type=int)
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        tasks = Tasks.objects.in_bulk(options['task_ids'])
+        missing = set(options['task_ids']) - set(tasks)
+        if missing:
+            raise CommandError(f'Tasks do not exist: {sorted(missing)}')
+
+        for task_id in options['task_ids']:
+            counts = TaskEligibilityService.reevaluate_task(tasks[task_id], chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{tasks[task_id]}: assigned to {counts['assigned']} users, removed from {counts['removed']}"
+            ))
@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+# get_or_create used to run with state="AVAILABLE" in its lookup, so a user
+# could be given the same task more than once. Keep the row with the most
+# repetitions, then the oldest, before the constraint is added.
+DELETE_DUPLICATE_USER_TASKS = """
+DELETE FROM tasks_usertasks AS duplicate
+USING tasks_usertasks AS kept
+WHERE duplicate.user_id = kept.user_id
+  AND duplicate.task_id = kept.task_id
+  AND (
+    duplicate.repetitions < kept.repetitions
+    OR (duplicate.repetitions = kept.repetitions AND duplicate.id > kept.id)
+  )
+"""
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0002_initial"),
+    ]
+
+    operations = [
+        migrations.RunSQL(DELETE_DUPLICATE_USER_TASKS, reverse_sql=migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name="usertasks",
+            constraint=models.UniqueConstraint(
+                fields=("user", "task"), name="unique_user_task"
+            ),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0003_usertasks_unique_user_task"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="tasks",
+            name="display_order",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Leave blank to add the task at the end.",
+                unique=True,
+            ),
+        ),
+    ]
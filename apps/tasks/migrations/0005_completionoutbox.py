@@ -0,0 +1,57 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0004_tasks_display_order_gaps"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CompletionOutbox",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("repetition", models.PositiveIntegerField()),
+                ("queue_jumps", models.PositiveBigIntegerField()),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "user_task",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="completions",
+                        to="tasks.usertasks",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("processed_at__isnull", True)),
+                        fields=["id"],
+                        name="completion_outbox_pending",
+                    ),
+                    models.Index(
+                        fields=["processed_at"], name="completion_outbox_processed"
+                    ),
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="completionoutbox",
+            constraint=models.UniqueConstraint(
+                fields=("user_task", "repetition"), name="unique_completion"
+            ),
+        ),
+    ]
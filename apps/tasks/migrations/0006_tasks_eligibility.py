@@ -0,0 +1,37 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0005_completionoutbox"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="tasks",
+            name="eligibility",
+            field=models.JSONField(
+                blank=True,
+                help_text="Rule for which users get this hidden task, see apps.tasks.eligibility. "
+                "Defaults to the users in the target demographic.",
+                null=True,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="tasks",
+            name="target_demographic",
+            field=models.CharField(
+                blank=True,
+                choices=[
+                    ("EXPAT", "Expat"),
+                    ("PARENT", "Parent"),
+                    ("SPORTS", "Sports"),
+                    ("FESTIVAL", "Festival"),
+                    ("STUDENT", "Student"),
+                ],
+                max_length=25,
+            ),
+        ),
+    ]
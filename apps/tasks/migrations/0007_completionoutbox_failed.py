@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0006_tasks_eligibility"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="completionoutbox",
+            name="completion_outbox_pending",
+        ),
+        migrations.AddField(
+            model_name="completionoutbox",
+            name="error",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="completionoutbox",
+            name="failed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="completionoutbox",
+            index=models.Index(
+                condition=models.Q(
+                    ("failed_at__isnull", True), ("processed_at__isnull", True)
+                ),
+                fields=["id"],
+                name="completion_outbox_pending",
+            ),
+        ),
+    ]
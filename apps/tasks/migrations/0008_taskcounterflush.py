@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tasks", "0007_completionoutbox_failed"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaskCounterFlush",
+            fields=[
+                ("flush_id", models.UUIDField(primary_key=True, serialize=False)),
+                ("flushed_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,15 +1,24 @@
 from django.db import models, transaction
-from django.db.models import F
+from django.db.models import Exists, Max, OuterRef
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
+from .board import get_task_board
+from .counters import get_task_counters
+from .eligibility import compile_rule
+from .graph import get_task_graph
 
 class Tasks(models.Model):
+    # New tasks are appended ORDER_GAP after the last one, so a task can later
+    # be slotted in between without renumbering its neighbours
+    ORDER_GAP = 1024
+
     TARGET_DEMO_CHOICES = [
         ("EXPAT", "Expat"),
         ("PARENT", "Parent"),
         ("SPORTS", "Sports"),
         ("FESTIVAL", "Festival"),
+        ("STUDENT", "Student"),
     ]
     title = models.CharField(max_length=255)
     description = models.TextField(max_length=255, blank=True)
@@ -26,7 +35,9 @@ class Tasks(models.Model):
     max_repetitions = models.PositiveIntegerField(
         default=1, help_text="Maximum number of times a user can repeat a task."
     )
-    display_order = models.PositiveIntegerField(unique=True)
+    display_order = models.PositiveIntegerField(
+        unique=True, blank=True, help_text="Leave blank to add the task at the end."
+    )
     total_global_completions = models.PositiveIntegerField(
         default=0, help_text="Total completions by all users."
     )
@@ -38,12 +49,37 @@ class Tasks(models.Model):
     target_demographic = models.CharField(
         max_length=25, choices=TARGET_DEMO_CHOICES, blank=True
     )
+    eligibility = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Rule for which users get this hidden task, see apps.tasks.eligibility. "
+        "Defaults to the users in the target demographic.",
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Fields that decide which users should have the task
+    ELIGIBILITY_FIELDS = ("is_hidden", "target_demographic", "eligibility")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_eligibility = instance._eligibility()
+        return instance
+
+    def _eligibility(self):
+        return tuple(self.__dict__.get(field) for field in self.ELIGIBILITY_FIELDS)
+
+    def eligibility_changed(self):
+        # True when a loaded task's eligibility differs from what was loaded
+        # or last saved. Always False for new tasks.
+        saved = getattr(self, "_saved_eligibility", None)
+        return saved is not None and saved != self._eligibility()
+
     def clean(self):
-        # If the task is hidden, target_demographic must be set
-        if self.is_hidden and not self.target_demographic:
+        # If the task is hidden, target_demographic or an eligibility rule
+        # must be set
+        if self.is_hidden and not self.target_demographic and not self.eligibility:
             raise ValidationError(
                 {
                     "target_demographic": _(
@@ -61,19 +97,74 @@ class Tasks(models.Model):
                     )
                 }
             )
-            
+
+        # Visible tasks go to every user, so only hidden tasks take a rule
+        if self.eligibility:
+            if not self.is_hidden:
+                raise ValidationError(
+                    {"eligibility": _("This field must be blank when the task is not hidden.")}
+                )
+            try:
+                compile_rule(self.eligibility)
+            except ValueError as e:
+                raise ValidationError({"eligibility": str(e)})
+
+        # A task cannot depend on itself or on any task that depends on it
+        if self.pk and self.prerequisite_id and get_task_graph().would_cycle(self.pk, self.prerequisite_id):
+            raise ValidationError(
+                {
+                    "prerequisite": _(
+                        "This task cannot depend on itself or on a task that depends on it."
+                    )
+                }
+            )
+
     def save(self, *args, **kwargs):
         with transaction.atomic():
             # If the task is being added, not updated
             if self._state.adding:
-                # If a task with the same display_order exists, increment all subsequent tasks
-                if Tasks.objects.filter(display_order=self.display_order).exists():
-                    Tasks.objects.filter(display_order__gte=self.display_order)\
-                        .order_by('-display_order')\
-                        .update(display_order=F('display_order') + 1)
-            
+                if self.display_order is None:
+                    self.display_order = Tasks.next_display_order()
+                else:
+                    Tasks.make_room_at(self.display_order)
+
             self.full_clean()  # Validate now, after re-ordering logic
             super().save(*args, **kwargs)  # Save the current instance
+        self._saved_eligibility = self._eligibility()
+
+    @staticmethod
+    def next_display_order():
+        last = Tasks.objects.aggregate(last=Max("display_order"))["last"]
+        return Tasks.ORDER_GAP if last is None else last + Tasks.ORDER_GAP
+
+    @staticmethod
+    def make_room_at(display_order):
+        # Frees display_order by moving the task holding it, and any tasks
+        # directly after it, up by one. Only the run of consecutive orders up
+        # to the next gap moves, which is a single row when orders are spaced
+        # out. Must be called inside a transaction.
+        if not Tasks.objects.filter(display_order=display_order).exists():
+            return
+
+        run_end = (
+            Tasks.objects.filter(display_order__gte=display_order)
+            .annotate(has_next=Exists(Tasks.objects.filter(display_order=OuterRef("display_order") + 1)))
+            .filter(has_next=False)
+            .order_by("display_order")
+            .values_list("display_order", flat=True)
+            .first()
+        )
+        run = (
+            Tasks.objects.select_for_update()
+            .filter(display_order__range=(display_order, run_end))
+            .order_by("-display_order")
+            .values_list("id", "display_order")
+        )
+        # Last first, one row at a time, so the unique constraint holds after
+        # every UPDATE
+        for task_id, order in run:
+            Tasks.objects.filter(id=task_id).update(display_order=order + 1)
+        transaction.on_commit(get_task_board().refresh_catalogue)
 
     def __str__(self):
         return self.title
@@ -92,25 +183,68 @@ class UserTasks(models.Model):
     state = models.CharField(max_length=10, choices=STATE_CHOICES)
     repetitions = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "task"], name="unique_user_task"),
+        ]
+
     def complete(self):
-        # Mark the task as completed and handle related logic.
+        # Mark the task as completed and handle related logic. The queue jumps
+        # it earns are queued in the outbox in the same transaction and
+        # awarded later by apps.tasks.outbox.CompletionOutboxWorker. The row
+        # is re-read under a lock first, so a double submit counts twice from
+        # the current repetitions instead of colliding in the outbox.
         if self.state != "COMPLETED":
-            self.repetitions += 1
-            if self.repetitions >= self.task.max_repetitions:
-                self.state = "COMPLETED"
-            # Unlock dependent tasks
-            self._unlock_dependent_tasks()
-            self.save()
+            with transaction.atomic():
+                self.state, self.repetitions = (
+                    UserTasks.objects.select_for_update().values_list("state", "repetitions").get(pk=self.pk)
+                )
+                if self.state == "COMPLETED":
+                    return
+                was_available = self.state == "AVAILABLE"
+                self.repetitions += 1
+                if self.repetitions >= self.task.max_repetitions:
+                    self.state = "COMPLETED"
+                    get_task_counters().record_completion(self.task_id, was_available, shard=self.user_id)
+                # Unlock dependent tasks
+                unlocked = self._unlock_dependent_tasks()
+                self.save()
+                CompletionOutbox.objects.create(
+                    user_task=self, repetition=self.repetitions, queue_jumps=self.task.queue_jumps
+                )
+                get_task_board().update_rows_on_commit(
+                    self.user_id, {**unlocked, self.task_id: (self.state, self.repetitions)}
+                )
 
     def _unlock_dependent_tasks(self):
-        # Unlock tasks that are dependent on the completion of this task.
-        for dependent in self.task.dependent.all():
-            user_task, created = UserTasks.objects.get_or_create(
-                user=self.user, task=dependent
+        # Unlock tasks that are dependent on the completion of this task. The
+        # user's rows for them are read once, then one UPDATE unlocks the
+        # existing ones and one INSERT adds the rest. Returns {task_id:
+        # (state, repetitions)} for the tasks unlocked.
+        dependents = get_task_graph().dependents(self.task_id)
+        if not dependents:
+            return {}
+        rows = {
+            task_id: (state, repetitions)
+            for task_id, state, repetitions in UserTasks.objects.filter(
+                user_id=self.user_id, task_id__in=dependents
+            ).values_list("task_id", "state", "repetitions")
+        }
+        locked = [task_id for task_id, (state, _) in rows.items() if state not in ("AVAILABLE", "COMPLETED")]
+        missing = [task_id for task_id in dependents if task_id not in rows]
+
+        if locked:
+            UserTasks.objects.filter(user_id=self.user_id, task_id__in=locked).update(state="AVAILABLE")
+        if missing:
+            UserTasks.objects.bulk_create(
+                [UserTasks(user_id=self.user_id, task_id=task_id, state="AVAILABLE") for task_id in missing],
+                ignore_conflicts=True,
             )
-            if created or user_task.state != "COMPLETED":
-                user_task.state = "AVAILABLE"
-                user_task.save()
+        get_task_counters().record_available(locked + missing, shard=self.user_id)
+        return {
+            **{task_id: ("AVAILABLE", rows[task_id][1]) for task_id in locked},
+            **{task_id: ("AVAILABLE", 0) for task_id in missing},
+        }
 
     def save(self, *args, **kwargs):
         # The save method now only calls the superclass's save method.
@@ -119,3 +253,43 @@ class UserTasks(models.Model):
 
     def __str__(self):
         return f"{self.user.username} - {self.task.title}"
+
+
+class CompletionOutbox(models.Model):
+    # One row per task completion whose queue jumps have to be awarded on the
+    # leaderboard. (user_task, repetition) identifies the completion, so it is
+    # recorded and awarded at most once. Rows that cannot be awarded are
+    # parked with failed_at and error set until they are retried.
+    user_task = models.ForeignKey(UserTasks, on_delete=models.CASCADE, related_name="completions")
+    repetition = models.PositiveIntegerField()
+    queue_jumps = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+    error = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user_task", "repetition"], name="unique_completion"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["id"], name="completion_outbox_pending",
+                condition=models.Q(processed_at__isnull=True, failed_at__isnull=True),
+            ),
+            models.Index(fields=["processed_at"], name="completion_outbox_processed"),
+        ]
+
+    def __str__(self):
+        return f"{self.user_task} #{self.repetition}"
+
+
+class TaskCounterFlush(models.Model):
+    # The last flush of apps.tasks.counters.TaskCounters to commit, saved in
+    # the same transaction as its UPDATE so a flush that dies before clearing
+    # its keys in Redis is not counted again.
+    flush_id = models.UUIDField(primary_key=True)
+    flushed_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.flush_id)
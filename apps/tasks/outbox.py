@@ -0,0 +1,148 @@
+import logging
+import time
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+from apps.leaderboard.registry import get_leaderboard
+from apps.leaderboard.scores import SEQUENCE_SPAN, SEQUENCE_STRIDE
+from apps.teams.registry import TeamRegistry
+from .models import CompletionOutbox
+from .scripts import AWARD_JUMPS
+
+logger = logging.getLogger(__name__)
+
+# Completions are written to CompletionOutbox in the request's transaction and
+# their queue jumps awarded here, so no Redis scripting runs while the request
+# holds its row locks. Each award is keyed by (user task, repetition) and the
+# key is marked awarded in Redis by the script that jumps the player, so a
+# batch that is retried after a crash or a failed commit awards nothing twice.
+# Completions that cannot be awarded, like those of a team missing from the
+# board, are parked with failed_at set so they do not hold up the rest, and
+# can be retried with retry_failed().
+
+AWARDED_KEY = 'tasks:outbox:awarded'
+CAUSE = 'task'
+MISSING, ALREADY_AWARDED = -1, -2
+
+
+class CompletionOutboxWorker:
+
+    def __init__(self, leaderboard=None, registry=None, batch_size=500, retention=timedelta(days=7)):
+        self.leaderboard = leaderboard or get_leaderboard()
+        self.registry = registry or TeamRegistry(self.leaderboard.conn)
+        self.batch_size = batch_size
+        # How long awarded keys are remembered. Must be longer than any batch
+        # can stay unprocessed for.
+        self.retention = retention
+        self.awarded_key = f'{self.leaderboard.leaderboard}:{AWARDED_KEY}'
+        self._award_jumps = self.leaderboard.conn.register_script(AWARD_JUMPS)
+
+    def drain_once(self):
+        # Awards one batch and marks it processed. Rows locked by another
+        # worker are skipped. Returns the number of rows processed.
+        with transaction.atomic():
+            entries = list(
+                CompletionOutbox.objects.select_for_update(skip_locked=True, of=('self',))
+                .filter(processed_at__isnull=True, failed_at__isnull=True)
+                .order_by('id')
+                .values_list('id', 'user_task_id', 'repetition', 'queue_jumps', 'user_task__user_id')[:self.batch_size]
+            )
+            if not entries:
+                return 0
+
+            failed = self._award(entries)
+            now = timezone.now()
+            for error, ids in failed.items():
+                logger.error('Parked %d completions: %s', len(ids), error)
+                CompletionOutbox.objects.filter(id__in=ids).update(failed_at=now, error=error[:255])
+            parked = {entry_id for ids in failed.values() for entry_id in ids}
+            CompletionOutbox.objects.filter(id__in=[entry[0] for entry in entries if entry[0] not in parked])\
+                .update(processed_at=now)
+        return len(entries)
+
+    def drain(self, max_batches=None):
+        # Drains batches until the outbox is empty or max_batches is reached.
+        # Returns the number of rows processed.
+        processed, batches = 0, 0
+        while max_batches is None or batches < max_batches:
+            started = time.monotonic()
+            count = self.drain_once()
+            if not count:
+                break
+            processed += count
+            batches += 1
+            elapsed = time.monotonic() - started
+            logger.info('Awarded %d completions in %.3fs (%.0f/s)', count, elapsed, count / elapsed if elapsed else 0)
+        return processed
+
+    def _award(self, entries):
+        # Jumps each user, or their team, by the task's queue jumps. Users not
+        # on the board are added at the bottom first, like RankingManager does.
+        # Returns {error: [outbox ids]} for the entries that could not be
+        # awarded.
+        user_ids = [str(user_id) for *_, user_id in entries]
+        team_ids = self.registry.teams_of(user_ids)
+        awards = [
+            (f'{user_task_id}:{repetition}', team_id or user_id, queue_jumps)
+            for (_, user_task_id, repetition, queue_jumps, _), user_id, team_id in zip(entries, user_ids, team_ids)
+        ]
+
+        results = self._call(awards)
+        missing = [
+            (entry[0], award, team_id)
+            for entry, award, team_id, (rank, _) in zip(entries, awards, team_ids, results) if rank == MISSING
+        ]
+        if not missing:
+            return {}
+
+        failed = {}
+        for entry_id, (_, player_id, _), team_id in missing:
+            if team_id:
+                failed.setdefault(f'Team {player_id} is missing from the leaderboard', []).append(entry_id)
+        solo = [award for _, award, team_id in missing if not team_id]
+        for player_id in dict.fromkeys(player_id for _, player_id, _ in solo):
+            self.leaderboard.add_player(player_id)
+        if solo:
+            self._call(solo)
+        return failed
+
+    def _call(self, awards):
+        now = time.time()
+        args = [now, SEQUENCE_SPAN, SEQUENCE_STRIDE, self.leaderboard.JUMP_WINDOW, self.leaderboard.EVENTS_MAXLEN,
+                now - self.retention.total_seconds()]
+        for key, player_id, spaces in awards:
+            args.extend((key, player_id, spaces, CAUSE))
+        results = self._award_jumps(
+            keys=[self.leaderboard.leaderboard, self.leaderboard.sequence, self.leaderboard.events, self.awarded_key],
+            args=args,
+        )
+        return list(zip(results[::2], results[1::2]))
+
+
+def outbox_metrics(window=timedelta(minutes=1)):
+    # Completions waiting to be awarded, how long the oldest has waited in
+    # seconds, completions awarded per second over the last window by all
+    # workers together, and completions parked as failed
+    now = timezone.now()
+    backlog = CompletionOutbox.objects.filter(processed_at__isnull=True, failed_at__isnull=True)
+    oldest = backlog.aggregate(oldest=Min('created_at'))['oldest']
+    processed = CompletionOutbox.objects.filter(processed_at__gte=now - window).count()
+    return {
+        'backlog': backlog.count(),
+        'lag_seconds': (now - oldest).total_seconds() if oldest else 0.0,
+        'throughput': processed / window.total_seconds(),
+        'failed': CompletionOutbox.objects.filter(failed_at__isnull=False).count(),
+    }
+
+
+def retry_failed():
+    # Puts parked completions back in the backlog. Returns how many.
+    return CompletionOutbox.objects.filter(failed_at__isnull=False).update(failed_at=None, error='')
+
+
+def purge_processed(older_than=timedelta(days=7)):
+    # Deletes outbox rows processed before older_than ago
+    cutoff = timezone.now() - older_than
+    deleted, _ = CompletionOutbox.objects.filter(processed_at__lt=cutoff).delete()
+    return deleted
@@ -0,0 +1,51 @@
+from apps.leaderboard.scripts import _ENCODE, _JUMP, _PLACE, _RECORD
+
+# KEYS[1] leaderboard, KEYS[2] sequence counter, KEYS[3] event stream, KEYS[4]
+# sorted set of awarded completion keys scored by when they were awarded
+# ARGV[1] current time, ARGV[2] sequence span, ARGV[3] sequence stride,
+# ARGV[4] how many ranks above a target to search, ARGV[5] event stream maxlen,
+# ARGV[6] time before which awarded keys are forgotten, then completion key,
+# player id, spaces and cause for each award from ARGV[7]
+# Jumps each player whose completion key has not been awarded yet and marks
+# the key awarded in the same call, so retrying a batch never jumps a player
+# twice. Returns a flat list with the new rank and score of each award in
+# argument order, -1 and an empty string for players not on the board, whose
+# keys stay unawarded, and -2 and an empty string for keys already awarded.
+AWARD_JUMPS = _ENCODE + _RECORD + _PLACE + _JUMP + """
+local now, window, maxlen = ARGV[1], tonumber(ARGV[4]), tonumber(ARGV[5])
+redis.call('ZREMRANGEBYSCORE', KEYS[4], '-inf', '(' .. ARGV[6])
+
+local jumps, results = {}, {}
+for i = 7, #ARGV, 4 do
+    local index = (i - 3) / 4
+    local rank = redis.call('ZREVRANK', KEYS[1], ARGV[i + 1])
+    if redis.call('ZSCORE', KEYS[4], ARGV[i]) then
+        results[2 * index - 1], results[2 * index] = -2, ''
+    elseif not rank then
+        results[2 * index - 1], results[2 * index] = -1, ''
+    else
+        local spaces = tonumber(ARGV[i + 2])
+        jumps[#jumps + 1] = {
+            key = ARGV[i], player_id = ARGV[i + 1], spaces = spaces, cause = ARGV[i + 3],
+            rank = rank, target = math.max(0, rank - spaces), index = index,
+        }
+    end
+end
+
+table.sort(jumps, function(a, b)
+    if a.target ~= b.target then
+        return a.target < b.target
+    end
+    return a.rank < b.rank
+end)
+
+for _, j in ipairs(jumps) do
+    local result = jump(j.player_id, j.spaces, window, maxlen, j.cause)
+    if type(result) == 'table' and result.err then
+        return result
+    end
+    redis.call('ZADD', KEYS[4], now, j.key)
+    results[2 * j.index - 1], results[2 * j.index] = result[1], result[2]
+end
+return results
+"""
@@ -0,0 +1,229 @@
+from itertools import islice
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Case, CharField, Exists, F, IntegerField, Max, OuterRef, Q, Value, When
+from .board import get_task_board
+from .counters import PENDING, get_task_counters
+from .eligibility import eligible_users_q
+from .models import Tasks, UserTasks
+
+User = get_user_model()
+
+VISIBLE_TASKS_CACHE_KEY = 'tasks:visible_template'
+BACKFILL_PROGRESS_CACHE_KEY = 'tasks:backfill:{task_id}'
+
+# Counts the rows returned by a data-modifying CTE, and how many of them are
+# AVAILABLE, so bulk writes never bring one row per user back to Python
+COUNT_STATES = "SELECT count(*), count(*) FILTER (WHERE state = 'AVAILABLE')"
+
+
+class TaskProvisioningService:
+    # Creates the starting UserTasks rows for new users. The visible tasks are
+    # read once into a cached template of (task_id, state), so provisioning a
+    # user costs a single bulk INSERT.
+
+    @staticmethod
+    def get_visible_task_template():
+        template = cache.get(VISIBLE_TASKS_CACHE_KEY)
+        if template is None:
+            visible_tasks = Tasks.objects.filter(is_hidden=False).order_by('display_order')
+            template = [
+                (task_id, 'AVAILABLE' if prerequisite_id is None else 'LOCKED')
+                for task_id, prerequisite_id in visible_tasks.values_list('id', 'prerequisite_id')
+            ]
+            cache.set(VISIBLE_TASKS_CACHE_KEY, template, timeout=None)
+        return template
+
+    @staticmethod
+    def invalidate_visible_task_template():
+        cache.delete(VISIBLE_TASKS_CACHE_KEY)
+
+    @staticmethod
+    def provision_user(user):
+        template = TaskProvisioningService.get_visible_task_template()
+        get_task_counters().record_available(_available(template), shard=user.pk)
+        return UserTasks.objects.bulk_create(
+            UserTasks(user_id=user.pk, task_id=task_id, state=state) for task_id, state in template
+        )
+
+    @staticmethod
+    def provision_users(users, batch_size=1000):
+        # For imports: provisions any number of users with one INSERT per
+        # batch_size rows. Returns the number of rows created.
+        template = TaskProvisioningService.get_visible_task_template()
+        rows = (
+            UserTasks(user_id=user.pk, task_id=task_id, state=state)
+            for user in users
+            for task_id, state in template
+        )
+        created = 0
+        while batch := list(islice(rows, batch_size)):
+            created += len(UserTasks.objects.bulk_create(batch))
+        if template:
+            get_task_counters().record_available(_available(template), count=created // len(template))
+        return created
+
+
+class TaskOrderingService:
+
+    @staticmethod
+    def compact_display_order(gap=Tasks.ORDER_GAP, batch_size=1000):
+        # Respaces every task to gap, 2 * gap, ... keeping their order. Tasks
+        # are first parked above both the current and the new orders, last
+        # task first, then moved down to their new orders, first task first.
+        # Each batch commits on its own and the order stays intact between
+        # batches, so an interrupted run is finished by running it again.
+        # Returns the number of tasks respaced.
+        task_ids = list(Tasks.objects.order_by('display_order').values_list('id', flat=True))
+        if not task_ids:
+            return 0
+
+        last = Tasks.objects.aggregate(last=Max('display_order'))['last']
+        offset = max(last, gap * len(task_ids)) + 1
+        starts = range(0, len(task_ids), batch_size)
+
+        for start in reversed(starts):
+            batch = task_ids[start:start + batch_size]
+            with transaction.atomic():
+                Tasks.objects.bulk_update(
+                    [Tasks(id=task_id, display_order=offset + start + i + 1) for i, task_id in enumerate(batch)],
+                    ['display_order'],
+                )
+
+        for start in starts:
+            with transaction.atomic():
+                Tasks.objects.filter(id__in=task_ids[start:start + batch_size])\
+                    .update(display_order=(F('display_order') - offset) * gap)
+
+        TaskProvisioningService.invalidate_visible_task_template()
+        get_task_board().refresh_catalogue()
+        return len(task_ids)
+
+
+class TaskBackfillService:
+    # Gives tasks added after signup to every eligible existing user. Each
+    # chunk of user ids is one INSERT ... SELECT that commits on its own, so
+    # no lock is held for long. The last user id done is kept in the cache so
+    # an interrupted backfill carries on from there.
+
+    @staticmethod
+    def progress_key(task):
+        return BACKFILL_PROGRESS_CACHE_KEY.format(task_id=task.pk)
+
+    @staticmethod
+    def backfill_task(task, chunk_size=10000, restart=False, progress=None):
+        # Returns the number of UserTasks rows created. progress, if given, is
+        # called with (last user id done, last user id, rows created so far)
+        # after each chunk.
+        key = TaskBackfillService.progress_key(task)
+        eligible = eligible_users_q(task)
+        last_id = User.objects.aggregate(last=Max('id'))['last']
+        if eligible is None or last_id is None:
+            cache.delete(key)
+            return 0
+
+        done = 0 if restart else cache.get(key, 0)
+        created = 0
+        while done < last_id:
+            upper = min(done + chunk_size, last_id)
+            created += TaskBackfillService._insert_chunk(task, eligible, done, upper)
+            done = upper
+            cache.set(key, done, timeout=None)
+            if progress:
+                progress(done, last_id, created)
+
+        cache.delete(key)
+        if created:
+            get_task_board().invalidate_all()
+        return created
+
+    @staticmethod
+    def _insert_chunk(task, eligible, lower, upper):
+        # Users in (lower, upper] get the task, AVAILABLE if it has no
+        # prerequisite or they have already done the prerequisite at least
+        # once, LOCKED otherwise. Users who have the task are left alone.
+        if task.prerequisite_id is None:
+            state = Value('AVAILABLE', output_field=CharField())
+        else:
+            prerequisite_done = UserTasks.objects.filter(
+                Q(repetitions__gt=0) | Q(state='COMPLETED'),
+                user_id=OuterRef('pk'), task_id=task.prerequisite_id,
+            )
+            state = Case(
+                When(Exists(prerequisite_done), then=Value('AVAILABLE')),
+                default=Value('LOCKED'),
+                output_field=CharField(),
+            )
+
+        rows = (
+            User.objects.filter(eligible, id__gt=lower, id__lte=upper)
+            .annotate(
+                backfill_task_id=Value(task.pk, output_field=IntegerField()),
+                backfill_state=state,
+                backfill_repetitions=Value(0, output_field=IntegerField()),
+            )
+            .values_list('id', 'backfill_task_id', 'backfill_state', 'backfill_repetitions')
+        )
+        select, params = rows.query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH inserted AS ('
+                f'INSERT INTO {UserTasks._meta.db_table} (user_id, task_id, state, repetitions) {select} '
+                f'ON CONFLICT (user_id, task_id) DO NOTHING RETURNING state'
+                f') {COUNT_STATES} FROM inserted',
+                params,
+            )
+            created, available = cursor.fetchone()
+            get_task_counters().record_available([task.pk], count=available)
+        return created
+
+
+class TaskEligibilityService:
+    # Brings every user's copy of a task in line with its eligibility rule
+    # after the rule changes, set-based in chunks of user ids like the
+    # backfill. Users who start matching get the task. Users who stop matching
+    # lose it if they have not started it, and keep any progress otherwise.
+
+    UNSTARTED_STATES = ('AVAILABLE', 'LOCKED', 'HIDDEN')
+
+    @staticmethod
+    def reevaluate_task(task, chunk_size=10000):
+        # Returns {'assigned': rows created, 'removed': rows deleted}
+        assigned = TaskBackfillService.backfill_task(task, chunk_size=chunk_size, restart=True)
+
+        eligible = eligible_users_q(task)
+        last_id = User.objects.aggregate(last=Max('id'))['last']
+        removed = 0
+        if last_id is not None and eligible != Q():
+            for lower in range(0, last_id, chunk_size):
+                removed += TaskEligibilityService._remove_chunk(task, eligible, lower, lower + chunk_size)
+        if removed:
+            get_task_board().invalidate_all()
+        return {'assigned': assigned, 'removed': removed}
+
+    @staticmethod
+    def _remove_chunk(task, eligible, lower, upper):
+        # Deletes the unstarted rows of users in (lower, upper] who no longer
+        # match. Returns the number of rows deleted.
+        ineligible = UserTasks.objects.filter(
+            task_id=task.pk, repetitions=0, state__in=TaskEligibilityService.UNSTARTED_STATES,
+            user_id__gt=lower, user_id__lte=upper,
+        )
+        if eligible is not None:
+            ineligible = ineligible.exclude(Exists(User.objects.filter(eligible, pk=OuterRef('user_id'))))
+
+        select, params = ineligible.values('id').query.sql_with_params()
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH deleted AS (DELETE FROM {UserTasks._meta.db_table} WHERE id IN ({select}) RETURNING state) '
+                f'{COUNT_STATES} FROM deleted',
+                params,
+            )
+            removed, available = cursor.fetchone()
+            get_task_counters().add_on_commit({(task.pk, PENDING): -available})
+        return removed
+
+
+def _available(template):
+    return [task_id for task_id, state in template if state == 'AVAILABLE']
@@ -1,17 +1,44 @@
 from django.contrib.auth import get_user_model
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from .models import Tasks, UserTasks
+from .board import get_task_board
+from .graph import invalidate_task_graph
+from .models import Tasks
+from .services import TaskProvisioningService
+from .tasks import reevaluate_task_eligibility
 
 User = get_user_model()
 
 @receiver(post_save, sender=User)
 def create_user_tasks(sender, instance, created, **kwargs):
     if created:
-        visible_tasks = Tasks.objects.filter(is_hidden=False).order_by("display_order")
-        for task in visible_tasks:
-            UserTasks.objects.create(
-                user=instance,
-                task=task,
-                state="AVAILABLE" if task.prerequisite is None else "LOCKED",
-            )
+        TaskProvisioningService.provision_user(instance)
+
+@receiver([post_save, post_delete], sender=Tasks)
+def invalidate_visible_task_template(sender, **kwargs):
+    # Again once committed, like the prerequisite graph below
+    TaskProvisioningService.invalidate_visible_task_template()
+    transaction.on_commit(TaskProvisioningService.invalidate_visible_task_template)
+
+@receiver([post_save, post_delete], sender=Tasks)
+def invalidate_prerequisite_graph(sender, **kwargs):
+    # Again once committed, in case another worker rebuilt the graph from the
+    # database before this change was visible to it
+    invalidate_task_graph()
+    transaction.on_commit(invalidate_task_graph)
+
+@receiver(post_save, sender=Tasks)
+def update_task_board_catalogue(sender, instance, **kwargs):
+    transaction.on_commit(lambda: get_task_board().update_task(instance))
+
+@receiver(post_delete, sender=Tasks)
+def remove_from_task_board_catalogue(sender, instance, **kwargs):
+    task_id = instance.pk
+    transaction.on_commit(lambda: get_task_board().remove_task(task_id))
+
+@receiver(post_save, sender=Tasks)
+def reevaluate_changed_eligibility(sender, instance, created, **kwargs):
+    if not created and instance.eligibility_changed():
+        task_id = instance.pk
+        transaction.on_commit(lambda: reevaluate_task_eligibility.delay(task_id))
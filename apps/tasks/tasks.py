@@ -0,0 +1,32 @@
+from datetime import timedelta
+from celery import shared_task
+from .counters import get_task_counters
+from .models import Tasks
+from .outbox import CompletionOutboxWorker, purge_processed
+from .services import TaskBackfillService, TaskEligibilityService
+
+@shared_task
+def backfill_tasks(task_ids, chunk_size=10000):
+    return {
+        task.pk: TaskBackfillService.backfill_task(task, chunk_size=chunk_size)
+        for task in Tasks.objects.filter(pk__in=task_ids)
+    }
+
+@shared_task
+def flush_task_counters():
+    return get_task_counters().flush()
+
+@shared_task
+def drain_completion_outbox(max_batches=100):
+    return CompletionOutboxWorker().drain(max_batches=max_batches)
+
+@shared_task
+def purge_completion_outbox(days=7):
+    return purge_processed(older_than=timedelta(days=days))
+
+@shared_task
+def reevaluate_task_eligibility(task_id):
+    task = Tasks.objects.filter(pk=task_id).first()
+    if task is None:
+        return None
+    return TaskEligibilityService.reevaluate_task(task)
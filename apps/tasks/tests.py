@@ -1,13 +1,45 @@
-from django.test import TestCase
+import json
+from datetime import timedelta
+from unittest.mock import patch
+from django.db import DatabaseError
+from django.db.models import Q
+from django.test import SimpleTestCase, TestCase
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
-from apps.tasks.models import Tasks, UserTasks
+from django.utils import timezone
+from apps.tasks.eligibility import compile_rule, task_rule
+from apps.tasks.graph import TaskGraph, get_task_graph
+from apps.leaderboard.models import Leaderboard
+from apps.tasks.models import CompletionOutbox, TaskCounterFlush, Tasks, UserTasks
+from apps.tasks.outbox import CompletionOutboxWorker, outbox_metrics, purge_processed, retry_failed
+from apps.teams.registry import TeamRegistry
+from django.core.cache import cache
+from django_redis import get_redis_connection
+from apps.tasks import board as task_board
+from apps.tasks.board import TaskBoardCache
+from apps.tasks.counters import PENDING, TOTAL, TaskCounters
+from apps.tasks.services import (
+    VISIBLE_TASKS_CACHE_KEY, TaskBackfillService, TaskEligibilityService, TaskOrderingService,
+    TaskProvisioningService,
+)
+from apps.tasks.utils import assign_hidden_tasks
+from apps.users.models import UserProfile
 
 User = get_user_model()
 
 
-class TaskTestCase(TestCase):
+class TasksTestCase(TestCase):
+    # The visible task template is cached outside the test's transaction, so
+    # it is cleared around every test to keep rolled back tasks out of it
+
+    def setUp(self):
+        TaskProvisioningService.invalidate_visible_task_template()
+        self.addCleanup(TaskProvisioningService.invalidate_visible_task_template)
+
+
+class TaskTestCase(TasksTestCase):
     def setUp(self):
+        super().setUp()
         # Create some tasks
         self.task1 = Tasks.objects.create(
             title="Task 1", display_order=1, max_repetitions=1
@@ -72,14 +104,14 @@ class TaskTestCase(TestCase):
         self.assertEqual(user_tasks[2].state, "AVAILABLE")
         
     def test_single_repitition_task_completes(self):
-        user_task = UserTasks.objects.create(user=self.user, task=self.task1)
+        user_task = UserTasks.objects.get(user=self.user, task=self.task1)
         user_task.complete()
 
         self.assertEqual(user_task.state, "COMPLETED")
 
     def test_multi_repetition_task_stays_available(self):
-        user_task = UserTasks.objects.create(
-            user=self.user, task=self.task2, state="AVAILABLE"
+        user_task, _ = UserTasks.objects.update_or_create(
+            user=self.user, task=self.task2, defaults={"state": "AVAILABLE"}
         )
         user_task.complete()  # First repetition
         user_task.complete()  # Second repetition
@@ -100,18 +132,74 @@ class TaskTestCase(TestCase):
 
         self.assertEqual(dependent_user_task.state, "AVAILABLE")
 
+    def test_dependent_tasks_unlock_in_one_update_and_insert(self):
+        task4 = Tasks.objects.create(title="Task 4", prerequisite=self.task1)
+        prerequisite_user_task = UserTasks.objects.select_related("task").get(user=self.user, task=self.task1)
+        get_task_graph()
+
+        # SELECT FOR UPDATE of the row, SELECT of the dependents, UPDATE of
+        # task 2, INSERT of task 4, UPDATE of the completed task and INSERT
+        # into the outbox, in a savepoint
+        with self.assertNumQueries(8):
+            prerequisite_user_task.complete()
+
+        states = dict(UserTasks.objects.filter(user=self.user).values_list("task_id", "state"))
+        self.assertEqual(states[self.task2.id], "AVAILABLE")
+        self.assertEqual(states[task4.id], "AVAILABLE")
+
+    def test_completed_dependent_stays_completed(self):
+        UserTasks.objects.filter(user=self.user, task=self.task2).update(state="COMPLETED")
+
+        UserTasks.objects.get(user=self.user, task=self.task1).complete()
+
+        self.assertEqual(UserTasks.objects.get(user=self.user, task=self.task2).state, "COMPLETED")
+
+    def test_prerequisite_cycle_is_rejected(self):
+        self.task1.prerequisite = self.task2
+        with self.assertRaises(ValidationError):
+            self.task1.full_clean()
+
+        self.task1.prerequisite = self.task1
+        with self.assertRaises(ValidationError):
+            self.task1.full_clean()
+
     def test_repetitions_does_not_surpass_max(self):
         MAX_REPITITIONS = 1
-        user_task = UserTasks.objects.create(user=self.user, task=self.task1)
+        user_task = UserTasks.objects.get(user=self.user, task=self.task1)
         user_task.complete()
         user_task.complete()
         user_task.complete()
 
         self.assertEqual(user_task.repetitions, MAX_REPITITIONS)
 
+    def test_double_submit_counts_from_the_current_row(self):
+        user_task, _ = UserTasks.objects.update_or_create(
+            user=self.user, task=self.task2, defaults={"state": "AVAILABLE"}
+        )
+        stale = UserTasks.objects.get(pk=user_task.pk)
+
+        user_task.complete()
+        stale.complete()
+
+        self.assertEqual(stale.repetitions, 2)
+        self.assertEqual(
+            sorted(CompletionOutbox.objects.filter(user_task=user_task).values_list("repetition", flat=True)), [1, 2]
+        )
+
+    def test_double_submit_of_a_finished_task_is_ignored(self):
+        user_task = UserTasks.objects.get(user=self.user, task=self.task1)
+        stale = UserTasks.objects.get(pk=user_task.pk)
+
+        user_task.complete()
+        stale.complete()
+
+        self.assertEqual(stale.state, "COMPLETED")
+        self.assertEqual(stale.repetitions, 1)
+        self.assertEqual(CompletionOutbox.objects.filter(user_task=user_task).count(), 1)
+
     def test_completed_task_does_not_complete_again(self):
-        user_task = UserTasks.objects.create(
-            user=self.user, task=self.task1, state="COMPLETED"
+        user_task, _ = UserTasks.objects.update_or_create(
+            user=self.user, task=self.task1, defaults={"state": "COMPLETED"}
         )
         initial_task_state = user_task.state
         user_task.complete()
@@ -119,7 +207,74 @@ class TaskTestCase(TestCase):
         self.assertEqual(user_task.state, initial_task_state)
 
 
-class TaskModelTests(TestCase):
+class TaskGraphTests(SimpleTestCase):
+    def test_topological_order(self):
+        graph = TaskGraph({3: 2, 1: None, 2: 1, 4: 1, 5: None})
+        order = graph.order
+
+        self.assertEqual(sorted(order), [1, 2, 3, 4, 5])
+        for task_id, prerequisite_id in graph.prerequisites.items():
+            if prerequisite_id is not None:
+                self.assertLess(order.index(prerequisite_id), order.index(task_id))
+
+    def test_dependents(self):
+        graph = TaskGraph({1: None, 2: 1, 3: 1, 4: 2})
+        self.assertEqual(graph.dependents(1), [2, 3])
+        self.assertEqual(graph.dependents(4), [])
+
+    def test_cycle_is_detected(self):
+        with self.assertRaisesRegex(ValueError, r"\[2, 3\]"):
+            TaskGraph({1: None, 2: 3, 3: 2})
+
+    def test_would_cycle(self):
+        graph = TaskGraph({1: None, 2: 1, 3: 2})
+        self.assertTrue(graph.would_cycle(1, 3))
+        self.assertTrue(graph.would_cycle(2, 2))
+        self.assertFalse(graph.would_cycle(3, 1))
+
+
+class EligibilityRuleTests(SimpleTestCase):
+    def test_empty_rule_matches_everyone(self):
+        self.assertEqual(compile_rule({}), Q())
+        self.assertEqual(compile_rule(None), Q())
+
+    def test_field_rules(self):
+        self.assertEqual(compile_rule({"field": "is_expat"}), Q(profile__is_expat=True))
+        self.assertEqual(compile_rule({"field": "is_vip", "equals": False}), Q(profile__is_vip=False))
+        self.assertEqual(
+            compile_rule({"field": "country", "in": ["GB", "IE"]}), Q(profile__phyiscal_location__in=["GB", "IE"])
+        )
+
+    def test_combined_rules(self):
+        rule = {"any": [{"field": "is_expat"}, {"all": [{"field": "is_parent"}, {"not": {"field": "is_vip"}}]}]}
+        self.assertEqual(
+            compile_rule(rule),
+            Q(profile__is_expat=True) | (Q(profile__is_parent=True) & ~Q(profile__is_vip=True)),
+        )
+
+    def test_rules_matching_nobody(self):
+        self.assertIsNone(compile_rule({"any": []}))
+        self.assertIsNone(compile_rule({"all": [{"field": "is_expat"}, {"any": []}]}))
+        self.assertEqual(compile_rule({"not": {"any": []}}), Q())
+        self.assertIsNone(compile_rule({"not": {}}))
+        self.assertIsNone(compile_rule({"not": {"all": []}}))
+        self.assertIsNone(compile_rule({"any": [{"not": {"all": [{"not": {"any": []}}]}}]}))
+
+    def test_malformed_rules(self):
+        for rule in ({"field": "password"}, {"any": {"field": "is_expat"}}, {"field": "country", "in": "GB"}, ["is_expat"], {"maybe": []}):
+            with self.subTest(rule=rule), self.assertRaises(ValueError):
+                compile_rule(rule)
+
+    def test_task_rule_defaults(self):
+        self.assertEqual(task_rule(Tasks(is_hidden=False)), {})
+        self.assertEqual(task_rule(Tasks(is_hidden=True, target_demographic="PARENT")), {"field": "is_parent"})
+        self.assertEqual(
+            task_rule(Tasks(is_hidden=True, target_demographic="EXPAT", eligibility={"field": "is_vip"})),
+            {"field": "is_vip"},
+        )
+
+
+class TaskModelTests(TasksTestCase):
 
     def test_hidden_task_requires_target_demographic(self):
         # Create a Task with is_hidden=True but no target_demographic
@@ -159,8 +314,9 @@ class TaskModelTests(TestCase):
         except ValidationError:
             self.fail("full_clean() raised ValidationError unexpectedly!")
 
-class TaskModelDisplayOrder(TestCase):
+class TaskModelDisplayOrder(TasksTestCase):
     def setUp(self):
+        super().setUp()
         # Create initial tasks with distinct display_orders
         Tasks.objects.create(title='Task 1', display_order=1)
         Tasks.objects.create(title='Task 2', display_order=2)
@@ -186,4 +342,649 @@ class TaskModelDisplayOrder(TestCase):
         # Check the display orders to ensure they have been incremented properly
         self.assertEqual(task1.display_order, 1)  # Should remain unchanged
         self.assertEqual(task2.display_order, 3)  # Should be incremented
-        self.assertEqual(new_task.display_order, 2)  # Should take the place of task 2
\ No newline at end of file
+        self.assertEqual(new_task.display_order, 2)  # Should take the place of task 2
+
+    def test_blank_display_order_appends_with_gap(self):
+        task = Tasks.objects.create(title='Appended Task')
+        self.assertEqual(task.display_order, 2 + Tasks.ORDER_GAP)
+
+    def test_duplicate_display_order_only_moves_run_up_to_gap(self):
+        Tasks.objects.create(title='Task 5', display_order=5)
+        Tasks.objects.create(title='Duplicate Order Task', display_order=1)
+
+        orders = dict(Tasks.objects.values_list('title', 'display_order'))
+        self.assertEqual(orders, {'Duplicate Order Task': 1, 'Task 1': 2, 'Task 2': 3, 'Task 5': 5})
+
+    def test_compact_display_order_respaces_in_order(self):
+        Tasks.objects.create(title='Task 3', display_order=3)
+        Tasks.objects.create(title='Task 2b', display_order=2)
+
+        count = TaskOrderingService.compact_display_order(gap=10, batch_size=3)
+
+        self.assertEqual(count, 4)
+        self.assertEqual(
+            list(Tasks.objects.order_by('display_order').values_list('title', 'display_order')),
+            [('Task 1', 10), ('Task 2b', 20), ('Task 2', 30), ('Task 3', 40)],
+        )
+
+
+class TaskProvisioningTestCase(TasksTestCase):
+    def setUp(self):
+        super().setUp()
+        self.task1 = Tasks.objects.create(title="Task 1", display_order=1)
+        self.task2 = Tasks.objects.create(title="Task 2", prerequisite=self.task1, display_order=2)
+
+    def create_users(self, count):
+        # Provisioned by the post_save signal, cleared to test the service
+        users = [
+            User.objects.create_user(
+                email=f"import{i}@test.com", password="testpass123", first_name="import", last_name=str(i)
+            )
+            for i in range(count)
+        ]
+        UserTasks.objects.filter(user__in=users).delete()
+        return users
+
+    def test_template_is_cached(self):
+        TaskProvisioningService.get_visible_task_template()
+
+        with self.assertNumQueries(0):
+            template = TaskProvisioningService.get_visible_task_template()
+        self.assertEqual(template, [(self.task1.id, "AVAILABLE"), (self.task2.id, "LOCKED")])
+
+    def test_template_follows_task_changes(self):
+        TaskProvisioningService.get_visible_task_template()
+        task3 = Tasks.objects.create(title="Task 3", display_order=3)
+
+        self.assertIn((task3.id, "AVAILABLE"), TaskProvisioningService.get_visible_task_template())
+
+    def test_template_is_cleared_again_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Tasks.objects.create(title="Task 3", display_order=3)
+            # Another worker caching the template before the commit
+            cache.set(VISIBLE_TASKS_CACHE_KEY, [(self.task1.id, "AVAILABLE")], timeout=None)
+
+        self.assertIsNone(cache.get(VISIBLE_TASKS_CACHE_KEY))
+
+    def test_provision_user_is_one_insert(self):
+        [user] = self.create_users(1)
+        TaskProvisioningService.get_visible_task_template()
+
+        with self.assertNumQueries(1):
+            TaskProvisioningService.provision_user(user)
+        self.assertEqual(UserTasks.objects.filter(user=user).count(), 2)
+
+    def test_provision_users_in_batches(self):
+        users = self.create_users(3)
+        TaskProvisioningService.get_visible_task_template()
+
+        with self.assertNumQueries(2):
+            created = TaskProvisioningService.provision_users(users, batch_size=4)
+
+        self.assertEqual(created, 6)
+        self.assertEqual(UserTasks.objects.filter(user__in=users, state="LOCKED").count(), 3)
+
+
+class HiddenTaskAssignmentTestCase(TasksTestCase):
+    def setUp(self):
+        super().setUp()
+        self.expat_task = Tasks.objects.create(
+            title="Expat Task", display_order=1, is_hidden=True, target_demographic="EXPAT"
+        )
+        self.sports_task = Tasks.objects.create(
+            title="Sports Task", display_order=2, is_hidden=True, target_demographic="SPORTS"
+        )
+        self.user = User.objects.create_user(
+            email="hidden@test.com", password="testpass123", first_name="hidden", last_name="user"
+        )
+        self.profile = self.user.profile
+
+    def hidden_task_ids(self):
+        return set(UserTasks.objects.filter(user=self.user).values_list("task_id", flat=True))
+
+    def test_assigns_all_matching_tasks_in_three_queries(self):
+        UserProfile.objects.filter(user=self.user).update(is_expat=True, is_sports_traveler=True)
+
+        # Hidden tasks, the rule check for all of them and the INSERT
+        with self.assertNumQueries(3):
+            assign_hidden_tasks(self.profile)
+        self.assertEqual(self.hidden_task_ids(), {self.expat_task.id, self.sports_task.id})
+
+    def test_assigning_again_keeps_existing_tasks(self):
+        self.profile.is_expat = True
+        self.profile.save()
+        UserTasks.objects.filter(user=self.user, task=self.expat_task).update(state="COMPLETED", repetitions=1)
+
+        assign_hidden_tasks(self.profile)
+
+        user_task = UserTasks.objects.get(user=self.user, task=self.expat_task)
+        self.assertEqual((user_task.state, user_task.repetitions), ("COMPLETED", 1))
+
+    def test_no_matching_rules_assigns_nothing(self):
+        self.assertEqual(assign_hidden_tasks(self.profile), [])
+        self.assertEqual(self.hidden_task_ids(), set())
+
+    def test_parent_and_student_demographics(self):
+        parent_task = Tasks.objects.create(title="Parent Task", is_hidden=True, target_demographic="PARENT")
+        student_task = Tasks.objects.create(title="Student Task", is_hidden=True, target_demographic="STUDENT")
+
+        self.profile.is_parent = True
+        self.profile.is_student = True
+        self.profile.save()
+
+        self.assertEqual(self.hidden_task_ids(), {parent_task.id, student_task.id})
+
+    def test_task_rule_overrides_demographic(self):
+        rule_task = Tasks.objects.create(
+            title="Rule Task", is_hidden=True,
+            eligibility={"all": [{"field": "is_expat"}, {"field": "is_vip", "equals": False}]},
+        )
+
+        self.profile.is_expat = True
+        self.profile.save()
+
+        self.assertEqual(self.hidden_task_ids(), {self.expat_task.id, rule_task.id})
+
+    def test_profile_save_without_demographic_change_skips_assignment(self):
+        self.profile.pronouns = "they"
+
+        # Only the profile UPDATE
+        with self.assertNumQueries(1):
+            self.profile.save()
+
+    def test_profile_save_with_demographic_change_assigns(self):
+        self.profile.is_sports_traveler = True
+        self.profile.save()
+
+        self.assertEqual(self.hidden_task_ids(), {self.sports_task.id})
+        self.assertFalse(self.profile.demographics_changed())
+
+    def test_profile_save_with_other_update_fields_skips_assignment(self):
+        self.profile.is_expat = True
+
+        with self.assertNumQueries(1):
+            self.profile.save(update_fields=["pronouns"])
+        self.assertEqual(self.hidden_task_ids(), set())
+
+    def test_loaded_profile_tracks_demographics(self):
+        profile = UserProfile.objects.get(user=self.user)
+        self.assertFalse(profile.demographics_changed())
+
+        profile.is_expat = True
+        self.assertTrue(profile.demographics_changed())
+
+
+class TaskBackfillTestCase(TasksTestCase):
+    def setUp(self):
+        super().setUp()
+        self.task1 = Tasks.objects.create(title="Task 1")
+        self.users = [
+            User.objects.create_user(
+                email=f"existing{i}@test.com", password="testpass123", first_name="existing", last_name=str(i)
+            )
+            for i in range(3)
+        ]
+
+    def states(self, task):
+        return dict(UserTasks.objects.filter(task=task).values_list("user_id", "state"))
+
+    def test_backfills_every_user_in_chunks(self):
+        task2 = Tasks.objects.create(title="Task 2")
+        reports = []
+
+        created = TaskBackfillService.backfill_task(task2, chunk_size=2, progress=lambda *report: reports.append(report))
+
+        self.assertEqual(created, 3)
+        self.assertEqual(self.states(task2), {user.id: "AVAILABLE" for user in self.users})
+        self.assertEqual(reports[-1], (self.users[-1].id, self.users[-1].id, 3))
+
+    def test_state_follows_prerequisite(self):
+        UserTasks.objects.filter(user=self.users[0], task=self.task1).update(repetitions=1)
+        task2 = Tasks.objects.create(title="Task 2", prerequisite=self.task1)
+
+        TaskBackfillService.backfill_task(task2)
+
+        states = self.states(task2)
+        self.assertEqual(states[self.users[0].id], "AVAILABLE")
+        self.assertEqual(states[self.users[1].id], "LOCKED")
+
+    def test_existing_rows_are_kept(self):
+        UserTasks.objects.filter(user=self.users[0], task=self.task1).update(state="COMPLETED")
+
+        self.assertEqual(TaskBackfillService.backfill_task(self.task1), 0)
+        self.assertEqual(self.states(self.task1)[self.users[0].id], "COMPLETED")
+
+    def test_hidden_task_goes_to_eligible_users(self):
+        profile = self.users[1].profile
+        profile.is_expat = True
+        profile.save()
+        UserTasks.objects.filter(user=self.users[1]).delete()
+        task2 = Tasks.objects.create(title="Task 2", is_hidden=True, target_demographic="EXPAT")
+
+        TaskBackfillService.backfill_task(task2)
+
+        self.assertEqual(self.states(task2), {self.users[1].id: "AVAILABLE"})
+
+    def test_resumes_after_last_user_done(self):
+        task2 = Tasks.objects.create(title="Task 2")
+        cache.set(TaskBackfillService.progress_key(task2), self.users[0].id)
+
+        created = TaskBackfillService.backfill_task(task2)
+
+        self.assertEqual(created, 2)
+        self.assertNotIn(self.users[0].id, self.states(task2))
+        self.assertIsNone(cache.get(TaskBackfillService.progress_key(task2)))
+
+
+class TaskCountersTestCase(TasksTestCase):
+    PREFIX = "test:tasks:counters"
+
+    def setUp(self):
+        super().setUp()
+        self.conn = get_redis_connection("default")
+        self.counters = TaskCounters(self.conn, prefix=self.PREFIX, shards=4)
+        self.task1 = Tasks.objects.create(title="Task 1", total_global_completions=10, pending_global_completions=5)
+        self.task2 = Tasks.objects.create(title="Task 2")
+
+    def tearDown(self):
+        self.conn.delete(
+            f"{self.PREFIX}:flush", self.counters.flush_id_key(),
+            *(key for shard in range(4) for key in (self.counters.shard_key(shard), self.counters.processing_key(shard))),
+        )
+
+    def test_deltas_are_summed_over_shards(self):
+        self.counters.add({(self.task1.id, TOTAL): 2}, shard=1)
+        self.counters.add({(self.task1.id, TOTAL): 3, (self.task2.id, PENDING): 1}, shard=2)
+
+        self.assertEqual(self.counters.unflushed(), {self.task1.id: {TOTAL: 5}, self.task2.id: {PENDING: 1}})
+
+    def test_counts_combine_saved_and_unflushed(self):
+        self.counters.add({(self.task1.id, TOTAL): 2, (self.task1.id, PENDING): -2}, shard=3)
+
+        self.assertEqual(self.counters.counts([self.task1, self.task2]), {self.task1.id: (12, 3), self.task2.id: (0, 0)})
+
+    def test_flush_is_one_update(self):
+        self.counters.add({(self.task1.id, TOTAL): 2, (self.task1.id, PENDING): -7}, shard=0)
+        self.counters.add({(self.task2.id, PENDING): 4}, shard=1)
+
+        # The UPDATE and the flush record, in a savepoint
+        with self.assertNumQueries(5), self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.counters.flush(), 2)
+
+        self.task1.refresh_from_db()
+        self.task2.refresh_from_db()
+        self.assertEqual((self.task1.total_global_completions, self.task1.pending_global_completions), (12, 0))
+        self.assertEqual((self.task2.total_global_completions, self.task2.pending_global_completions), (0, 4))
+        self.assertEqual(self.counters.unflushed(), {})
+
+    def test_failed_update_keeps_deltas(self):
+        self.counters.add({(self.task1.id, TOTAL): 2}, shard=0)
+
+        with patch.object(Tasks.objects, "filter", side_effect=DatabaseError), self.assertRaises(DatabaseError):
+            self.counters.flush()
+        self.counters.add({(self.task1.id, TOTAL): 1}, shard=0)
+        self.assertEqual(self.counters.unflushed(), {self.task1.id: {TOTAL: 3}})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.counters.flush(), 1)
+        self.task1.refresh_from_db()
+        self.assertEqual(self.task1.total_global_completions, 13)
+        self.assertEqual(self.counters.unflushed(), {})
+
+    def test_deltas_left_by_a_dead_flush_are_folded_in(self):
+        self.conn.hset(self.counters.processing_key(2), f"{self.task2.id}:{TOTAL}", 4)
+        self.counters.add({(self.task2.id, TOTAL): 1}, shard=2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.counters.flush(), 1)
+        self.task2.refresh_from_db()
+        self.assertEqual(self.task2.total_global_completions, 5)
+        self.assertFalse(self.conn.exists(self.counters.processing_key(2)))
+
+    def test_deltas_left_by_a_committed_flush_are_dropped(self):
+        self.counters.add({(self.task1.id, TOTAL): 2}, shard=0)
+        # Commits, then dies before the claimed deltas and lock are cleared
+        with self.captureOnCommitCallbacks(execute=False):
+            self.assertEqual(self.counters.flush(), 1)
+        self.conn.delete(f"{self.PREFIX}:flush")
+        self.counters.add({(self.task1.id, TOTAL): 1}, shard=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.counters.flush(), 1)
+        self.task1.refresh_from_db()
+        self.assertEqual(self.task1.total_global_completions, 13)
+        self.assertEqual(self.counters.unflushed(), {})
+        self.assertEqual(TaskCounterFlush.objects.count(), 1)
+
+    def test_one_flush_at_a_time(self):
+        self.counters.add({(self.task1.id, TOTAL): 2}, shard=0)
+        lock = self.counters.flush_lock()
+        lock.acquire()
+
+        self.assertEqual(self.counters.flush(), 0)
+        lock.release()
+        self.assertEqual(self.counters.flush(), 1)
+
+    def test_completion_is_counted_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.counters.record_completion(self.task1.id, was_available=True, shard=7)
+        self.assertEqual(self.counters.unflushed(), {})
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.counters.unflushed(), {self.task1.id: {TOTAL: 1, PENDING: -1}})
+
+
+class CompletionOutboxTestCase(TasksTestCase):
+    BOARD = "test:tasks:outbox"
+
+    def setUp(self):
+        super().setUp()
+        self.conn = get_redis_connection("default")
+        self.leaderboard = Leaderboard(self.conn, name=self.BOARD)
+        self.registry = TeamRegistry(self.conn, prefix="test:tasks:teams", buckets=4)
+        self.worker = CompletionOutboxWorker(self.leaderboard, self.registry, batch_size=2)
+        self.addCleanup(self.registry.clear)
+        self.addCleanup(
+            self.conn.delete, self.BOARD, f"{self.BOARD}:sequence", f"{self.BOARD}:events", self.worker.awarded_key
+        )
+
+        self.task = Tasks.objects.create(title="Task 1", queue_jumps=2, max_repetitions=3)
+        self.users = [
+            User.objects.create_user(
+                email=f"outbox{i}@test.com", password="testpass123", first_name="outbox", last_name=str(i)
+            )
+            for i in range(3)
+        ]
+        self.leaderboard.bulk_add_players({f"player_{i}": None for i in range(4)})
+        self.leaderboard.bulk_add_players({str(user.id): None for user in self.users[:2]})
+
+    def complete(self, user):
+        user_task = UserTasks.objects.select_related("task").get(user=user, task=self.task)
+        user_task.complete()
+        return user_task
+
+    def test_completion_is_recorded_in_outbox(self):
+        user_task = self.complete(self.users[0])
+        self.complete(self.users[0])
+
+        self.assertEqual(
+            list(CompletionOutbox.objects.filter(user_task=user_task).values_list("repetition", "queue_jumps")),
+            [(1, 2), (2, 2)],
+        )
+
+    def test_drain_awards_jumps_in_batches(self):
+        for user in self.users[:2]:
+            self.complete(user)
+        self.complete(self.users[0])
+        rank = self.leaderboard.get_player_rank(str(self.users[0].id))
+
+        self.assertEqual(self.worker.drain(), 3)
+
+        self.assertEqual(self.leaderboard.get_player_rank(str(self.users[0].id)), rank - 4)
+        self.assertFalse(CompletionOutbox.objects.filter(processed_at__isnull=True).exists())
+
+    def test_retried_batch_is_not_awarded_twice(self):
+        self.complete(self.users[1])
+        self.worker.drain()
+        rank = self.leaderboard.get_player_rank(str(self.users[1].id))
+
+        CompletionOutbox.objects.update(processed_at=None)
+        self.worker.drain()
+
+        self.assertEqual(self.leaderboard.get_player_rank(str(self.users[1].id)), rank)
+
+    def test_missing_user_is_added_then_jumped(self):
+        self.complete(self.users[2])
+        self.worker.drain()
+
+        # Added at the bottom, rank 6, then jumped 2 spaces
+        self.assertEqual(self.leaderboard.get_player_rank(str(self.users[2].id)), 4)
+
+    def test_team_is_jumped_for_its_member(self):
+        self.registry.add("team_1", ["player_0", str(self.users[0].id)])
+        self.leaderboard.add_player("team_1")
+        self.complete(self.users[0])
+        self.worker.drain()
+
+        self.assertEqual(self.leaderboard.get_player_rank("team_1"), 4)
+
+    def test_missing_team_is_parked_and_the_rest_awarded(self):
+        self.registry.add("team_1", ["player_0", str(self.users[0].id)])
+        self.complete(self.users[0])
+        self.complete(self.users[1])
+        rank = self.leaderboard.get_player_rank(str(self.users[1].id))
+
+        self.assertEqual(self.worker.drain(), 2)
+
+        self.assertEqual(self.leaderboard.get_player_rank(str(self.users[1].id)), rank - 2)
+        parked = CompletionOutbox.objects.get(failed_at__isnull=False)
+        self.assertEqual(parked.user_task.user, self.users[0])
+        self.assertIsNone(parked.processed_at)
+        self.assertIn("team_1", parked.error)
+        self.assertEqual(outbox_metrics()["failed"], 1)
+
+        self.leaderboard.add_player("team_1")
+        self.assertEqual(retry_failed(), 1)
+        self.assertEqual(self.worker.drain(), 1)
+        self.assertEqual(self.leaderboard.get_player_rank("team_1"), 4)
+        self.assertFalse(CompletionOutbox.objects.filter(processed_at__isnull=True).exists())
+
+    def test_purge_processed(self):
+        self.complete(self.users[0])
+        self.complete(self.users[1])
+        self.worker.drain()
+        CompletionOutbox.objects.filter(user_task__user=self.users[0]).update(
+            processed_at=timezone.now() - timedelta(days=8)
+        )
+        self.complete(self.users[1])
+
+        self.assertEqual(purge_processed(older_than=timedelta(days=7)), 1)
+        self.assertEqual(CompletionOutbox.objects.count(), 2)
+
+    def test_metrics(self):
+        self.complete(self.users[0])
+        self.assertEqual(outbox_metrics()["backlog"], 1)
+
+        self.worker.drain()
+        metrics = outbox_metrics()
+        self.assertEqual((metrics["backlog"], metrics["lag_seconds"]), (0, 0.0))
+        self.assertGreater(metrics["throughput"], 0)
+
+
+class TaskBoardTestCase(TasksTestCase):
+    PREFIX = "test:tasks:board"
+
+    def setUp(self):
+        super().setUp()
+        self.conn = get_redis_connection("default")
+        self.board = TaskBoardCache(self.conn, prefix=self.PREFIX)
+        patcher = patch.object(task_board, "_board", self.board)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.task1 = Tasks.objects.create(title="Task 1", queue_jumps=5, max_repetitions=2)
+        self.task2 = Tasks.objects.create(title="Task 2", prerequisite=self.task1, queue_jumps=7)
+        self.user = User.objects.create_user(
+            email="board@test.com", password="testpass123", first_name="board", last_name="user"
+        )
+        self.addCleanup(
+            self.conn.delete, self.board.board_key(self.user.id), self.board.claim_key(self.user.id),
+            self.board.catalogue_key, self.board.generation_key,
+        )
+        # Task saves fill the catalogue on commit, which TestCase never reaches
+        self.board.refresh_catalogue()
+
+    def test_board_is_built_with_one_query(self):
+        with self.assertNumQueries(1):
+            board = self.board.get(self.user.id)
+
+        self.assertEqual(board, [
+            {"task_id": self.task1.id, "title": "Task 1", "state": "AVAILABLE", "repetitions_remaining": 2, "queue_jumps": 5},
+            {"task_id": self.task2.id, "title": "Task 2", "state": "LOCKED", "repetitions_remaining": 1, "queue_jumps": 7},
+        ])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.board.get(self.user.id), board)
+
+    def test_completion_updates_board(self):
+        self.board.get(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            UserTasks.objects.get(user=self.user, task=self.task1).complete()
+
+        with self.assertNumQueries(0):
+            board = self.board.get(self.user.id)
+        self.assertEqual([(entry["state"], entry["repetitions_remaining"]) for entry in board], [
+            ("AVAILABLE", 1), ("AVAILABLE", 1),
+        ])
+
+    def test_task_edit_updates_catalogue(self):
+        self.board.get(self.user.id)
+
+        self.task2.title = "Renamed"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task2.save()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.board.get(self.user.id)[1]["title"], "Renamed")
+
+    def test_shifted_orders_are_refreshed(self):
+        self.board.get(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Tasks.objects.create(title="Task 0", display_order=self.task1.display_order)
+
+        self.task1.refresh_from_db()
+        catalogue_row = json.loads(self.conn.hget(self.board.catalogue_key, self.task1.id))
+        self.assertEqual(catalogue_row[0], self.task1.display_order)
+
+    def test_stale_boards_are_rebuilt(self):
+        self.board.get(self.user.id)
+        self.board.invalidate_all()
+
+        with self.assertNumQueries(1):
+            self.board.get(self.user.id)
+
+    def load_then(self, change):
+        # Runs change between the rebuild's read of Postgres and its write
+        load = self.board._load
+
+        def load_and_change(user_id):
+            loaded = load(user_id)
+            change()
+            return loaded
+
+        return patch.object(self.board, "_load", side_effect=load_and_change)
+
+    def test_update_during_rebuild_is_not_overwritten(self):
+        self.board.get(self.user.id)
+        self.board.invalidate(self.user.id)
+
+        with self.load_then(lambda: self.board.update_rows(self.user.id, {self.task1.id: ("COMPLETED", 2)})):
+            self.assertEqual(self.board.get(self.user.id)[0]["state"], "AVAILABLE")
+
+        self.assertFalse(self.conn.exists(self.board.board_key(self.user.id)))
+
+    def test_generation_bump_during_rebuild_is_not_overwritten(self):
+        with self.load_then(self.board.invalidate_all):
+            self.board.get(self.user.id)
+
+        with self.assertNumQueries(1):
+            self.board.get(self.user.id)
+        with self.assertNumQueries(0):
+            self.board.get(self.user.id)
+
+    def test_missing_catalogue_is_refreshed(self):
+        self.conn.delete(self.board.catalogue_key)
+
+        with self.assertNumQueries(2):
+            self.board.get(self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.board.get(self.user.id)), 2)
+
+    def test_task_edit_during_rebuild_is_kept(self):
+        def rename():
+            self.task2.title = "Renamed"
+            with self.captureOnCommitCallbacks(execute=True):
+                self.task2.save()
+
+        with self.load_then(rename):
+            self.board.get(self.user.id)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.board.get(self.user.id)[1]["title"], "Renamed")
+
+    def test_task_delete_during_rebuild_is_not_restored(self):
+        task_id = self.task2.id
+
+        def delete():
+            with self.captureOnCommitCallbacks(execute=True):
+                self.task2.delete()
+
+        with self.load_then(delete):
+            self.board.get(self.user.id)
+
+        self.assertFalse(self.conn.hexists(self.board.catalogue_key, task_id))
+        self.assertEqual([entry["task_id"] for entry in self.board.get(self.user.id)], [self.task1.id])
+
+    def test_deleted_task_is_dropped(self):
+        self.board.get(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task2.delete()
+
+        self.assertEqual([entry["task_id"] for entry in self.board.get(self.user.id)], [self.task1.id])
+
+
+class TaskEligibilityTestCase(TasksTestCase):
+    def setUp(self):
+        super().setUp()
+        self.task = Tasks.objects.create(title="Expat Task", is_hidden=True, target_demographic="EXPAT")
+        self.users = [
+            User.objects.create_user(
+                email=f"rules{i}@test.com", password="testpass123", first_name="rules", last_name=str(i)
+            )
+            for i in range(3)
+        ]
+        for user in self.users[:2]:
+            user.profile.is_expat = True
+            user.profile.save()
+        UserTasks.objects.filter(user=self.users[0], task=self.task).update(repetitions=1)
+        UserProfile.objects.filter(user=self.users[2]).update(is_vip=True)
+
+    def states(self):
+        return dict(UserTasks.objects.filter(task=self.task).values_list("user_id", "state"))
+
+    def test_rule_is_validated(self):
+        for task in (
+            Tasks(title="Bad Rule", is_hidden=True, eligibility={"field": "password"}),
+            Tasks(title="Visible Rule", eligibility={"field": "is_vip"}),
+        ):
+            with self.subTest(task=task.title), self.assertRaises(ValidationError):
+                task.full_clean()
+
+        Tasks(title="Rule Only", display_order=99, is_hidden=True, eligibility={"field": "is_vip"}).full_clean()
+
+    def test_eligibility_change_is_tracked(self):
+        task = Tasks.objects.get(pk=self.task.pk)
+        task.title = "Renamed"
+        self.assertFalse(task.eligibility_changed())
+
+        task.eligibility = {"field": "is_vip"}
+        self.assertTrue(task.eligibility_changed())
+        task.save()
+        self.assertFalse(task.eligibility_changed())
+
+    def test_reevaluate_assigns_and_removes_in_bulk(self):
+        self.task.eligibility = {"field": "is_vip"}
+        self.task.save()
+
+        counts = TaskEligibilityService.reevaluate_task(self.task, chunk_size=2)
+
+        # users[0] started the task and keeps it, users[1] loses it and
+        # users[2] matches the new rule
+        self.assertEqual(counts, {"assigned": 1, "removed": 1})
+        self.assertEqual(set(self.states()), {self.users[0].id, self.users[2].id})
+
+    def test_reevaluate_unchanged_rule_does_nothing(self):
+        self.assertEqual(TaskEligibilityService.reevaluate_task(self.task), {"assigned": 0, "removed": 0})
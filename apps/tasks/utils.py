@@ -1,32 +1,37 @@
+from django.contrib.auth import get_user_model
+from django.db.models import BooleanField, Exists, ExpressionWrapper, OuterRef, Q
+from .board import get_task_board
+from .counters import get_task_counters
+from .eligibility import compile_rule, task_rule
 from .models import Tasks, UserTasks
 
+User = get_user_model()
+
+
 def assign_hidden_tasks(user_profile):
-    # Map user profile attributes to task demographic keys
-    demographic_mapping = {
-        'is_expat': 'EXPAT',
-        'is_student': 'STUDENT',
-        'is_sports_traveler': 'SPORTS',
-        'is_festival_traveler': 'FESTIVAL',
-    }
-    
-    # Pre-fetch all tasks to minimize database hits. Use select_related or prefetch_related if needed.
-    hidden_tasks = Tasks.objects.filter(is_hidden=True)
-    # List to keep track of tasks that should be assigned
-    tasks_to_assign = []
-    
-    # Iterate over the demographic mapping
-    for profile_attr, task_demographic in demographic_mapping.items():
-        if getattr(user_profile, profile_attr, False):
-            # Retrieve tasks for the demographic
-            demographic_tasks = hidden_tasks.filter(target_demographic=task_demographic)
-            for task in demographic_tasks:
-                tasks_to_assign.append(task)
-                
+    # Gives the user every hidden task whose eligibility rule they match and
+    # that they do not have yet. One query loads the hidden tasks, one checks
+    # every rule against the user and one INSERT adds the tasks. The unique
+    # (user, task) constraint covers a concurrent assignment. Returns the rows
+    # sent to the database.
+    user_id = user_profile.user_id
+    checks = {}
+    for task in Tasks.objects.filter(is_hidden=True).only('id', 'is_hidden', 'target_demographic', 'eligibility'):
+        eligible = compile_rule(task_rule(task))
+        if eligible is not None:
+            has_task = UserTasks.objects.filter(user_id=OuterRef('pk'), task_id=task.id)
+            checks[f'task_{task.id}'] = ExpressionWrapper(eligible & ~Q(Exists(has_task)), output_field=BooleanField())
+    if not checks:
+        return []
+
+    matches = User.objects.filter(pk=user_id).annotate(**checks).values(*checks).first() or {}
+    task_ids = [int(name[len('task_'):]) for name, matched in matches.items() if matched]
+    if not task_ids:
+        return []
 
-    # Eliminate potential duplicates by converting the list to a set
-    unique_tasks_to_assign = set(tasks_to_assign)
-    
-    # Create user tasks if they don't exist
-    for task in unique_tasks_to_assign:
-        UserTasks.objects.get_or_create(user=user_profile.user, task=task, state='AVAILABLE')
-        
\ No newline at end of file
+    get_task_counters().record_available(task_ids, shard=user_id)
+    get_task_board().update_rows_on_commit(user_id, {task_id: ('AVAILABLE', 0) for task_id in task_ids})
+    return UserTasks.objects.bulk_create(
+        [UserTasks(user_id=user_id, task_id=task_id, state='AVAILABLE') for task_id in task_ids],
+        ignore_conflicts=True,
+    )
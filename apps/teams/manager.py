@@ -1,11 +1,14 @@
-from django_redis import get_redis_connection
+from apps.leaderboard.models import Player
 from .models import Team
 
 class TeamsManager:
 
-    def __init__(self, leaderboard):
-        self.teams = set()
+    def __init__(self, leaderboard, registry=None):
+        # Teams loaded in this process by team id. The board's team registry
+        # is the source of truth shared by every worker.
+        self.teams = {}
         self.leaderboard = leaderboard
+        self.registry = registry if registry else leaderboard.team_registry()
         self.MAX_TEAM_SIZE = 2
 
     def validate_team_members(self, users):
@@ -15,31 +18,56 @@ class TeamsManager:
         self._inititalize_team_values(users) 
 
     def _inititalize_team_values(self, users):
-        ranks_and_scores = [self._get_rank_and_score(user.user_id) for user in users]
-        initial_rank, initial_score = max(ranks_and_scores, key=lambda x: x[1])
-
         team_id = self._create_team_id(users)
-        
+        # Reads the members' scores, puts the team on the board in the best
+        # member's place and takes the members off in one atomic call
+        initial_rank, initial_score = self.registry.form_team(
+            self.leaderboard, team_id, [user.user_id for user in users]
+        )
+
         new_team = Team(team_id)
         new_team.start_team(users, initial_rank, initial_score)
+        self.teams[team_id] = new_team
 
-        self._create_new_team(new_team) 
-    
-    def _create_new_team(self, team):
-        self.teams.add(team)
-
-        self._add_team_to_lb(team)
-
-        self._remove_team_members_from_lb(team)
-       
     def disband_team(self, initiator):
         team = initiator.team
-        self._reinstate_team_members_to_lb(team)
-        self._remove_team_from_lb(team)
+        members = list(team.members)
+        results = self.registry.disband_teams(
+            self.leaderboard, [(team.team_id, [(member.user_id, member.rank) for member in members])]
+        )
+        placed = results[team.team_id]
+        if placed is None:
+            raise Exception(f'{team.team_id} is not a registered team')
+
+        self._release_members(team, zip(members, placed))
+
+    def disband_all_teams(self, batch_size=1000):
+        # Season reset: every registered team is disbanded, its members taking
+        # the team's place on the board. Returns the number of teams disbanded.
+        disbanded = 0
+        for batch in self.registry.scan_batches(batch_size):
+            results = self.registry.disband_teams(
+                self.leaderboard,
+                [(team_id, [(member_id, None) for member_id in member_ids]) for team_id, member_ids in batch],
+                cause='reset', batch_size=batch_size,
+            )
+            for team_id, placed in results.items():
+                if placed is None:
+                    continue
+                disbanded += 1
+                # Members are kept in the same order here and in the registry
+                team = self.teams.get(team_id)
+                if team is not None:
+                    self._release_members(team, zip(team.members, placed))
+        return disbanded
+
+    def _release_members(self, team, placed):
+        for member, (rank, score) in placed:
+            member.leave_team(score)
+            member.rank = {'rank': rank, 'spaces': 0}
         team.end_team()
-        self.teams.remove(team)
-        
-        
+        self.teams.pop(team.team_id, None)
+
     def _create_team_id(self, users):
         return f"{users[0].user_id}_{users[1].user_id}"
 
@@ -51,29 +79,22 @@ class TeamsManager:
         if len(users) != self.MAX_TEAM_SIZE:
             raise Exception('Teams must consist of two users')
     
-    @classmethod
-    def load_teams(cls):
-        pass
+    def suggest_partners(self, user_id, limit=10, band=5):
+        # Solo players near user_id on the board, see PartnerSuggester
+        return self.registry.suggest_partners(self.leaderboard, user_id, limit, band)
 
-    def _get_rank_and_score(self, user_id):
-        return self.leaderboard.get_player_rank(user_id, withscores=True)
-    
-    def _remove_team_members_from_lb(self, team):
-        for member in team.members:
-            self.leaderboard.remove_player(member.user_id)
-    
-    def _add_team_to_lb(self, team):
-        self.leaderboard.add_player(team.team_id, team.score)
+    def get_team_id(self, user_id):
+        return self.registry.team_of(user_id)
 
-    def _remove_team_from_lb(self, team):
-        self.leaderboard.remove_player(team.team_id)
-
-    def _reinstate_team_members_to_lb(self, team):
-        for member in team.members:
-            target_score = self.leaderboard.get_score_at_rank(member.rank)
-            if not target_score:
-                target_score = team.score / 2
-            member.leave_team(target_score)
-            self.leaderboard.add_player(member.user_id, target_score)
-    
-    
\ No newline at end of file
+    def load_teams(self, batch_size=10000):
+        # Rebuilds self.teams from the registry, taking each team's rank and
+        # score from the leaderboard. Returns the number of teams loaded.
+        self.teams = {}
+        for batch in self.registry.scan_batches(batch_size):
+            ranks = self.leaderboard.bulk_get_ranks([team_id for team_id, _ in batch], withscores=True)
+            for (team_id, member_ids), rank_and_score in zip(batch, ranks):
+                rank, score = rank_and_score or (0, 0.0)
+                team = Team(team_id)
+                team.start_team([Player(member_id) for member_id in member_ids], rank, score)
+                self.teams[team_id] = team
+        return len(self.teams)
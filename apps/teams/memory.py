@@ -0,0 +1,91 @@
+from itertools import islice
+from apps.leaderboard.scores import SEQUENCE_SPAN
+
+# Pure Python stand-in for TeamRegistry, paired with an InMemoryLeaderboard so
+# TeamsManager runs without Redis. Forming and disbanding follow the FORM_TEAM
+# and DISBAND_TEAMS scripts in apps.teams.scripts, and errors the scripts
+# return as error replies are raised as ValueError.
+
+
+class InMemoryTeamRegistry:
+
+    def __init__(self, leaderboard):
+        self.leaderboard = leaderboard
+        self._members = {}
+        self._member_team = {}
+
+    def add(self, team_id, member_ids):
+        self._members[str(team_id)] = [str(member_id) for member_id in member_ids]
+        for member_id in member_ids:
+            self._member_team[str(member_id)] = str(team_id)
+
+    def add_many(self, teams, batch_size=10000):
+        for team_id, member_ids in teams.items():
+            self.add(team_id, member_ids)
+
+    def form_team(self, leaderboard, team_id, member_ids, cause='team'):
+        if any(str(member_id) in self._member_team for member_id in member_ids):
+            raise ValueError('One or more users are already in a team')
+
+        rank, score = leaderboard.form_team(team_id, member_ids, cause)
+        self.add(team_id, member_ids)
+        return rank, score
+
+    def disband_teams(self, leaderboard, teams, cause='disband', batch_size=1000):
+        results = {}
+        for team_id, members in teams:
+            if str(team_id) not in self._members:
+                results[team_id] = None
+                continue
+
+            results[team_id] = leaderboard.disband_team(team_id, members, cause)
+            self.remove(team_id, [member_id for member_id, _ in members])
+        return results
+
+    def suggest_partners(self, leaderboard, player_id, limit=10, band=5):
+        # Same result as PartnerSuggester when every candidate fits in its
+        # windows: solo players within band points, closest score first
+        score = leaderboard.get_player_score(player_id)
+        if score is None:
+            return []
+
+        # Scores above then below, nearest first, so ties sort the same way
+        above = leaderboard.players_between(score, score + band * SEQUENCE_SPAN)
+        below = leaderboard.players_between(score - band * SEQUENCE_SPAN, score)[::-1]
+        suggestions = [
+            (member, member_score) for member, member_score in above + below
+            if member_score != score and member not in self._members and member not in self._member_team
+        ]
+        suggestions.sort(key=lambda suggestion: abs(suggestion[1] - score))
+        return suggestions[:limit]
+
+    def remove(self, team_id, member_ids):
+        self._members.pop(str(team_id), None)
+        for member_id in member_ids:
+            self._member_team.pop(str(member_id), None)
+
+    def members_of(self, team_id):
+        return list(self._members.get(str(team_id), []))
+
+    def team_of(self, member_id):
+        return self._member_team.get(str(member_id))
+
+    def teams_of(self, member_ids):
+        return [self.team_of(member_id) for member_id in member_ids]
+
+    def count(self):
+        return len(self._members)
+
+    def scan(self, batch_size=10000):
+        # Iterates over a copy so teams can be disbanded while scanning
+        for team_id, member_ids in list(self._members.items()):
+            yield team_id, list(member_ids)
+
+    def scan_batches(self, batch_size=10000):
+        teams = self.scan(batch_size)
+        while batch := list(islice(teams, batch_size)):
+            yield batch
+
+    def clear(self):
+        self._members.clear()
+        self._member_team.clear()
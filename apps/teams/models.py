@@ -1,7 +1,11 @@
 class Team:
+    # Slotted, with members in a tuple rather than a set, since a team only
+    # ever holds a couple of players
+    __slots__ = ('team_id', '_members', '_score', '_rank')
+
     def __init__(self, team_id):
         self.team_id = team_id
-        self._members = set()
+        self._members = ()
         self._score = 0
         self._rank = 0
 
@@ -26,12 +30,12 @@ class Team:
         self._rank = rank
 
     def start_team(self, members, rank, score):
-        self._members.update(members)
+        self._members = tuple(dict.fromkeys((*self._members, *members)))
         for member in members:
             member.join_team(self)
         self._rank = rank
         self._score = score
 
     def end_team(self):
-        self._members.clear()
+        self._members = ()
         
\ No newline at end of file
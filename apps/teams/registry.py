@@ -0,0 +1,159 @@
+from itertools import islice
+from zlib import crc32
+from apps.leaderboard.scores import SEQUENCE_SPAN, SEQUENCE_STRIDE
+from .scripts import DISBAND_TEAMS, FORM_TEAM
+from .suggestions import PartnerSuggester
+
+# Teams are kept in Redis so every worker sees the same teams and they
+# survive restarts. Two sets of hashes are kept in step:
+#
+#   teams:members:<bucket>      team id -> comma separated member ids
+#   teams:member_team:<bucket>  member id -> team id
+#
+# Each is split over BUCKETS hashes by a CRC32 of the field, so no single hash
+# grows without bound and a full load can HSCAN every bucket at once.
+
+BUCKETS = 16
+SEPARATOR = ','
+
+
+class TeamRegistry:
+
+    def __init__(self, conn, prefix='teams', buckets=BUCKETS):
+        self.conn = conn
+        self.prefix = prefix
+        self.buckets = buckets
+        self._form_team = self.conn.register_script(FORM_TEAM)
+        self._disband_teams = self.conn.register_script(DISBAND_TEAMS)
+
+    def _bucket(self, value):
+        return crc32(str(value).encode()) % self.buckets
+
+    def members_key(self, team_id):
+        return f'{self.prefix}:members:{self._bucket(team_id)}'
+
+    def member_team_key(self, member_id):
+        return f'{self.prefix}:member_team:{self._bucket(member_id)}'
+
+    def add(self, team_id, member_ids):
+        pipe = self.conn.pipeline()
+        pipe.hset(self.members_key(team_id), team_id, SEPARATOR.join(map(str, member_ids)))
+        for member_id in member_ids:
+            pipe.hset(self.member_team_key(member_id), member_id, team_id)
+        pipe.execute()
+
+    def add_many(self, teams, batch_size=10000):
+        # Registers {team_id: member_ids} in pipelined batches
+        items = iter(teams.items())
+        while batch := list(islice(items, batch_size)):
+            members, member_teams = {}, {}
+            for team_id, member_ids in batch:
+                members.setdefault(self.members_key(team_id), {})[team_id] = SEPARATOR.join(map(str, member_ids))
+                for member_id in member_ids:
+                    member_teams.setdefault(self.member_team_key(member_id), {})[member_id] = team_id
+
+            pipe = self.conn.pipeline(transaction=False)
+            for key, mapping in (*members.items(), *member_teams.items()):
+                pipe.hset(key, mapping=mapping)
+            pipe.execute()
+
+    def form_team(self, leaderboard, team_id, member_ids, cause='team'):
+        # Puts the team on the board in its best member's place and takes the
+        # members off, in one script call. Returns the team's (rank, score).
+        rank, score = self._form_team(
+            keys=[
+                leaderboard.leaderboard, leaderboard.events, self.members_key(team_id),
+                *(self.member_team_key(member_id) for member_id in member_ids),
+            ],
+            args=[team_id, leaderboard.EVENTS_MAXLEN, cause, SEPARATOR, *member_ids],
+        )
+        return rank, float(score)
+
+    def disband_teams(self, leaderboard, teams, cause='disband', batch_size=1000):
+        # teams is an iterable of (team_id, [(member_id, rank)]), where rank is
+        # where the member returns to or None to take the team's place.
+        # Returns {team_id: [(rank, score)] per member}, None for teams that
+        # are not registered.
+        results = {}
+        teams = iter(teams)
+        while batch := list(islice(teams, batch_size)):
+            keys = [leaderboard.leaderboard, leaderboard.sequence, leaderboard.events]
+            args = [leaderboard.JUMP_WINDOW, SEQUENCE_SPAN, SEQUENCE_STRIDE, leaderboard.EVENTS_MAXLEN, cause]
+            for team_id, members in batch:
+                keys.append(self.members_key(team_id))
+                keys.extend(self.member_team_key(member_id) for member_id, _ in members)
+                args.extend((team_id, len(members)))
+                for member_id, rank in members:
+                    args.extend((member_id, '' if rank is None else rank))
+
+            placed = iter(self._disband_teams(keys=keys, args=args))
+            for team_id, members in batch:
+                scores = [(next(placed), next(placed)) for _ in members]
+                registered = all(rank >= 0 for rank, _ in scores)
+                results[team_id] = [(rank, float(score)) for rank, score in scores] if registered else None
+        return results
+
+    def suggest_partners(self, leaderboard, player_id, limit=10, band=5):
+        return PartnerSuggester(leaderboard, self).suggest(player_id, limit, band)
+
+    def remove(self, team_id, member_ids):
+        pipe = self.conn.pipeline()
+        pipe.hdel(self.members_key(team_id), team_id)
+        for member_id in member_ids:
+            pipe.hdel(self.member_team_key(member_id), member_id)
+        pipe.execute()
+
+    def members_of(self, team_id):
+        return _split(self.conn.hget(self.members_key(team_id), team_id))
+
+    def team_of(self, member_id):
+        return _decode(self.conn.hget(self.member_team_key(member_id), member_id))
+
+    def teams_of(self, member_ids):
+        # Team ids in the same order as member_ids, None for solo players
+        pipe = self.conn.pipeline(transaction=False)
+        for member_id in member_ids:
+            pipe.hget(self.member_team_key(member_id), member_id)
+        return [_decode(team_id) for team_id in pipe.execute()]
+
+    def count(self):
+        pipe = self.conn.pipeline(transaction=False)
+        for bucket in range(self.buckets):
+            pipe.hlen(f'{self.prefix}:members:{bucket}')
+        return sum(pipe.execute())
+
+    def scan(self, batch_size=10000):
+        # Yields every (team_id, [member ids]). Each round trip sends one HSCAN
+        # per bucket that still has a cursor open.
+        cursors = {f'{self.prefix}:members:{bucket}': 0 for bucket in range(self.buckets)}
+        count = max(1, batch_size // self.buckets)
+        while cursors:
+            pipe = self.conn.pipeline(transaction=False)
+            for key, cursor in cursors.items():
+                pipe.hscan(key, cursor, count=count)
+
+            for key, (cursor, teams) in zip(list(cursors), pipe.execute()):
+                if cursor:
+                    cursors[key] = cursor
+                else:
+                    del cursors[key]
+                for team_id, members in teams.items():
+                    yield _decode(team_id), _split(members)
+
+    def scan_batches(self, batch_size=10000):
+        teams = self.scan(batch_size)
+        while batch := list(islice(teams, batch_size)):
+            yield batch
+
+    def clear(self):
+        self.conn.delete(*(
+            f'{self.prefix}:{name}:{bucket}' for name in ('members', 'member_team') for bucket in range(self.buckets)
+        ))
+
+
+def _split(members):
+    return _decode(members).split(SEPARATOR) if members else []
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
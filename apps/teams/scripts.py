@@ -0,0 +1,121 @@
+from apps.leaderboard.scripts import _ENCODE, _PLACE, _RECORD
+
+# Lua scripts that change the leaderboard and the team registry together, so
+# a team is never on the board while its members are, or the other way round.
+
+# KEYS[1] leaderboard, KEYS[2] event stream, KEYS[3] registry hash holding the
+# team, then the registry hash holding each member's team in member order
+# ARGV[1] team id, ARGV[2] event stream maxlen, ARGV[3] cause,
+# ARGV[4] member id separator, then the member ids
+# The team takes the rank and score of its best placed member and the members
+# leave the board. Returns {team rank, team score}.
+FORM_TEAM = _RECORD + """
+local team_id, maxlen, cause = ARGV[1], tonumber(ARGV[2]), ARGV[3]
+local member_ids = {}
+for i = 5, #ARGV do
+    member_ids[#member_ids + 1] = ARGV[i]
+end
+
+local best_score
+for i, member_id in ipairs(member_ids) do
+    if redis.call('HEXISTS', KEYS[3 + i], member_id) == 1 then
+        return redis.error_reply('One or more users are already in a team')
+    end
+    local score = redis.call('ZSCORE', KEYS[1], member_id)
+    if score and (not best_score or tonumber(score) > tonumber(best_score)) then
+        best_score = score
+    end
+end
+if not best_score then
+    return redis.error_reply('None of the team members are on the leaderboard')
+end
+
+redis.call('ZREM', KEYS[1], unpack(member_ids))
+redis.call('ZADD', KEYS[1], best_score, team_id)
+local rank = redis.call('ZREVRANK', KEYS[1], team_id)
+
+redis.call('HSET', KEYS[3], team_id, table.concat(member_ids, ARGV[4]))
+for i, member_id in ipairs(member_ids) do
+    redis.call('HSET', KEYS[3 + i], member_id, team_id)
+end
+
+record(KEYS[2], maxlen, team_id, false, rank, best_score, cause)
+return {rank, best_score}
+"""
+
+# KEYS[1] leaderboard, KEYS[2] sequence counter, KEYS[3] event stream, then for
+# each team the registry hash holding the team followed by the registry hash
+# holding each member's team
+# ARGV[1] how many ranks above a target to search, ARGV[2] sequence span,
+# ARGV[3] sequence stride, ARGV[4] event stream maxlen, ARGV[5] cause, then for
+# each team its id, its member count and each member's id and rank to return
+# to, or an empty string to take the team's place
+# Removes each team from the board and the registry and puts its members back
+# on the board. Members taking the team's place get the team's score, counting
+# up from the last member, so they keep its points while there is room below
+# the player above. Returns each member's {rank, score} flattened in argument
+# order, or -1 and an empty string for members of teams that are not
+# registered.
+DISBAND_TEAMS = _ENCODE + _RECORD + _PLACE + """
+local window, maxlen, cause = tonumber(ARGV[1]), tonumber(ARGV[4]), ARGV[5]
+local results = {}
+local arg, key = 6, 4
+
+while arg <= #ARGV do
+    local team_id, count = ARGV[arg], tonumber(ARGV[arg + 1])
+    local team_key = KEYS[key]
+    local registered = redis.call('HEXISTS', team_key, team_id) == 1
+    local team_rank = redis.call('ZREVRANK', KEYS[1], team_id)
+    local team_score = tonumber(redis.call('ZSCORE', KEYS[1], team_id))
+    local above = false
+    if registered then
+        redis.call('ZREM', KEYS[1], team_id)
+        redis.call('HDEL', team_key, team_id)
+        if team_rank and team_rank > 0 then
+            above = tonumber(redis.call('ZREVRANGE', KEYS[1], team_rank - 1, team_rank - 1, 'WITHSCORES')[2])
+        end
+    end
+    local offset = 0
+
+    -- Later members are placed first so that members returning to the team's
+    -- place keep their order
+    for i = count, 1, -1 do
+        local member_id, member_rank = ARGV[arg + 2 * i], ARGV[arg + 2 * i + 1]
+        if registered then
+            local target_rank = tonumber(member_rank)
+            local score
+            if target_rank then
+                score = place(target_rank, window)
+            elseif team_score and not (above and team_score + offset >= above) then
+                score = team_score + offset
+                offset = offset + 1
+            else
+                score = team_rank and place(team_rank, window) or encode(0)
+            end
+            if type(score) == 'table' then
+                return score
+            end
+            redis.call('ZADD', KEYS[1], score, member_id)
+            redis.call('HDEL', KEYS[key + i], member_id)
+        end
+    end
+
+    for i = 1, count do
+        local member_id = ARGV[arg + 2 * i]
+        if registered then
+            local rank = redis.call('ZREVRANK', KEYS[1], member_id)
+            local score = redis.call('ZSCORE', KEYS[1], member_id)
+            record(KEYS[3], maxlen, member_id, false, rank, score, cause)
+            results[#results + 1] = rank
+            results[#results + 1] = score
+        else
+            results[#results + 1] = -1
+            results[#results + 1] = ''
+        end
+    end
+
+    arg = arg + 2 + 2 * count
+    key = key + 1 + count
+end
+return results
+"""
@@ -0,0 +1,74 @@
+from apps.leaderboard.scores import SEQUENCE_SPAN
+
+
+class PartnerSuggester:
+    # Finds solo players close to a player on the board to team up with.
+    # Reads outward from the player's score in windows of window entries on
+    # each side, skipping teams and players already in one, for at most
+    # max_rounds rounds. A query costs at most 1 + 2 * max_rounds round trips
+    # however large the board is.
+
+    def __init__(self, leaderboard, registry, window=50, max_rounds=3):
+        self.leaderboard = leaderboard
+        self.registry = registry
+        self.window = window
+        self.max_rounds = max_rounds
+
+    def suggest(self, player_id, limit=10, band=5):
+        # Returns up to limit [(player_id, score)] within band points of the
+        # player, closest score first. Empty if the player is not on the board.
+        score = self.leaderboard.get_player_score(player_id)
+        if score is None:
+            return []
+
+        conn, board = self.leaderboard.conn, self.leaderboard.leaderboard
+        high, low = score + band * SEQUENCE_SPAN, score - band * SEQUENCE_SPAN
+        # Exclusive bounds of the next window on each side, None once exhausted
+        above, below = score, score
+        suggestions = []
+
+        for _ in range(self.max_rounds):
+            pipe = conn.pipeline(transaction=False)
+            if above is not None:
+                pipe.zrangebyscore(board, f'({above!r}', high, start=0, num=self.window, withscores=True)
+            if below is not None:
+                pipe.zrevrangebyscore(board, f'({below!r}', low, start=0, num=self.window, withscores=True)
+            windows = iter(pipe.execute())
+
+            candidates = []
+            if above is not None:
+                entries = next(windows)
+                above = entries[-1][1] if len(entries) == self.window else None
+                candidates.extend(entries)
+            if below is not None:
+                entries = next(windows)
+                below = entries[-1][1] if len(entries) == self.window else None
+                candidates.extend(entries)
+
+            suggestions.extend(self._solo(candidates))
+            if len(suggestions) >= limit or (above is None and below is None):
+                break
+
+        suggestions.sort(key=lambda suggestion: abs(suggestion[1] - score))
+        return suggestions[:limit]
+
+    def _solo(self, candidates):
+        # Drops board entries that are teams or players registered to a team
+        if not candidates:
+            return []
+
+        pipe = self.leaderboard.conn.pipeline(transaction=False)
+        for member, _ in candidates:
+            pipe.hexists(self.registry.members_key(_decode(member)), member)
+            pipe.hexists(self.registry.member_team_key(_decode(member)), member)
+        flags = iter(pipe.execute())
+
+        return [
+            (_decode(member), score)
+            for (member, score), is_team, in_team in zip(candidates, flags, flags)
+            if not is_team and not in_team
+        ]
+
+
+def _decode(value):
+    return value.decode() if isinstance(value, bytes) else value
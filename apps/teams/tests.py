@@ -1,7 +1,13 @@
 import unittest
 from unittest.mock import MagicMock, patch
+from redis.client import Pipeline
+from django_redis import get_redis_connection
+from apps.leaderboard.models import Leaderboard, Player
+from apps.leaderboard.scores import decode_score, encode_score
 from .models import Team
 from .manager import TeamsManager
+from .registry import TeamRegistry
+from .suggestions import PartnerSuggester
 
 class TestTeam(unittest.TestCase):
     def setUp(self):
@@ -18,7 +24,7 @@ class TestTeam(unittest.TestCase):
         self.team.start_team(members=self.mock_members, rank=5, score=100)
         self.assertEqual(self.team.score, 100)
         self.assertEqual(self.team.rank, 5)
-        self.assertEqual(self.team.members, set(self.mock_members))
+        self.assertEqual(set(self.team.members), set(self.mock_members))
         for mock_member in self.mock_members:
             mock_member.join_team.assert_called_once_with(self.team)
 
@@ -62,18 +68,20 @@ class TestTeamsManager(unittest.TestCase):
         self.team.team_id = 'user1_user2'
         self.team.score = 100
     
-    def mock_get_rank_and_score(self, user_id):
-        return (500, 5) if user_id == 'user1' else (100, 500)
-    
     def test_validate_team_members_creates_team(self):
-        with patch.object(TeamsManager, '_get_rank_and_score', side_effect=self.mock_get_rank_and_score):
-            self.mock_leaderboard.get_user_rank_and_score.return_value = (1, 100)
-            self.teams_manager.validate_team_members([self.user1, self.user2])
-            created_team = next((team for team in self.teams_manager.teams if team.team_id == 'user1_user2'), None)
-            self.assertIsNotNone(created_team)
-            self.assertEqual(created_team.team_id, 'user1_user2')
-            self.assertEqual(created_team.score, 500)
-            self.assertEqual(len(self.teams_manager.teams), 1)
+        self.teams_manager.registry = MagicMock()
+        self.teams_manager.registry.form_team.return_value = (100, 500.0)
+
+        self.teams_manager.validate_team_members([self.user1, self.user2])
+
+        self.teams_manager.registry.form_team.assert_called_once_with(
+            self.mock_leaderboard, 'user1_user2', ['user1', 'user2']
+        )
+        created_team = self.teams_manager.teams.get('user1_user2')
+        self.assertIsNotNone(created_team)
+        self.assertEqual(created_team.team_id, 'user1_user2')
+        self.assertEqual(created_team.score, 500)
+        self.assertEqual(len(self.teams_manager.teams), 1)
 
     def test_validate_team_members_raises_exception_for_teamed_user(self):
         self.user1.team = 'some_team'
@@ -90,27 +98,214 @@ class TestTeamsManager(unittest.TestCase):
         # Set up the team and add it to the TeamsManager
         self.user1.team = self.team
         self.user2.team = self.team
-        self.teams_manager.teams.add(self.team)
+        self.teams_manager.teams[self.team.team_id] = self.team
+        self.teams_manager.registry = MagicMock()
+        self.teams_manager.registry.disband_teams.return_value = {'user1_user2': [(3, 50.0), (4, 40.0)]}
+
         self.teams_manager.disband_team(self.user1)
-        self.assertNotIn(self.team, self.teams_manager.teams)
-        self.mock_leaderboard.remove_user.assert_called_with(self.team.team_id)
+
+        self.teams_manager.registry.disband_teams.assert_called_once_with(
+            self.mock_leaderboard, [('user1_user2', [('user1', 500), ('user2', 100)])]
+        )
+        self.assertNotIn(self.team.team_id, self.teams_manager.teams)
+        self.user1.leave_team.assert_called_once_with(50.0)
+        self.user2.leave_team.assert_called_once_with(40.0)
         self.team.end_team.assert_called_once()
 
+    def test_disband_unregistered_team(self):
+        self.user1.team = self.team
+        self.teams_manager.registry = MagicMock()
+        self.teams_manager.registry.disband_teams.return_value = {'user1_user2': None}
+
+        with self.assertRaises(Exception):
+            self.teams_manager.disband_team(self.user1)
+        self.team.end_team.assert_not_called()
+
     def test_team_id_creation(self):
         team_id = self.teams_manager._create_team_id([self.user1, self.user2])
         self.assertEqual(team_id, 'user1_user2')
 
-    def test_add_and_remove_from_leaderboard(self):
-        self.teams_manager._create_new_team(self.team)
-        self.mock_leaderboard.add_user.assert_called_with(self.team.team_id, self.team.score)
-        self.teams_manager._remove_team_from_lb(self.team)
-        self.mock_leaderboard.remove_user.assert_called_with(self.team.team_id)
-
-    def test_reinstate_team_members_to_lb(self):
-        self.mock_leaderboard.get_score_at_rank.return_value = 50
-        self.teams_manager._reinstate_team_members_to_lb(self.team)
-        calls = [unittest.mock.call(self.user1.user_id, 50), unittest.mock.call(self.user2.user_id, 50)]
-        self.mock_leaderboard.add_user.assert_has_calls(calls, any_order=True)
+
+class TestTeamRegistry(unittest.TestCase):
+
+    def setUp(self):
+        self.conn = get_redis_connection('default')
+        self.registry = TeamRegistry(self.conn, prefix='test:teams', buckets=4)
+        self.addCleanup(self.registry.clear)
+
+    def test_membership_lookups(self):
+        self.registry.add('1_2', [1, 2])
+
+        self.assertEqual(self.registry.members_of('1_2'), ['1', '2'])
+        self.assertEqual(self.registry.team_of(2), '1_2')
+        self.assertEqual(self.registry.teams_of([1, 3, 2]), ['1_2', None, '1_2'])
+
+    def test_remove(self):
+        self.registry.add('1_2', [1, 2])
+        self.registry.remove('1_2', [1, 2])
+
+        self.assertEqual(self.registry.members_of('1_2'), [])
+        self.assertIsNone(self.registry.team_of(1))
+        self.assertEqual(self.registry.count(), 0)
+
+    def test_scan_returns_every_team(self):
+        teams = {f'{i}_{i + 1}': [str(i), str(i + 1)] for i in range(0, 200, 2)}
+        self.registry.add_many(teams, batch_size=30)
+
+        self.assertEqual(dict(self.registry.scan(batch_size=8)), teams)
+        self.assertEqual(sum(len(batch) for batch in self.registry.scan_batches(batch_size=30)), 100)
+
+    def test_load_teams(self):
+        leaderboard = Leaderboard(self.conn, name='test:teams:board')
+        self.addCleanup(self.conn.delete, 'test:teams:board')
+        leaderboard.bulk_add_players({'1_2': 40, '3_4': 30})
+        self.registry.add('1_2', [1, 2])
+        self.registry.add('3_4', [3, 4])
+
+        manager = TeamsManager(leaderboard, registry=self.registry)
+
+        self.assertEqual(manager.load_teams(), 2)
+        team = manager.teams['3_4']
+        self.assertEqual((team.rank, team.score), (1, 30.0))
+        self.assertEqual(sorted(member.user_id for member in team.members), ['3', '4'])
+        self.assertEqual([member.team_id for member in team.members], ['3_4', '3_4'])
+        self.assertEqual(manager.get_team_id(1), '1_2')
+
+
+class TestTeamScripts(unittest.TestCase):
+    BOARD = 'test:teams:scripts'
+
+    def setUp(self):
+        self.conn = get_redis_connection('default')
+        self.registry = TeamRegistry(self.conn, prefix='test:teams', buckets=4)
+        self.leaderboard = Leaderboard(self.conn, name=self.BOARD)
+        self.addCleanup(self.registry.clear)
+        self.addCleanup(self.conn.delete, self.BOARD, f'{self.BOARD}:sequence', f'{self.BOARD}:events')
+        self.leaderboard.bulk_add_players({f'user_{i}': None for i in range(10)})
+        self.manager = TeamsManager(self.leaderboard, registry=self.registry)
+
+    def form(self, *user_ids):
+        users = [Player(user_id) for user_id in user_ids]
+        for user, (rank, score) in zip(users, self.leaderboard.bulk_get_ranks(user_ids, withscores=True)):
+            user.score = score
+            user.rank = {'rank': rank, 'spaces': 0}
+        self.manager.validate_team_members(users)
+        return users
+
+    def test_form_team_takes_best_members_place(self):
+        self.form('user_7', 'user_3')
+
+        self.assertEqual(self.leaderboard.get_player_rank('user_7_user_3'), 3)
+        self.assertEqual(self.leaderboard.bulk_get_ranks(['user_7', 'user_3']), [None, None])
+        self.assertEqual(self.leaderboard.length, 9)
+        self.assertEqual(self.registry.team_of('user_3'), 'user_7_user_3')
+        self.assertEqual(self.manager.teams['user_7_user_3'].rank, 3)
+
+    def test_form_team_rejects_teamed_members(self):
+        self.registry.add('other', ['user_1', 'someone'])
+
+        with self.assertRaises(Exception) as context:
+            self.manager.validate_team_members([Player('user_1'), Player('user_2')])
+        self.assertIn('already in a team', str(context.exception))
+        self.assertEqual(self.leaderboard.length, 10)
+
+    def test_disband_returns_members_to_their_ranks(self):
+        users = self.form('user_7', 'user_3')
+
+        self.manager.disband_team(users[0])
+
+        self.assertIsNone(self.leaderboard.get_player_rank('user_7_user_3'))
+        self.assertEqual(self.leaderboard.bulk_get_ranks(['user_3', 'user_7']), [3, 7])
+        self.assertEqual([user.team for user in users], [None, None])
+        self.assertEqual([user.rank for user in users], [7, 3])
+        self.assertIsNone(self.registry.team_of('user_7'))
+        self.assertEqual(self.manager.teams, {})
+
+    def test_disband_all_teams(self):
+        self.form('user_1', 'user_2')
+        self.form('user_5', 'user_8')
+        self.registry.add_many({'stale': ['nobody']})
+
+        self.assertEqual(self.manager.disband_all_teams(batch_size=1), 3)
+
+        self.assertEqual(self.registry.count(), 0)
+        self.assertEqual(self.leaderboard.length, 11)
+        # Members take their team's place, in member order
+        self.assertEqual(self.leaderboard.bulk_get_ranks(['user_1', 'user_2', 'user_5', 'user_8']), [1, 2, 5, 6])
+
+
+    def test_disband_several_teams_in_one_batch(self):
+        self.form('user_0', 'user_1')
+        self.form('user_4', 'user_5')
+        self.form('user_7', 'user_9')
+
+        results = self.registry.disband_teams(self.leaderboard, [
+            ('user_0_user_1', [('user_0', None), ('user_1', None)]),
+            ('user_4_user_5', [('user_4', None), ('user_5', 3)]),
+            ('user_7_user_9', [('user_7', None), ('user_9', None)]),
+        ])
+
+        ranks = self.leaderboard.bulk_get_ranks(['user_0', 'user_1', 'user_4', 'user_5', 'user_7', 'user_9'])
+        self.assertEqual(ranks, [0, 1, 5, 3, 7, 8])
+        self.assertEqual(
+            {team_id: [rank for rank, _ in placed] for team_id, placed in results.items()},
+            {'user_0_user_1': [0, 1], 'user_4_user_5': [5, 3], 'user_7_user_9': [7, 8]},
+        )
+        # Taking the team's place at the top of the board awards no points
+        self.assertEqual(
+            [decode_score(score)[0] for _, score in results['user_0_user_1']], [0, 0]
+        )
+
+    def test_disband_all_releases_every_member(self):
+        teams = [self.form(f'user_{i}', f'user_{i + 1}') for i in range(0, 6, 2)]
+
+        self.assertEqual(self.manager.disband_all_teams(batch_size=10), 3)
+
+        self.assertEqual(self.manager.teams, {})
+        self.assertEqual([user.team for users in teams for user in users], [None] * 6)
+        self.assertEqual(self.registry.count(), 0)
+        self.assertEqual(self.leaderboard.bulk_get_ranks([f'user_{i}' for i in range(6)]), list(range(6)))
+
+class TestPartnerSuggester(unittest.TestCase):
+    BOARD = 'test:teams:suggestions'
+
+    def setUp(self):
+        self.conn = get_redis_connection('default')
+        self.registry = TeamRegistry(self.conn, prefix='test:teams', buckets=4)
+        self.leaderboard = Leaderboard(self.conn, name=self.BOARD)
+        self.addCleanup(self.registry.clear)
+        self.addCleanup(self.conn.delete, self.BOARD)
+        # user_i has i points, so user_10 is closest to user_9 and user_11
+        self.leaderboard.bulk_add_players({f'user_{i}': encode_score(i, i) for i in range(20)})
+
+    def test_closest_solo_players_first(self):
+        self.leaderboard.bulk_add_players({'user_9_user_0': encode_score(11, 30)})
+        self.registry.add('user_9_user_0', ['user_9', 'user_0'])
+        self.registry.add('user_11_user_x', ['user_11', 'user_x'])
+        suggester = PartnerSuggester(self.leaderboard, self.registry, window=3)
+
+        suggestions = suggester.suggest('user_10', limit=4, band=3)
+
+        self.assertEqual([player_id for player_id, _ in suggestions][:2], ['user_12', 'user_8'])
+        self.assertEqual(sorted(player_id for player_id, _ in suggestions), ['user_12', 'user_13', 'user_7', 'user_8'])
+
+    def test_band_limits_suggestions(self):
+        suggester = PartnerSuggester(self.leaderboard, self.registry)
+
+        suggestions = suggester.suggest('user_10', limit=10, band=1)
+
+        self.assertEqual(sorted(player_id for player_id, _ in suggestions), ['user_11', 'user_9'])
+
+    def test_round_trips_are_capped(self):
+        self.registry.add_many({f'team_{i}': [f'user_{i}'] for i in range(20)})
+        suggester = PartnerSuggester(self.leaderboard, self.registry, window=2, max_rounds=3)
+
+        with patch.object(Pipeline, 'execute', autospec=True, side_effect=Pipeline.execute) as execute:
+            self.assertEqual(suggester.suggest('user_10', band=20), [])
+        self.assertEqual(execute.call_count, 6)
+
+    def test_missing_player(self):
+        self.assertEqual(PartnerSuggester(self.leaderboard, self.registry).suggest('missing'), [])
 
 
 if __name__ == '__main__':
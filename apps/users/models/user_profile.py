@@ -38,6 +38,35 @@ class UserProfile(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    # Fields task eligibility rules can test, see apps.tasks.eligibility
+    DEMOGRAPHIC_FIELDS = (
+        'is_expat', 'is_parent', 'is_student', 'is_sports_traveler', 'is_festival_traveler',
+        'is_vip', 'is_company_of_interest', 'phyiscal_location',
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._saved_demographics = instance._demographics()
+        return instance
+
+    def _demographics(self):
+        # Read from __dict__ so deferred fields are not loaded
+        return tuple(self.__dict__.get(field) for field in self.DEMOGRAPHIC_FIELDS)
+
+    def demographics_changed(self):
+        # True for unsaved profiles and when any demographic flag differs from
+        # what was last loaded or saved
+        return getattr(self, '_saved_demographics', None) != self._demographics()
+
+    def save(self, *args, **kwargs):
+        # post_save receivers run inside super().save() and still see the
+        # previous values
+        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(self.DEMOGRAPHIC_FIELDS):
+            self._saved_demographics = self._demographics()
+
     def __str__(self):
         return f"{self.user.username}'s Profile"
 
@@ -25,13 +25,16 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
     if any(email_domain.endswith(academic_domain) for academic_domain in ACADEMIC_DOMAINS):
         instance.profile.is_student = True
 
-    assign_hidden_tasks(instance.profile)
-
+    # Hidden tasks are assigned by user_profile_changed when this save
+    # changes a demographic flag
     instance.profile.save()
 
 @receiver(post_save, sender=UserProfile)
-def user_profile_changed(sender, instance, **kwargs):
-    assign_hidden_tasks(instance)
+def user_profile_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not update_fields & set(UserProfile.DEMOGRAPHIC_FIELDS):
+        return
+    if instance.demographics_changed():
+        assign_hidden_tasks(instance)
 #     if CompanyOfInterest.objects.filter(domain=email_domain).exists():
 #         instance.profile.is_company_of_interest = True
 
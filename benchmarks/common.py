@@ -0,0 +1,46 @@
+import os
+import time
+from contextlib import contextmanager
+
+import django
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.settings")
+    django.setup()
+
+
+@contextmanager
+def count_round_trips():
+    # Counts requests sent to Redis. A pipeline is sent as a single request.
+    from redis.client import Pipeline, Redis
+
+    counts = {'round_trips': 0}
+    execute_command = Redis.execute_command
+    execute_pipeline = Pipeline.execute
+
+    def counted_command(self, *args, **kwargs):
+        counts['round_trips'] += 1
+        return execute_command(self, *args, **kwargs)
+
+    def counted_pipeline(self, *args, **kwargs):
+        counts['round_trips'] += 1
+        return execute_pipeline(self, *args, **kwargs)
+
+    Redis.execute_command = counted_command
+    Pipeline.execute = counted_pipeline
+    try:
+        yield counts
+    finally:
+        Redis.execute_command = execute_command
+        Pipeline.execute = execute_pipeline
+
+
+@contextmanager
+def timer():
+    elapsed = {'seconds': 0.0}
+    start = time.perf_counter()
+    try:
+        yield elapsed
+    finally:
+        elapsed['seconds'] = time.perf_counter() - start
@@ -0,0 +1,82 @@
+"""
+Per-call jumps against the JumpScheduler for a burst of 10k jumps a second.
+
+Both paths apply the same stream of jumps, drawn so a share of them come from
+a small set of hot players, as happens when a popular task is completed. The
+scheduler path submits the stream one tick at a time and flushes at the end of
+each tick.
+
+Run from the project root against a local Redis:
+    python -m benchmarks.jump_scheduler
+"""
+import random
+
+from benchmarks.common import count_round_trips, setup_django, timer
+
+setup_django()
+
+from django_redis import get_redis_connection
+from apps.leaderboard.models import Leaderboard
+from apps.leaderboard.scheduler import JumpScheduler
+
+BOARD = 'bench:jumps'
+PLAYERS = 100_000
+JUMPS_PER_SECOND = 10_000
+TICKS = [0.01, 0.05, 0.1]
+HOT_PLAYERS = 100
+HOT_SHARE = 0.3
+
+
+def seed(conn, leaderboard):
+    conn.delete(BOARD, leaderboard.sequence, leaderboard.events)
+    leaderboard.bulk_add_players({f'user_{i}': None for i in range(PLAYERS)}, chunk_size=10_000)
+
+
+def jump_stream(seed_value=0):
+    rng = random.Random(seed_value)
+    for _ in range(JUMPS_PER_SECOND):
+        if rng.random() < HOT_SHARE:
+            player_id = f'user_{rng.randrange(PLAYERS - HOT_PLAYERS, PLAYERS)}'
+        else:
+            player_id = f'user_{rng.randrange(PLAYERS)}'
+        yield player_id, rng.randint(1, 50)
+
+
+def report(label, counts, elapsed, jumps, applied):
+    # jumps/s counts submitted jumps, merged ones included
+    seconds = elapsed['seconds']
+    print(
+        f"{label:>16} {counts['round_trips']:>12} {applied:>10} {seconds * 1000:>10.1f} {jumps / seconds:>12.0f}"
+    )
+
+
+def main():
+    conn = get_redis_connection("default")
+    leaderboard = Leaderboard(conn, name=BOARD)
+    jumps = list(jump_stream())
+
+    print(f"{'path':>16} {'round trips':>12} {'applied':>10} {'ms':>10} {'jumps/s':>12}")
+
+    seed(conn, leaderboard)
+    with count_round_trips() as counts, timer() as elapsed:
+        for player_id, spaces in jumps:
+            leaderboard.jump_player(player_id, spaces)
+    report('per call', counts, elapsed, len(jumps), len(jumps))
+
+    for tick in TICKS:
+        seed(conn, leaderboard)
+        scheduler = JumpScheduler(leaderboard, tick=tick, max_batch=JUMPS_PER_SECOND)
+        per_tick = int(JUMPS_PER_SECOND * tick)
+        applied = 0
+        with count_round_trips() as counts, timer() as elapsed:
+            for start in range(0, len(jumps), per_tick):
+                for player_id, spaces in jumps[start:start + per_tick]:
+                    scheduler.submit(player_id, spaces)
+                applied += len(scheduler.flush())
+        report(f'tick {tick * 1000:.0f}ms', counts, elapsed, len(jumps), applied)
+
+    conn.delete(BOARD, leaderboard.sequence, leaderboard.events)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+"""
+Throughput of snapshotting a leaderboard to Postgres and rehydrating it.
+
+Run from the project root against a local redis-server and Postgres:
+    python -m benchmarks.leaderboard_snapshot [players]
+"""
+import sys
+
+from benchmarks.common import setup_django
+
+setup_django()
+
+from django_redis import get_redis_connection
+from apps.leaderboard.models import Leaderboard, LeaderboardSnapshot
+from apps.leaderboard.snapshots import rehydrate, take_snapshot
+
+BOARD = 'bench:snapshot'
+DEFAULT_PLAYERS = 5_000_000
+
+
+def main(players):
+    conn = get_redis_connection("default")
+    leaderboard = Leaderboard(conn, name=BOARD, chunk_size=10_000)
+    conn.delete(BOARD, leaderboard.sequence)
+    leaderboard.bulk_add_players((f'user_{i}', None) for i in range(players))
+
+    snapshot, elapsed = take_snapshot(leaderboard, batch_size=10_000)
+    print(f'snapshot:  {snapshot.players:,} players in {elapsed:.1f}s ({snapshot.players / elapsed:,.0f}/s)')
+
+    conn.delete(BOARD, leaderboard.sequence)
+    _, loaded, elapsed = rehydrate(leaderboard, snapshot, batch_size=10_000)
+    print(f'rehydrate: {loaded:,} players in {elapsed:.1f}s ({loaded / elapsed:,.0f}/s)')
+
+    conn.delete(BOARD, leaderboard.sequence)
+    LeaderboardSnapshot.objects.filter(board=BOARD).delete()
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_PLAYERS)
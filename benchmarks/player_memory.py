@@ -0,0 +1,64 @@
+"""
+Memory per player held in Player/Team objects against a PlayerTable.
+
+Half of the players are paired into teams, about the share we see on the
+waitlist. Memory is measured with tracemalloc, so it counts what the objects
+allocate and not the interpreter itself.
+
+Run from the project root:
+    python -m benchmarks.player_memory
+"""
+import tracemalloc
+
+from benchmarks.common import setup_django, timer
+
+setup_django()
+
+from apps.leaderboard.models import Player
+from apps.leaderboard.tables import PlayerTable
+from apps.teams.models import Team
+
+SIZES = [10_000, 100_000, 1_000_000]
+
+
+def build_objects(size):
+    players = [Player(user_id) for user_id in range(size)]
+    for user_id, player in enumerate(players):
+        player.score = float(size - user_id)
+        player.rank = {'rank': user_id, 'spaces': 0}
+
+    teams = []
+    for first in range(0, size // 2, 2):
+        team = Team(f'{first}_{first + 1}')
+        team.start_team(players[first:first + 2], rank=first, score=float(size - first))
+        teams.append(team)
+    return players, teams
+
+
+def build_table(size):
+    table = PlayerTable.from_scores(range(size), [float(size - user_id) for user_id in range(size)])
+    firsts = range(0, size // 2, 2)
+    table.join_teams([f'{first}_{first + 1}' for first in firsts], [[first, first + 1] for first in firsts])
+    return table
+
+
+def measure(build, size):
+    tracemalloc.start()
+    with timer() as elapsed:
+        built = build(size)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return current, elapsed['seconds']
+
+
+def main():
+    print(f"{'players':>10} {'layout':>10} {'MB':>10} {'bytes/player':>14} {'build s':>9}")
+    for size in SIZES:
+        for label, build in (('objects', build_objects), ('table', build_table)):
+            current, seconds = measure(build, size)
+            print(f"{size:>10} {label:>10} {current / 2**20:>10.1f} {current / size:>14.1f} {seconds:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
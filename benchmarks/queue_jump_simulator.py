@@ -0,0 +1,33 @@
+"""
+Simulated jumps per second for the QueueJumpSimulator by batch size.
+
+Run from the project root:
+    python -m benchmarks.queue_jump_simulator
+"""
+from benchmarks.common import setup_django, timer
+
+setup_django()
+
+from apps.leaderboard.simulation import QueueJumpSimulator, jump_sizes, synthetic_completions
+
+PLAYERS = 1_000_000
+COMPLETIONS = 2_000_000
+BATCH_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+TASK_JUMPS = {10: 5, 20: 3, 50: 1}
+TIER_JUMPS = {10: 1, 20: 1, 50: 1, 75: 1}
+
+
+def main():
+    sizes, weights = jump_sizes(TASK_JUMPS, TIER_JUMPS, tier_share=0.1)
+    players, spaces = synthetic_completions(PLAYERS, COMPLETIONS, sizes, weights, seed=0)
+
+    print(f"{'batch size':>12} {'s':>8} {'jumps/s':>14}")
+    for batch_size in BATCH_SIZES:
+        simulator = QueueJumpSimulator(PLAYERS)
+        with timer() as elapsed:
+            simulator.run(players, spaces, batch_size)
+        print(f"{batch_size:>12} {elapsed['seconds']:>8.2f} {COMPLETIONS / elapsed['seconds']:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
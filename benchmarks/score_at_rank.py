@@ -0,0 +1,45 @@
+"""
+Round trips needed by Leaderboard.get_score_at_rank as the zero-score tail grows.
+
+Run from the project root against a local Redis:
+    python -m benchmarks.score_at_rank
+"""
+from benchmarks.common import count_round_trips, setup_django, timer
+
+setup_django()
+
+from django_redis import get_redis_connection
+from apps.leaderboard.models import Leaderboard
+
+BOARD = 'bench:leaderboard'
+SCORED_PLAYERS = 100
+TAIL_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+CHUNK_SIZE = 10_000
+
+
+def seed(conn, tail_size):
+    conn.delete(BOARD)
+    conn.zadd(BOARD, {f'scored:{i}': i + 1 for i in range(SCORED_PLAYERS)})
+    for start in range(0, tail_size, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, tail_size)
+        conn.zadd(BOARD, {f'zero:{i}': 0 for i in range(start, end)})
+
+
+def main():
+    conn = get_redis_connection("default")
+    leaderboard = Leaderboard(conn, name=BOARD)
+
+    print(f"{'tail size':>12} {'round trips':>12} {'ms':>8}")
+    for tail_size in TAIL_SIZES:
+        seed(conn, tail_size)
+        # Land in the middle of the zero-score tail, the old worst case
+        rank = SCORED_PLAYERS + tail_size // 2
+        with count_round_trips() as counts, timer() as elapsed:
+            leaderboard.get_score_at_rank(rank)
+        print(f"{tail_size:>12} {counts['round_trips']:>12} {elapsed['seconds'] * 1000:>8.2f}")
+
+    conn.delete(BOARD)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Time to hydrate TeamsManager.teams from the Redis team registry.
+
+Seeds 500k two-player teams onto a registry and a board, then times a bare
+registry scan and a full TeamsManager.load_teams, which also reads each
+team's rank and score from the board.
+
+Run from the project root against a local Redis:
+    python -m benchmarks.team_registry
+"""
+from benchmarks.common import count_round_trips, setup_django, timer
+
+setup_django()
+
+from django_redis import get_redis_connection
+from apps.leaderboard.models import Leaderboard
+from apps.teams.manager import TeamsManager
+from apps.teams.registry import TeamRegistry
+
+BOARD = 'bench:teams:board'
+PREFIX = 'bench:teams'
+TEAMS = 500_000
+BATCH_SIZES = [1_000, 10_000, 50_000]
+
+
+def seed(conn, registry, leaderboard):
+    registry.clear()
+    conn.delete(BOARD)
+    teams = {f'{2 * i}_{2 * i + 1}': (2 * i, 2 * i + 1) for i in range(TEAMS)}
+    registry.add_many(teams)
+    leaderboard.bulk_add_players({team_id: None for team_id in teams}, chunk_size=10_000)
+
+
+def main():
+    conn = get_redis_connection("default")
+    registry = TeamRegistry(conn, prefix=PREFIX)
+    leaderboard = Leaderboard(conn, name=BOARD)
+    seed(conn, registry, leaderboard)
+
+    print(f"{'step':>12} {'batch size':>12} {'round trips':>12} {'s':>8} {'teams/s':>12}")
+    for batch_size in BATCH_SIZES:
+        with count_round_trips() as counts, timer() as elapsed:
+            scanned = sum(1 for _ in registry.scan(batch_size))
+        seconds = elapsed['seconds']
+        print(f"{'scan':>12} {batch_size:>12} {counts['round_trips']:>12} {seconds:>8.2f} {scanned / seconds:>12,.0f}")
+
+        manager = TeamsManager(leaderboard, registry=registry)
+        with count_round_trips() as counts, timer() as elapsed:
+            loaded = manager.load_teams(batch_size)
+        seconds = elapsed['seconds']
+        print(f"{'load_teams':>12} {batch_size:>12} {counts['round_trips']:>12} {seconds:>8.2f} {loaded / seconds:>12,.0f}")
+
+    registry.clear()
+    conn.delete(BOARD, leaderboard.sequence)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,6 +2,7 @@ import graphene
 from graphene_django import DjangoObjectType
 from apps.users.models import User as UserModel
 from apps.floaters.models import Floater as FloaterModel
+from apps.leaderboard.services import LeaderboardService
 
 class User(DjangoObjectType):
     class Meta:
@@ -11,9 +12,25 @@ class Floater(DjangoObjectType):
     class Meta:
         model = FloaterModel
 
+class LeaderboardEntry(graphene.ObjectType):
+    rank = graphene.Int()
+    player_id = graphene.String()
+    score = graphene.Float()
+    display_name = graphene.String()
+
 class Query(graphene.ObjectType):
     users = graphene.List(User)
     floaters = graphene.List(Floater)
+    leaderboard = graphene.List(
+        LeaderboardEntry,
+        offset=graphene.Int(default_value=0),
+        limit=graphene.Int(default_value=10),
+    )
+    leaderboard_around = graphene.List(
+        LeaderboardEntry,
+        player_id=graphene.String(required=True),
+        radius=graphene.Int(default_value=5),
+    )
 
     def resolve_users(self, info, **kwargs):
         return UserModel.objects.all()
@@ -21,6 +38,12 @@ class Query(graphene.ObjectType):
     def resolve_floaters(self, info, **kwargs):
         return FloaterModel.objects.all()
 
+    def resolve_leaderboard(self, info, offset, limit):
+        return LeaderboardService.get_page(offset, limit)
+
+    def resolve_leaderboard_around(self, info, player_id, radius):
+        return LeaderboardService.get_around(player_id, radius)
+
 class ChangeFloater(graphene.Mutation):
     user = graphene.Field(User)
 
@@ -159,4 +159,24 @@ GRAPHENE = {
 }
 
 MEDIA_URL = "/assets/"
-MEDIA_ROOT = os.path.join(BASE_DIR, 'assets')
\ No newline at end of file
+MEDIA_ROOT = os.path.join(BASE_DIR, 'assets')
+CELERY_BROKER_URL = os.getenv('CELERY_BROKER_URL', 'redis://127.0.0.1:6379/0')
+
+CELERY_BEAT_SCHEDULE = {
+    'snapshot-leaderboard': {
+        'task': 'apps.leaderboard.tasks.snapshot_leaderboard',
+        'schedule': 15 * 60,
+    },
+    'flush-task-counters': {
+        'task': 'apps.tasks.tasks.flush_task_counters',
+        'schedule': 60,
+    },
+    'drain-completion-outbox': {
+        'task': 'apps.tasks.tasks.drain_completion_outbox',
+        'schedule': 5,
+    },
+    'purge-completion-outbox': {
+        'task': 'apps.tasks.tasks.purge_completion_outbox',
+        'schedule': 60 * 60,
+    },
+}